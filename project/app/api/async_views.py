@@ -0,0 +1,133 @@
+"""
+Async wrappers of the API views for ASGI deployments.
+
+DRF views are synchronous and Django 3.1 has no async ORM. Under ASGI Django
+runs every sync view in a single shared thread (asgiref's thread sensitive
+mode), so one slow query holds back every other request of the process. The
+wrappers below turn each API view into a coroutine that runs the original
+view, and renders its response, in a bounded thread pool of
+API_ASYNC_THREADS threads. Requests run in parallel up to that bound while
+the event loop keeps accepting connections; URLs and responses don't change.
+This helps when requests wait on the database, not when they are CPU bound:
+a process still renders one response at a time, and the event loop and the
+pool cost a little per request.
+
+Each pool thread keeps its own database connection, closed or reused
+according to CONN_MAX_AGE like the ones of a sync worker.
+
+Django 3.1's ASGIHandler iterates streaming responses on the event loop,
+where their generators can't query the database, with or without these
+wrappers. Views streaming rows from the database pass their response
+through `buffer_streaming_response()`.
+"""
+import asyncio
+import functools
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.urls import URLPattern, URLResolver
+
+from app.shared.metrics import record_queries
+
+# streamed bodies buffered under ASGI are kept in memory up to this size
+SPOOL_MAX_SIZE = 4 * 1024 * 1024
+SPOOL_CHUNK_SIZE = 64 * 1024
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.API_ASYNC_THREADS, thread_name_prefix="api"
+        )
+    return _executor
+
+
+def _run_view(view, request, *args, **kwargs):
+    close_old_connections()
+    try:
+        with ExitStack() as stack:
+            # the metrics middleware only sees the queries of its own thread
+            stats = getattr(request, "query_stats", None)
+            if stats is not None:
+                stack.enter_context(record_queries(stats))
+            response = view(request, *args, **kwargs)
+            # render in the pool too, Django would do it in the shared thread
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def as_async_view(view):
+    """
+    Return a coroutine view running `view` in the API thread pool.
+    """
+
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            get_executor(),
+            functools.partial(_run_view, view, request, *args, **kwargs),
+        )
+
+    return async_view
+
+
+def as_async_patterns(patterns):
+    """
+    Return a copy of `patterns` with every view wrapped by as_async_view().
+    """
+    async_patterns = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            pattern = URLResolver(
+                pattern.pattern,
+                as_async_patterns(pattern.url_patterns),
+                pattern.default_kwargs,
+                pattern.app_name,
+                pattern.namespace,
+            )
+        elif isinstance(pattern, URLPattern):
+            pattern = URLPattern(
+                pattern.pattern,
+                as_async_view(pattern.callback),
+                pattern.default_args,
+                pattern.name,
+            )
+        async_patterns.append(pattern)
+    return async_patterns
+
+
+def _read_spooled(body):
+    with body:
+        yield from iter(functools.partial(body.read, SPOOL_CHUNK_SIZE), b"")
+
+
+def buffer_streaming_response(request, response):
+    """
+    Under ASGI, consume the body of a streaming `response` now, in the view's
+    thread, into a temporary file (on disk past SPOOL_MAX_SIZE) and stream it
+    from there. Under WSGI `response` is returned as it is.
+    """
+    if not isinstance(getattr(request, "_request", request), ASGIRequest):
+        return response
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    try:
+        for chunk in response.streaming_content:
+            body.write(chunk)
+    except BaseException:
+        body.close()
+        raise
+    response["Content-Length"] = body.tell()
+    body.seek(0)
+    response.streaming_content = _read_spooled(body)
+    return response
@@ -0,0 +1,201 @@
+"""
+In-process prefix index for the autocomplete endpoint.
+
+Each worker keeps one index per election, built from the full names of its
+candidates on list and the names of its political organizations. Names are
+accent folded and every word start is a key, so "perez" finds "José Pérez
+García". Instead of one Python object per key, the index stores:
+
+- `text`: the folded names joined by NUL characters,
+- `keys`: offsets of every word start in `text`, sorted by the text that
+  follows them,
+- `starts`: offset of each name in `text`, plus parallel arrays with the
+  kind and id of each name, and the original names joined in `names` with
+  their offsets in `name_starts`.
+
+A lookup is a binary search over `keys`. Indexes are rebuilt lazily the
+first time they are used after the election's data version changes.
+"""
+import logging
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_right
+
+from app.elections.managers import fold
+from app.elections.models import Candidate, PoliticalOrganization
+from app.elections.versions import get_data_version
+
+logger = logging.getLogger(__name__)
+
+CANDIDATE = 0
+POLITICAL_ORGANIZATION = 1
+KINDS = ("candidate", "political_organization")
+
+SEPARATOR = "\x00"
+
+
+def normalize(text):
+    return " ".join(fold(text).replace(SEPARATOR, " ").split())
+
+
+class PrefixIndex:
+    def __init__(self, entries):
+        """
+        `entries` is an iterable of (kind, id, name).
+        """
+        start_time = time.perf_counter()
+        folded, names = [], []
+        self.starts = array("I")
+        self.name_starts = array("I")
+        self.kinds = array("b")
+        self.ids = array("q")
+        offset = name_offset = 0
+        for kind, pk, name in entries:
+            key = normalize(name)
+            if not key:
+                continue
+            self.starts.append(offset)
+            self.name_starts.append(name_offset)
+            self.kinds.append(kind)
+            self.ids.append(pk)
+            folded.append(key)
+            names.append(name)
+            offset += len(key) + 1
+            name_offset += len(name) + 1
+        self.text = SEPARATOR.join(folded) + SEPARATOR
+        self.names = SEPARATOR.join(names) + SEPARATOR
+
+        text = self.text
+        self.keys = array(
+            "I",
+            sorted(
+                (
+                    match.start()
+                    for match in re.finditer(r"(?:^|(?<=[\x00 ]))[^\x00 ]", text)
+                ),
+                key=lambda key: text[key : text.index(SEPARATOR, key)],
+            ),
+        )
+        self.build_time = time.perf_counter() - start_time
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def nbytes(self):
+        """
+        Approximate memory footprint in bytes.
+        """
+        arrays = (self.keys, self.starts, self.name_starts, self.kinds, self.ids)
+        return (
+            sys.getsizeof(self.text)
+            + sys.getsizeof(self.names)
+            + sum(sys.getsizeof(values) for values in arrays)
+        )
+
+    def search(self, query, limit=10):
+        """
+        Return up to `limit` (kind, id, name) whose name has a word starting
+        with `query`, ordered by the matched text.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        text, keys = self.text, self.keys
+        size = len(prefix)
+
+        # first key whose text is >= prefix
+        low, high = 0, len(keys)
+        while low < high:
+            middle = (low + high) // 2
+            if text[keys[middle] : keys[middle] + size] < prefix:
+                low = middle + 1
+            else:
+                high = middle
+
+        results, seen = [], set()
+        for position in range(low, len(keys)):
+            key = keys[position]
+            if text[key : key + size] != prefix:
+                break
+            entry = bisect_right(self.starts, key) - 1
+            if entry in seen:
+                continue
+            seen.add(entry)
+            results.append(
+                (KINDS[self.kinds[entry]], self.ids[entry], self.name(entry))
+            )
+            if len(results) == limit:
+                break
+        return results
+
+    def name(self, entry):
+        start = self.name_starts[entry]
+        return self.names[start : self.names.index(SEPARATOR, start)]
+
+    def get_stats(self):
+        return {
+            "entries": len(self),
+            "keys": len(self.keys),
+            "bytes": self.nbytes,
+            "build_time": self.build_time,
+        }
+
+
+def build_index(election_id):
+    candidates = (
+        Candidate.objects.on_list()
+        .filter(election_id=election_id)
+        .values_list("id", "full_name")
+    )
+    organizations = (
+        PoliticalOrganization.objects.filter(
+            relelectionprocesselectiontype__election_process_id=election_id
+        )
+        .distinct()
+        .values_list("id", "name")
+    )
+    entries = [(POLITICAL_ORGANIZATION, pk, name) for pk, name in organizations]
+    entries.extend((CANDIDATE, pk, name) for pk, name in candidates.iterator())
+    return PrefixIndex(entries)
+
+
+# election id => (data version, index) of this process
+_indexes = {}
+_lock = threading.Lock()
+
+
+def get_index(election_id):
+    """
+    Return the index of an election at its current data version, building it
+    if needed, or None when the election doesn't exist.
+    """
+    data_version = get_data_version(election_id)
+    if data_version is None:
+        return None
+    cached = _indexes.get(election_id)
+    if cached is not None and cached[0] == data_version.version:
+        return cached[1]
+
+    # a single thread builds it, the others wait and reuse it
+    with _lock:
+        cached = _indexes.get(election_id)
+        if cached is not None and cached[0] == data_version.version:
+            return cached[1]
+        index = build_index(election_id)
+        _indexes[election_id] = (data_version.version, index)
+    logger.info(
+        "Built autocomplete index of election %s v%s: %s entries, %s keys, "
+        "%s bytes in %.3fs",
+        election_id,
+        data_version.version,
+        len(index),
+        len(index.keys),
+        index.nbytes,
+        index.build_time,
+    )
+    return index
+
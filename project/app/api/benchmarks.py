@@ -0,0 +1,100 @@
+"""
+Request mix and statistics of the API benchmarks.
+
+benchmark_api replays a seeded mix of API requests in process, without a
+server or network, and loadtest_api sends requests to a running server.
+Both report latencies with `summarize()`, so their JSON output can be diffed
+between commits.
+"""
+import random
+
+from app.elections.managers import LEADERBOARD_METRICS
+from app.elections.models import Candidate, RelElectionProcessElectionType
+from app.shared.metrics import percentile
+
+from .stats import DIMENSIONS as STATS_DIMENSIONS
+
+PERCENTILES = (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+ORDERINGS = ("-ts", "ts", "-tps", "-tos", "-ti", "ti")
+
+# name => (weight, path); the placeholders are filled by `build_requests()`
+REQUEST_MIX = {
+    "election": (5, "/api/elections/{election}/"),
+    "bootstrap": (10, "/api/elections/{election}/bootstrap/"),
+    "candidates": (15, "/api/elections/{election}/candidates/"),
+    "candidates_filtered": (
+        15,
+        "/api/elections/{election}/candidates/?et={election_type}&po={organization}",
+    ),
+    "candidates_ordered": (10, "/api/elections/{election}/candidates/?o={ordering}"),
+    "candidates_cursor": (
+        5,
+        "/api/elections/{election}/candidates/?cursor=&o={ordering}",
+    ),
+    "candidates_fields": (
+        5,
+        "/api/elections/{election}/candidates/?fields=id,full_name,"
+        "political_organization",
+    ),
+    "candidates_search": (10, "/api/elections/{election}/candidates/?q={surname}"),
+    "candidate": (10, "/api/elections/{election}/candidates/{candidate}/"),
+    "autocomplete": (5, "/api/elections/{election}/autocomplete/?q={prefix}"),
+    "stats": (5, "/api/elections/{election}/stats/{dimension}/"),
+    "leaderboards": (5, "/api/elections/{election}/leaderboards/{metric}/"),
+}
+
+
+def summarize(latencies):
+    """
+    Return the latency percentiles, in milliseconds, of `latencies` (seconds).
+    """
+    latencies = sorted(latencies)
+    return {
+        key: None if value is None else round(value * 1000, 2)
+        for key, value in (
+            (key, percentile(latencies, fraction)) for key, fraction in PERCENTILES
+        )
+    }
+
+
+def build_requests(election, count, seed=0, mix=None):
+    """
+    Return `count` (name, path) requests to the API of `election` drawn from
+    `mix` (REQUEST_MIX by default). The same seed and data give the same
+    requests.
+    """
+    mix = mix or REQUEST_MIX
+    rnd = random.Random(seed)
+    candidates = Candidate.objects.on_list().filter(election=election)
+    rels = RelElectionProcessElectionType.objects.filter(election_process=election)
+    pairs = list(
+        rels.filter(political_organizations__isnull=False)
+        .order_by("election_type_id", "political_organizations")
+        .values_list("election_type_id", "political_organizations")
+    )
+    candidate_ids = list(candidates.order_by("pk").values_list("pk", flat=True))
+    surnames = sorted(
+        set(candidates.order_by("pk").values_list("person__surname", flat=True)[:1000])
+    )
+    if not candidate_ids:
+        raise ValueError(f"{election} has no candidates on list")
+
+    names = sorted(mix)
+    weights = [mix[name][0] for name in names]
+    requests = []
+    for name in rnd.choices(names, weights, k=count):
+        election_type, organization = rnd.choice(pairs) if pairs else ("", "")
+        surname = rnd.choice(surnames).lower()
+        path = mix[name][1].format(
+            election=election.pk,
+            election_type=election_type,
+            organization=organization,
+            ordering=rnd.choice(ORDERINGS),
+            surname=surname,
+            prefix=surname[:3],
+            candidate=rnd.choice(candidate_ids),
+            dimension=rnd.choice(sorted(STATS_DIMENSIONS)),
+            metric=rnd.choice(LEADERBOARD_METRICS),
+        )
+        requests.append((name, path))
+    return requests
@@ -0,0 +1,232 @@
+"""
+Response cache and conditional requests for the read-only API.
+
+Every response is identified by the request path, the normalized query
+parameters that affect it and the data version of its election (see
+app.elections.versions). That identity is used both as cache key and as
+ETag. The import commands bump the version, so neither a cached response nor
+an ETag outlives the data it was built from.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from app.elections.versions import ALL_ELECTIONS, get_data_version
+
+STATS_KEY = "api:cache:{}"
+
+# query parameters that change the response of the cached endpoints
+CACHE_QUERY_PARAMS = (
+    "et",
+    "po",
+    "ed",
+    "q",
+    "o",
+    "limit",
+    "offset",
+    "cursor",
+    "fields",
+    "exclude",
+    "sections",
+)
+
+
+def get_cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def get_election_id(view):
+    """
+    Return the id of the election served by a view (from the URL kwarg named
+    by its `election_lookup_kwarg`), ALL_ELECTIONS when the URL doesn't point
+    to a single election, or None when the kwarg is not a valid id.
+    """
+    lookup_kwarg = getattr(view, "election_lookup_kwarg", "election_pk")
+    if lookup_kwarg not in view.kwargs:
+        return ALL_ELECTIONS
+    try:
+        return int(view.kwargs[lookup_kwarg])
+    except (TypeError, ValueError):
+        return None
+
+
+def get_response_version(view, request, data_version=None):
+    """
+    Return (data version, digest) identifying the response to `request`, or
+    None when the response is not tied to a known election. The version is
+    the election's unless given.
+    """
+    election_id = get_election_id(view)
+    if election_id is None:
+        return None
+    if data_version is None:
+        data_version = get_data_version(election_id)
+    if data_version is None:
+        return None
+
+    params = sorted(
+        (key, value)
+        for key in CACHE_QUERY_PARAMS
+        for value in request.query_params.getlist(key)
+    )
+    raw_key = "|".join(
+        [
+            str(election_id),
+            str(data_version.version),
+            request.path,
+            repr(params),
+            request.accepted_media_type or "",
+        ]
+    )
+    return data_version, hashlib.md5(raw_key.encode("utf-8")).hexdigest()
+
+
+def record(event):
+    cache = get_cache()
+    key = STATS_KEY.format(event)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # first event since the counter was created or evicted
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_stats():
+    cache = get_cache()
+    return {event: cache.get(STATS_KEY.format(event)) or 0 for event in ("hit", "miss")}
+
+
+def set_validators(response, data_version, digest):
+    response["ETag"] = quote_etag(digest)
+    if data_version.updated_at is not None:
+        response["Last-Modified"] = http_date(data_version.updated_at.timestamp())
+
+
+def get_not_modified(request, data_version, digest):
+    """
+    Return the response to a conditional request whose validators match the
+    version (304, or 412 for unsafe methods), None when it must be served.
+    """
+    validators = HttpResponse()
+    set_validators(validators, data_version, digest)
+    response = get_conditional_response(
+        request,
+        etag=validators["ETag"],
+        last_modified=data_version.updated_at
+        and int(data_version.updated_at.timestamp()),
+        response=validators,
+    )
+    return None if response is validators else response
+
+
+def versioned_response(func):
+    """
+    Serve a viewset action's JSON response according to the election's data
+    version:
+
+    - ETag and Last-Modified headers are derived from the version, so
+      conditional requests get a 304 before the action runs at all
+      (API_CONDITIONAL_REQUESTS).
+    - The rendered response is cached under the version (API_CACHE_ENABLED).
+
+    Other renderers (the browsable API) and non 200 responses are left alone.
+    """
+
+    @wraps(func)
+    def wrapper(view, request, *args, **kwargs):
+        conditional = settings.API_CONDITIONAL_REQUESTS
+        cached = settings.API_CACHE_ENABLED
+        if not (conditional or cached) or not isinstance(
+            request.accepted_renderer, JSONRenderer
+        ):
+            return func(view, request, *args, **kwargs)
+
+        response_version = get_response_version(view, request)
+        if response_version is None:
+            return func(view, request, *args, **kwargs)
+        data_version, digest = response_version
+
+        if conditional:
+            response = get_not_modified(request, data_version, digest)
+            if response is not None:
+                return response
+
+        if cached:
+            cache = get_cache()
+            key = f"api:response:{digest}"
+            content = cache.get(key)
+            if content is not None:
+                record("hit")
+                response = HttpResponse(*content)
+                response["X-Cache"] = "HIT"
+                if conditional:
+                    set_validators(response, data_version, digest)
+                return response
+            record("miss")
+
+        response = func(view, request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+
+        if cached:
+            # render now (finalize_response won't render it again) to cache it
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = view.get_renderer_context()
+            response.render()
+            cache.set(
+                key,
+                (response.rendered_content, response["Content-Type"]),
+                timeout=settings.API_CACHE_TIMEOUT,
+            )
+            response["X-Cache"] = "MISS"
+        if conditional:
+            set_validators(response, data_version, digest)
+        return response
+
+    return wrapper
+
+
+def conditional_response(func=None, *, get_version=None):
+    """
+    Send ETag and Last-Modified headers derived from the data version on a
+    viewset action whose response isn't cached (streamed, a file, built in
+    memory...), and answer conditional requests with a 304 before the action
+    runs (API_CONDITIONAL_REQUESTS). Any renderer.
+
+    `get_version(view, request, **kwargs)` returns the DataVersion to use
+    instead of the election's, or None to send no validators.
+    """
+    if func is None:
+        return lambda func: conditional_response(func, get_version=get_version)
+
+    @wraps(func)
+    def wrapper(view, request, *args, **kwargs):
+        if not settings.API_CONDITIONAL_REQUESTS:
+            return func(view, request, *args, **kwargs)
+
+        data_version = None
+        if get_version is not None:
+            data_version = get_version(view, request, **kwargs)
+            if data_version is None:
+                return func(view, request, *args, **kwargs)
+        response_version = get_response_version(view, request, data_version)
+        if response_version is None:
+            return func(view, request, *args, **kwargs)
+
+        response = get_not_modified(request, *response_version)
+        if response is not None:
+            return response
+        response = func(view, request, *args, **kwargs)
+        if response.status_code == 200:
+            set_validators(response, *response_version)
+        return response
+
+    return wrapper
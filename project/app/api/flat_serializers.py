@@ -0,0 +1,268 @@
+"""
+Serializers that build candidate rows straight from `values_list()` tuples.
+
+They skip the DRF field machinery (and model instantiation) but emit exactly
+the same fields, in the same order and with the same values, as
+CandidateSerializer and CandidateDetailSerializer, so both paths render to the
+same bytes.
+"""
+
+from collections import defaultdict
+
+from django.core.exceptions import FieldDoesNotExist
+
+from app.elections.models import PHOTO_BASE_URL, Candidate, CandidateListing
+
+from .serializers import (
+    CandidateSerializer,
+    ImmovablePropertySerializer,
+    MovablePropertySerializer,
+    ObligationSentenceSerializer,
+    PartisanPositionSerializer,
+    PenalSentenceSerializer,
+    PostgraduateEducationSerializer,
+    ProfessionalExperienceSerializer,
+    UniversityEducationSerializer,
+)
+
+
+class FlatRows:
+    """
+    Maps the fields of a ModelSerializer to `values_list()` lookups.
+
+    Scalar fields become a single lookup. Foreign keys serialized with
+    `depth = 1` become one lookup per concrete field of the related model and
+    are rebuilt as a nested dict (or None when the relation is empty). A
+    source can also be a {key: lookup} dict to build a nested dict from
+    arbitrary columns.
+    """
+
+    def __init__(self, model, fields, sources=None, transforms=None):
+        sources = sources or {}
+        transforms = transforms or {}
+        self.model, self.fields = model, list(fields)
+        self.sources, self.transforms = sources, transforms
+        self._selections = {}
+        self.lookups = []
+        self.slots = []
+        for name in fields:
+            start = len(self.lookups)
+            field = None if name in sources else _get_field(model, name)
+            if isinstance(sources.get(name), dict):
+                self.lookups.extend(sources[name].values())
+                self.slots.append((name, start, list(sources[name]), None))
+            elif field is not None and field.many_to_one:
+                keys = [f.name for f in field.related_model._meta.concrete_fields]
+                self.lookups.extend(f"{name}__{key}" for key in keys)
+                self.slots.append((name, start, keys, None))
+            else:
+                self.lookups.append(sources.get(name, name))
+                self.slots.append((name, start, None, transforms.get(name)))
+
+    def select(self, fields):
+        """
+        Return the rows restricted to `fields`, in their original order.
+        """
+        key = frozenset(fields)
+        if key not in self._selections:
+            self._selections[key] = FlatRows(
+                self.model,
+                [name for name in self.fields if name in key],
+                self.sources,
+                self.transforms,
+            )
+        return self._selections[key]
+
+    @property
+    def columns(self):
+        """
+        Flat column names, with nested keys as `field.key`.
+        """
+        columns = []
+        for name, start, keys, transform in self.slots:
+            if keys is None:
+                columns.append(name)
+            else:
+                columns.extend(f"{name}.{key}" for key in keys)
+        return columns
+
+    def build(self, values):
+        row = {}
+        for name, start, keys, transform in self.slots:
+            if keys is not None:
+                if values[start] is None:
+                    row[name] = None
+                else:
+                    row[name] = dict(zip(keys, values[start : start + len(keys)]))
+            elif transform is not None:
+                row[name] = transform(values[start])
+            else:
+                row[name] = values[start]
+        return row
+
+
+def _get_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _get_candidate_sources():
+    sources = {
+        "first_name": "person__first_name",
+        "surname": "person__surname",
+        "second_surname": "person__second_surname",
+        "gender": "person__gender",
+        "dni": "person__dni",
+        "birth_date": "person__birth_date",
+        "photo_url": "photo_url_path",
+    }
+    # every other method field of CandidateSerializer reads the CV
+    for name in CandidateSerializer._declared_fields:
+        sources.setdefault(name, f"cv__{name}")
+    return sources
+
+
+CANDIDATE_ROWS = FlatRows(
+    Candidate,
+    CandidateSerializer.Meta.fields,
+    sources=_get_candidate_sources(),
+    transforms={"photo_url": lambda path: f"{PHOTO_BASE_URL}{path}"},
+)
+
+CANDIDATE_LISTING_ROWS = FlatRows(
+    CandidateListing,
+    CandidateSerializer.Meta.fields,
+    sources={
+        "id": "candidate_id",
+        "photo_url": "photo_url_path",
+        "position": {
+            "id": "position_id",
+            "name": "position_name",
+            "jne_id": "position_jne_id",
+        },
+        "political_organization": {
+            "id": "political_organization_id",
+            "name": "political_organization_name",
+            "jne_id": "political_organization_jne_id",
+        },
+        "electoral_district": {
+            "id": "electoral_district_id",
+            "name": "electoral_district_name",
+            "ubigeo": "electoral_district_ubigeo",
+        },
+        "election_type": {
+            "id": "election_type_id",
+            "name": "election_type_name",
+            "jne_id": "election_type_jne_id",
+        },
+    },
+    transforms={"photo_url": lambda path: f"{PHOTO_BASE_URL}{path}"},
+)
+
+CV_SECTION_ROWS = {
+    name: (
+        serializer.Meta.model,
+        FlatRows(serializer.Meta.model, serializer.Meta.fields),
+    )
+    for name, serializer in (
+        ("penal_sentences", PenalSentenceSerializer),
+        ("obligation_sentences", ObligationSentenceSerializer),
+        ("professional_experiences", ProfessionalExperienceSerializer),
+        ("university_educations", UniversityEducationSerializer),
+        ("postgraduate_educations", PostgraduateEducationSerializer),
+        ("movable_properties", MovablePropertySerializer),
+        ("immovable_properties", ImmovablePropertySerializer),
+        ("partisan_positions", PartisanPositionSerializer),
+    )
+}
+
+
+class FlatCandidateSerializer:
+    """
+    Flat counterpart of CandidateSerializer. `queryset` must be a Candidate
+    queryset; any filtering, ordering or slicing applied to it is kept.
+    """
+
+    rows = CANDIDATE_ROWS
+    lookups = CANDIDATE_ROWS.lookups
+    columns = CANDIDATE_ROWS.columns
+
+    def __init__(self, queryset, fields=None):
+        """
+        `fields` restricts the output (and the columns read) to those names.
+        """
+        self.queryset = queryset
+        if fields is not None:
+            self.rows = self.rows.select(fields)
+            self.lookups = self.rows.lookups
+            self.columns = self.rows.columns
+
+    def to_representation(self, values_iterable):
+        build = self.rows.build
+        return [build(values) for values in values_iterable]
+
+    @property
+    def data(self):
+        return self.to_representation(self.queryset.values_list(*self.lookups))
+
+
+class FlatCandidateListingSerializer(FlatCandidateSerializer):
+    """
+    Same output as FlatCandidateSerializer, read from a CandidateListing
+    queryset instead.
+    """
+
+    rows = CANDIDATE_LISTING_ROWS
+    lookups = CANDIDATE_LISTING_ROWS.lookups
+
+
+class FlatCandidateDetailSerializer(FlatCandidateSerializer):
+    """
+    Flat counterpart of CandidateDetailSerializer. CV sections are loaded with
+    one query per section for all the candidates at once.
+    """
+
+    # the CV id travels as the last value of each tuple
+    lookups = CANDIDATE_ROWS.lookups + ["cv_id"]
+    columns = CANDIDATE_ROWS.columns + list(CV_SECTION_ROWS)
+    sections = list(CV_SECTION_ROWS)
+
+    def __init__(self, queryset, fields=None):
+        super().__init__(queryset, fields)
+        if fields is not None:
+            self.sections = [name for name in CV_SECTION_ROWS if name in fields]
+            self.lookups = self.rows.lookups + ["cv_id"]
+            self.columns = self.rows.columns + self.sections
+
+    def get_cv_sections(self, cv_ids):
+        """
+        Return {section: {cv_id: [rows]}} for the given CVs.
+        """
+        cv_sections = {}
+        for name in self.sections:
+            model, rows = CV_SECTION_ROWS[name]
+            grouped = defaultdict(list)
+            if cv_ids:
+                queryset = model.objects.filter(cv_id__in=cv_ids).values_list(
+                    "cv_id", *rows.lookups
+                )
+                for values in queryset:
+                    grouped[values[0]].append(rows.build(values[1:]))
+            cv_sections[name] = grouped
+        return cv_sections
+
+    def to_representation(self, values_iterable, cv_sections=None):
+        values_list = list(values_iterable)
+        if cv_sections is None:
+            cv_sections = self.get_cv_sections(
+                [values[-1] for values in values_list if values[-1] is not None]
+            )
+
+        data = super().to_representation(values[:-1] for values in values_list)
+        for row, values in zip(data, values_list):
+            cv_id = values[-1]
+            for name in self.sections:
+                row[name] = cv_sections[name].get(cv_id, []) if cv_id else []
+        return data
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from app.api.cache import get_stats
+
+
+class Command(BaseCommand):
+    help = "Print the hit and miss counters of the API response cache"
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        total = stats["hit"] + stats["miss"]
+        ratio = stats["hit"] / total if total else 0
+        self.stdout.write(f"Hits: {stats['hit']}")
+        self.stdout.write(f"Misses: {stats['miss']}")
+        self.stdout.write(f"Hit ratio: {ratio:.1%}")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from app.api import autocomplete
+from app.elections.models import ElectionProcess
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the autocomplete index of each election and print its size, "
+        "memory footprint and build time (what every API worker holds)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--election_process",
+            help="Only build the index of the election process with this JNE id",
+        )
+
+    def handle(self, *args, **options):
+        elections = ElectionProcess.objects.all()
+        if options["election_process"]:
+            elections = elections.filter(jne_id=options["election_process"])
+        total = 0
+        for election in elections:
+            index = autocomplete.get_index(election.id)
+            stats = index.get_stats()
+            total += stats["bytes"]
+            self.stdout.write(
+                f"{election.name}: {stats['entries']} names, {stats['keys']} keys, "
+                f"{stats['bytes'] / 1024:,.1f} KiB, built in "
+                f"{stats['build_time'] * 1000:,.1f} ms"
+            )
+        self.stdout.write(f"Total: {total / 1024:,.1f} KiB per worker")
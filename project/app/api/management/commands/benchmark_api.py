@@ -0,0 +1,181 @@
+import json
+import subprocess
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from app.api.benchmarks import REQUEST_MIX, build_requests, summarize
+from app.elections.models import Candidate, ElectionProcess
+from app.shared.metrics import QueryStats, record_queries
+
+# settings that change how the API serves requests
+REPORTED_SETTINGS = (
+    "DEBUG",
+    "API_FLAT_SERIALIZATION",
+    "API_CANDIDATE_LISTING",
+    "API_CACHE_ENABLED",
+    "API_CONDITIONAL_REQUESTS",
+    "API_ASYNC_VIEWS",
+    "DATABASE_CONN_MAX_AGE",
+    "METRICS_ENABLED",
+)
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a seeded mix of API requests in process (no server or network "
+        "needed) and print the throughput, latency percentiles and SQL queries "
+        "per request of each endpoint as JSON, to diff between commits. Create "
+        "data with generate_synthetic_election first. Queries run by "
+        "API_ASYNC_VIEWS threads are not counted"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--election_process",
+            help="JNE id of the election to query (default: the latest created)",
+        )
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument(
+            "--warmup", type=int, default=100, help="Unmeasured requests sent first"
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=1, help="Threads sending requests"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--only",
+            action="append",
+            choices=sorted(REQUEST_MIX),
+            help="Only send this kind of request (repeatable)",
+        )
+        parser.add_argument("--output", help="Write the report to this file too")
+
+    def handle(self, *args, **options):
+        elections = ElectionProcess.objects.order_by("-pk")
+        if options["election_process"]:
+            elections = elections.filter(jne_id=options["election_process"])
+        election = elections.first()
+        if election is None:
+            raise CommandError("No election process found")
+
+        mix = REQUEST_MIX
+        if options["only"]:
+            mix = {name: REQUEST_MIX[name] for name in options["only"]}
+        try:
+            requests = build_requests(
+                election,
+                options["warmup"] + options["requests"],
+                options["seed"],
+                mix,
+            )
+        except ValueError as e:
+            raise CommandError(e)
+        warmup, requests = requests[: options["warmup"]], requests[options["warmup"] :]
+
+        # Client requests use the `testserver` host
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            self.run(warmup, 1)
+            results, elapsed = self.run(requests, options["concurrency"])
+
+        report = {
+            "commit": get_commit(),
+            "created": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "settings": {name: getattr(settings, name) for name in REPORTED_SETTINGS},
+            "election": {
+                "id": election.pk,
+                "jne_id": election.jne_id,
+                "candidates": Candidate.objects.filter(election=election).count(),
+            },
+            "seed": options["seed"],
+            "concurrency": options["concurrency"],
+            "duration": round(elapsed, 3),
+            "overall": self.summarize(results, elapsed),
+            "endpoints": {
+                name: self.summarize(
+                    [result for result in results if result[0] == name]
+                )
+                for name in sorted(mix)
+            },
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        self.stdout.write(output)
+
+    def run(self, requests, concurrency):
+        """
+        Send `requests` from `concurrency` threads, return the results
+        [(name, status, latency, queries)] and the time it took.
+        """
+        results = []
+        lock = threading.Lock()
+        pending = iter(requests)
+
+        def worker():
+            client = Client()
+            try:
+                while True:
+                    with lock:
+                        request = next(pending, None)
+                    if request is None:
+                        return
+                    name, path = request
+                    stats = QueryStats()
+                    start = time.perf_counter()
+                    with record_queries(stats):
+                        response = client.get(path)
+                        if response.streaming:
+                            b"".join(response.streaming_content)
+                    latency = time.perf_counter() - start
+                    with lock:
+                        results.append(
+                            (name, response.status_code, latency, stats.count)
+                        )
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - start
+
+    def summarize(self, results, elapsed=None):
+        if not results:
+            return {"requests": 0}
+        summary = {
+            "requests": len(results),
+            "errors": sum(status >= 400 for _, status, _, _ in results),
+            "statuses": dict(Counter(str(status) for _, status, _, _ in results)),
+            "latency_ms": summarize(latency for _, _, latency, _ in results),
+            "queries_per_request": round(
+                sum(queries for _, _, _, queries in results) / len(results), 2
+            ),
+        }
+        if elapsed:
+            summary["throughput"] = round(len(results) / elapsed, 2)
+        return summary
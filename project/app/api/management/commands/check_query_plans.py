@@ -0,0 +1,137 @@
+import itertools
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from app.api.views import CandidateViewSet
+from app.elections.models import (
+    Candidate,
+    CandidateListing,
+    CurriculumVitae,
+    ElectionProcess,
+)
+from app.elections.synthetic import ElectionGenerator
+
+# full table scans in EXPLAIN output (PostgreSQL and SQLite)
+SEQ_SCAN_PATTERNS = (
+    re.compile(r"Seq Scan on (\w+)"),
+    re.compile(r"\bSCAN (?:TABLE )?(\w+)(?! USING (?:COVERING )?INDEX)\b"),
+)
+ORDERINGS = [None] + [
+    f"{direction}{alias}"
+    for alias in ("ts", "tps", "tos", "ti")
+    for direction in ("", "-")
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the candidate list query for every supported filter and "
+        "ordering combination and fail if any of them scans the whole candidate "
+        "tables. Runs on a synthetic dataset that is rolled back afterwards, or "
+        "on an existing election"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--election_process",
+            help="Check against the data of this election (JNE id) instead",
+        )
+        parser.add_argument("--elections", type=int, default=20)
+        parser.add_argument("--candidates", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--verbose-plans", action="store_true", help="Print every plan"
+        )
+
+    def handle(self, *args, **options):
+        self.verbose_plans = options["verbose_plans"]
+        if options["election_process"]:
+            election = ElectionProcess.objects.get(jne_id=options["election_process"])
+            failures = self.check_election(election)
+        else:
+            try:
+                with transaction.atomic():
+                    election = self.build_dataset(
+                        options["seed"], options["elections"], options["candidates"]
+                    )
+                    failures = self.check_election(election)
+                    raise Rollback
+            except Rollback:
+                pass
+
+        if failures:
+            raise CommandError(f"{failures} queries scan a whole candidate table")
+        self.stdout.write("No sequential scans on the candidate tables")
+
+    def check_election(self, election):
+        tables = {Candidate._meta.db_table, CandidateListing._meta.db_table}
+        candidates = Candidate.objects.on_list().filter(election=election)
+        election_type_id = candidates.values_list("election_type", flat=True).first()
+        organization_id = candidates.values_list(
+            "political_organization", flat=True
+        ).first()
+        filters = [
+            {},
+            {"et": election_type_id},
+            {"po": organization_id},
+            {"et": election_type_id, "po": organization_id},
+            {"q": "quispe"},
+            {"q": "quispe", "et": election_type_id},
+        ]
+
+        failures = 0
+        for listing, params, ordering in itertools.product(
+            (False, True), filters, ORDERINGS
+        ):
+            params = dict(params, o=ordering) if ordering else params
+            plan = self.explain(election, params, listing)
+            scans = tables.intersection(
+                table
+                for pattern in SEQ_SCAN_PATTERNS
+                for table in pattern.findall(plan)
+            )
+            label = f"{'listing' if listing else 'candidate'} {params}"
+            if scans:
+                failures += 1
+                self.stdout.write(f"SEQ SCAN {label}: {', '.join(sorted(scans))}")
+            else:
+                self.stdout.write(f"ok       {label}")
+            if scans or self.verbose_plans:
+                self.stdout.write(plan)
+        return failures
+
+    def explain(self, election, params, listing):
+        # build the page query the same way the list action does
+        with override_settings(API_CANDIDATE_LISTING=listing):
+            view = CandidateViewSet(
+                action_map={"get": "list"},
+                kwargs={"election_pk": election.pk},
+                format_kwarg=None,
+            )
+            view.request = view.initialize_request(APIRequestFactory().get("/", params))
+            queryset = view.filter_queryset(view.get_queryset())
+            return queryset[: view.paginator.default_limit].explain()
+
+    def build_dataset(self, seed, elections, candidates):
+        """
+        Create `elections` synthetic elections with `candidates` candidates
+        each and return the last one.
+        """
+        self.stdout.write(f"Building {elections * candidates} synthetic candidates")
+        generator = ElectionGenerator(seed=seed)
+        for _ in range(elections):
+            election = generator.build_election(candidates)
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                for model in (Candidate, CandidateListing, CurriculumVitae):
+                    cursor.execute(f"ANALYZE {model._meta.db_table}")
+        return election
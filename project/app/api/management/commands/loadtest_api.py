@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.api.benchmarks import summarize
+
+DEFAULT_PATHS = (
+    "/api/elections/{election}/",
+    "/api/elections/{election}/bootstrap/",
+    "/api/elections/{election}/candidates/",
+    "/api/elections/{election}/candidates/?o=-ti",
+    "/api/elections/{election}/candidates/?fields=id,full_name",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Send concurrent GET requests to a running server (WSGI or ASGI) for a "
+        "fixed time and print its throughput and latency percentiles as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("base_url", help="e.g. http://localhost:8000")
+        parser.add_argument("--election", type=int, default=1, help="Election id")
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="Path to request, `{election}` is replaced (repeatable)",
+        )
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--duration", type=float, default=30, help="Seconds")
+        parser.add_argument("--timeout", type=float, default=30, help="Seconds")
+
+    def handle(self, *args, **options):
+        base_url = options["base_url"].rstrip("/")
+        urls = [
+            base_url + path.format(election=options["election"])
+            for path in options["paths"] or DEFAULT_PATHS
+        ]
+        deadline = time.perf_counter() + options["duration"]
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def worker(offset):
+            # each client walks the paths in turn, starting at a different one
+            position = offset
+            while time.perf_counter() < deadline:
+                url = urls[position % len(urls)]
+                position += 1
+                start = time.perf_counter()
+                try:
+                    with urlopen(url, timeout=options["timeout"]) as response:
+                        response.read()
+                    error = None
+                except HTTPError as e:
+                    error = f"HTTP {e.code}"
+                except (URLError, OSError) as e:
+                    error = str(e)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    (errors if error else latencies).append(error or elapsed)
+
+        threads = [
+            threading.Thread(target=worker, args=(i,), daemon=True)
+            for i in range(options["concurrency"])
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if not latencies:
+            raise CommandError(f"Every request failed: {errors[:1]}")
+
+        report = {
+            "base_url": base_url,
+            "concurrency": options["concurrency"],
+            "duration": round(elapsed, 3),
+            "requests": len(latencies),
+            "errors": len(errors),
+            "throughput": round(len(latencies) / elapsed, 2),
+            "latency_ms": summarize(latencies),
+        }
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from app.api import replicas
+
+
+class Command(BaseCommand):
+    help = "Print how far behind the primary each read replica is"
+
+    def handle(self, *args, **options):
+        lag = replicas.get_replication_lag()
+        if not lag:
+            self.stdout.write("No read replicas configured")
+        for alias, seconds in lag.items():
+            if seconds is None:
+                self.stdout.write(f"{alias}: lag unknown")
+            else:
+                self.stdout.write(f"{alias}: {seconds:.3f}s behind the primary")
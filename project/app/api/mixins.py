@@ -0,0 +1,36 @@
+from . import replicas
+
+
+class QueryPlanMixin:
+    """
+    Declare, per viewset action, which relations are joined or prefetched and
+    how many SQL queries a single request is allowed to run.
+
+    `query_plans` maps an action name to a callable that receives the base
+    queryset and returns the optimized one. `query_budgets` maps an action name
+    to the maximum number of queries of a request, checked by the test suite
+    (app.api.tests.test_query_budget).
+    """
+
+    query_plans = {}
+    query_budgets = {}
+
+    def get_query_plan(self):
+        return self.query_plans.get(self.action)
+
+    def apply_query_plan(self, queryset):
+        plan = self.get_query_plan()
+        if plan is None:
+            return queryset
+        return plan(queryset)
+
+
+class ReplicaReadMixin:
+    """
+    Run the queries of each request on a read replica, if any is configured
+    (see app.api.replicas).
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with replicas.reading(pinned=getattr(request, "pin_primary", False)):
+            return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,141 @@
+import json
+from base64 import b64decode, b64encode
+
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over (ordering value, pk) keys.
+
+    Unlike DRF's CursorPagination it doesn't fall back to offsets when many
+    rows share the same ordering value, so every page costs the same no
+    matter how deep it is. The ordering comes from the `o` parameter handled
+    by the view's filterset OrderingFilter (a single field). Rows with a NULL
+    ordering value always come last and the pk breaks ties.
+    """
+
+    ordering_query_param = "o"
+    page_size_query_param = "limit"
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering_param = request.query_params.get(self.ordering_query_param, "")
+        self.field, self.descending = self.get_ordering_field(view)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = self.cursor is not None and self.cursor["r"]
+        queryset = self.order_queryset(queryset, reverse)
+        if self.cursor is not None:
+            queryset = queryset.filter(
+                self.get_keyset_filter(self.cursor["v"], self.cursor["i"], reverse)
+            )
+
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def get_ordering_field(self, view):
+        ordering_filter = view.filterset_class.base_filters[self.ordering_query_param]
+        params = [p for p in self.ordering_param.split(",") if p]
+        if not params:
+            return None, False
+        if len(params) > 1:
+            raise ValidationError(
+                {self.ordering_query_param: "Cursor pagination orders by one field"}
+            )
+        param = params[0]
+        descending = param.startswith("-")
+        try:
+            return ordering_filter.param_map[param.lstrip("-")], descending
+        except KeyError:
+            raise ValidationError({self.ordering_query_param: "Invalid ordering"})
+
+    def order_queryset(self, queryset, reverse):
+        # the cursor position travels with every row as two trailing values
+        # (works for both model instances and values_list() tuples)
+        queryset = queryset.annotate(keyset_pk=F("pk"))
+        pk_ordering = "-pk" if reverse else "pk"
+        if self.field is None:
+            return queryset.annotate(keyset_value=F("pk")).order_by(pk_ordering)
+
+        descending = self.descending != reverse
+        ordering = F(self.field).desc if descending else F(self.field).asc
+        # nulls last on the way forward means nulls first on the way back
+        nulls = {"nulls_first": True} if reverse else {"nulls_last": True}
+        return queryset.annotate(keyset_value=F(self.field)).order_by(
+            ordering(**nulls), pk_ordering
+        )
+
+    def get_keyset_filter(self, value, pk, reverse):
+        pk_lookup = "pk__lt" if reverse else "pk__gt"
+        if self.field is None:
+            return Q(**{pk_lookup: pk})
+
+        isnull = Q(**{f"{self.field}__isnull": True})
+        if value is None:
+            if reverse:
+                # going back from the nulls block reaches every non null value
+                return (isnull & Q(**{pk_lookup: pk})) | ~isnull
+            return isnull & Q(**{pk_lookup: pk})
+
+        descending = self.descending != reverse
+        value_lookup = f"{self.field}__lt" if descending else f"{self.field}__gt"
+        keyset = Q(**{value_lookup: value}) | (
+            Q(**{self.field: value}) & Q(**{pk_lookup: pk})
+        )
+        if not reverse:
+            keyset |= isnull
+        return keyset
+
+    def get_position(self, row):
+        if isinstance(row, tuple):
+            return row[-1], row[-2]
+        return row.keyset_value, row.keyset_pk
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        value, pk = self.get_position(self.page[-1])
+        return self.encode_cursor({"v": value, "i": pk, "r": False})
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        value, pk = self.get_position(self.page[0])
+        return self.encode_cursor({"v": value, "i": pk, "r": True})
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(b64decode(encoded.encode("ascii")).decode("ascii"))
+            value, pk, reverse = cursor["v"], cursor["i"], cursor["r"]
+            ordering = cursor["o"]
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        # a cursor is only valid for the ordering it was created with
+        if (
+            ordering != self.ordering_param
+            or not isinstance(pk, int)
+            or not (value is None or isinstance(value, int))
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return {"v": value, "i": pk, "r": bool(reverse)}
+
+    def encode_cursor(self, cursor):
+        cursor = dict(cursor, o=self.ordering_param, r=int(cursor["r"]))
+        encoded = b64encode(json.dumps(cursor).encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
@@ -0,0 +1,135 @@
+import csv
+import io
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed.
+
+    The output is byte-identical to JSONRenderer: types orjson would encode
+    differently (dates, datetimes, decimals, lazy strings...) are delegated to
+    the DRF encoder, and any payload orjson can't handle falls back to the
+    stdlib encoder. The only exception are floats written in exponent notation
+    (`1e-08` vs `1e-8`), so only use it for payloads made of ints and strings.
+    """
+
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default, option=self.options
+            )
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # escape U+2028 and U+2029 the same way JSONRenderer does
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline delimited JSON. `stream()` encodes an iterable of rows lazily, one
+    line per row; `render()` is used for single payloads such as errors.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return FastJSONRenderer().render(data) + b"\n"
+
+    def stream(self, rows, header=None):
+        json_renderer = FastJSONRenderer()
+        for row in rows:
+            yield json_renderer.render(row) + b"\n"
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    CSV with one column per field. Nested objects are flattened into
+    `field.key` columns and lists (e.g. CV sections) are written as JSON.
+    """
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        return b"".join(self.stream(rows))
+
+    def get_header(self, row):
+        header = []
+        for key, value in row.items():
+            if isinstance(value, dict):
+                header.extend(f"{key}.{sub_key}" for sub_key in value)
+            else:
+                header.append(key)
+        return header
+
+    def stream(self, rows, header=None):
+        """
+        Encode `rows` lazily. Pass the `header` when the first row can't tell
+        every column (e.g. a nested object that may be null).
+        """
+        json_renderer = FastJSONRenderer()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        columns = None
+        for row in rows:
+            if columns is None:
+                header = header or self.get_header(row)
+                columns = [column.split(".", 1) for column in header]
+                writer.writerow(header)
+            values = []
+            for column in columns:
+                value = row.get(column[0])
+                if len(column) == 2:
+                    value = value[column[1]] if value else None
+                elif isinstance(value, list):
+                    value = json_renderer.render(value).decode("utf-8")
+                values.append(value)
+            writer.writerow(values)
+            yield buffer.getvalue().encode(self.charset)
+            buffer.seek(0)
+            buffer.truncate()
+
+
+class ParquetRenderer(BaseRenderer):
+    """
+    Lets clients ask for `application/vnd.apache.parquet`. The views return
+    the files themselves, so there is nothing to render but error payloads,
+    which have no Parquet representation and get an empty body.
+    """
+
+    media_type = "application/vnd.apache.parquet"
+    format = "parquet"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b""
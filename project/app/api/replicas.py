@@ -0,0 +1,115 @@
+"""
+Read replica routing for the API.
+
+When DATABASE_REPLICA_URLS is set, the replicas are added to DATABASES as
+`replica1`, `replica2`... and ReplicaRouter is installed. Queries only go to
+a replica inside `reading()`, which the API viewsets enter around each
+request (see ReplicaReadMixin): one replica is picked at random for the whole
+request. Everything else (import commands, the admin, migrations and every
+write) keeps using the primary (`default`).
+
+Read-your-writes: a write routed during a request pins the rest of it to the
+primary, and PrimaryPinningMiddleware pins the following requests of a
+client that sent a write for DATABASE_REPLICA_PIN_SECONDS.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = "pin_primary"
+
+_state = threading.local()
+
+
+def get_replicas():
+    return [alias for alias in settings.DATABASES if alias.startswith("replica")]
+
+
+@contextmanager
+def reading(pinned=False):
+    """
+    Route the reads of the current thread to a replica, or to the primary
+    when `pinned`.
+    """
+    replicas = get_replicas()
+    previous = getattr(_state, "alias", None)
+    _state.alias = (
+        DEFAULT_DB_ALIAS if pinned or not replicas else random.choice(replicas)
+    )
+    try:
+        yield _state.alias
+    finally:
+        _state.alias = previous
+
+
+def get_read_alias():
+    """
+    Alias the current thread reads from.
+    """
+    return getattr(_state, "alias", None) or DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return getattr(_state, "alias", None)
+
+    def db_for_write(self, model, **hints):
+        if getattr(_state, "alias", None) is not None:
+            # read your own writes for the rest of the request
+            _state.alias = DEFAULT_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinningMiddleware:
+    """
+    Send the requests of a client to the primary for a while after it sent
+    a write (any non safe method), using a short-lived cookie.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.pin_primary = PIN_COOKIE in request.COOKIES
+        response = self.get_response(request)
+        if request.method not in ("GET", "HEAD", "OPTIONS", "TRACE"):
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+def get_replication_lag():
+    """
+    Return {replica alias: seconds behind the primary}, None when it can't be
+    measured (not PostgreSQL). The lag is the time since the last replayed
+    transaction, so it also grows while the primary receives no writes.
+    """
+    lag = {}
+    for alias in get_replicas():
+        connection = connections[alias]
+        if connection.vendor != "postgresql":
+            lag[alias] = None
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT CASE WHEN pg_is_in_recovery() THEN COALESCE("
+                "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0"
+                ") ELSE 0 END"
+            )
+            lag[alias] = float(cursor.fetchone()[0])
+    return lag
@@ -15,6 +15,7 @@ from app.elections.models import (
     PoliticalOrganization,
     Position,
     ProfessionalExperience,
+    RelElectionProcessElectionType,
     UniversityEducation,
     PostgraduateEducation,
     MovableProperty,
@@ -53,6 +54,32 @@ class ElectoralDistrictSerializer(serializers.ModelSerializer):
         fields = ["name", "ubigeo"]
 
 
+class ElectionTypeOrganizationsSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source="election_type.id")
+    name = serializers.CharField(source="election_type.name")
+    jne_id = serializers.IntegerField(source="election_type.jne_id")
+    political_organizations = PoliticalOrganizationSerializer(many=True)
+
+    class Meta:
+        model = RelElectionProcessElectionType
+        fields = ["id", "name", "jne_id", "political_organizations"]
+
+
+class ElectionBootstrapSerializer(ElectionProcessSerializer):
+    election_types = ElectionTypeOrganizationsSerializer(
+        source="relelectionprocesselectiontype_set", many=True
+    )
+    positions = PositionSerializer(many=True)
+    electoral_districts = ElectoralDistrictSerializer(source="districts", many=True)
+
+    class Meta(ElectionProcessSerializer.Meta):
+        fields = ElectionProcessSerializer.Meta.fields + [
+            "election_types",
+            "positions",
+            "electoral_districts",
+        ]
+
+
 class PenalSentenceSerializer(serializers.ModelSerializer):
     class Meta:
         model = PenalSentence
@@ -123,7 +150,19 @@ class PartisanPositionSerializer(serializers.ModelSerializer):
         depth = 1
 
 
-class CandidateSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    Takes an optional `fields` argument with the names of the fields to keep.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class CandidateSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     first_name = serializers.SerializerMethodField()
     surname = serializers.SerializerMethodField()
     second_surname = serializers.SerializerMethodField()
@@ -205,7 +244,7 @@ class CandidateSerializer(serializers.ModelSerializer):
     def get_gender(self, obj: Candidate) -> str:
         return obj.person.gender
 
-    def get_dni(self, obj: Candidate) -> str:
+    def get_dni(self, obj: Candidate) -> Optional[str]:
         return obj.person.dni
 
     @extend_schema_field(OpenApiTypes.DATE)
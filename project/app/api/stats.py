@@ -0,0 +1,109 @@
+"""
+Aggregate statistics of the candidates of an election, grouped by one of
+their dimensions, computed with a single grouped query.
+"""
+from django.db import connections
+from django.db.models import Aggregate, Avg, Count, FloatField, Q, Sum
+
+from app.elections.models import Candidate, Gender
+
+# dimension => (id lookup, name lookup or None)
+DIMENSIONS = {
+    "political_organization": (
+        "political_organization_id",
+        "political_organization__name",
+    ),
+    "electoral_district": ("electoral_district_id", "electoral_district__name"),
+    "position": ("position_id", "position__name"),
+    "election_type": ("election_type_id", "election_type__name"),
+    "gender": ("person__gender", None),
+}
+
+# CurriculumVitae totals summarized for each group
+METRICS = (
+    "total_incomes",
+    "total_movable_immovable_properties_value",
+    "total_sentences",
+    "total_penal_sentences",
+    "total_obligation_sentences",
+)
+
+PERCENTILES = {"p50": 0.5, "p90": 0.9}
+
+GENDER_NAMES = dict(Gender.CHOICES)
+
+
+class Percentile(Aggregate):
+    """
+    Continuous percentile (PostgreSQL only).
+    """
+
+    function = "PERCENTILE_CONT"
+    name = "Percentile"
+    template = "%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)"
+    output_field = FloatField()
+
+    def __init__(self, expression, percentile, **extra):
+        super().__init__(expression, percentile=float(percentile), **extra)
+
+
+def _get_aggregates(with_percentiles):
+    aggregates = {
+        "candidates": Count("pk"),
+        "with_cv": Count("cv"),
+        "with_penal_sentences": Count("pk", filter=Q(cv__total_penal_sentences__gt=0)),
+        "with_obligation_sentences": Count(
+            "pk", filter=Q(cv__total_obligation_sentences__gt=0)
+        ),
+    }
+    for metric in METRICS:
+        aggregates[f"{metric}__sum"] = Sum(f"cv__{metric}")
+        aggregates[f"{metric}__avg"] = Avg(f"cv__{metric}")
+        if with_percentiles:
+            for key, percentile in PERCENTILES.items():
+                aggregates[f"{metric}__{key}"] = Percentile(f"cv__{metric}", percentile)
+    return aggregates
+
+
+def _round(value):
+    return None if value is None else round(float(value), 2)
+
+
+def get_stats(election_id, dimension):
+    """
+    Return one row per group of `dimension` with the number of candidates on
+    list and, for each CV total, its sum, average and percentiles (the latter
+    only on PostgreSQL) over the candidates that have a CV.
+    """
+    id_lookup, name_lookup = DIMENSIONS[dimension]
+    lookups = [id_lookup] + ([name_lookup] if name_lookup else [])
+    queryset = Candidate.objects.on_list().filter(election_id=election_id)
+    with_percentiles = connections[queryset.db].vendor == "postgresql"
+    rows = (
+        queryset.order_by()
+        .values(*lookups)
+        .annotate(**_get_aggregates(with_percentiles))
+        .order_by(*reversed(lookups))
+    )
+
+    stats = []
+    for row in rows:
+        group_id = row[id_lookup]
+        group = {
+            "id": group_id,
+            "name": row[name_lookup] if name_lookup else GENDER_NAMES.get(group_id),
+            "candidates": row["candidates"],
+            "with_cv": row["with_cv"],
+            "with_penal_sentences": row["with_penal_sentences"],
+            "with_obligation_sentences": row["with_obligation_sentences"],
+        }
+        for metric in METRICS:
+            total = row[f"{metric}__sum"]
+            group[metric] = {
+                "sum": None if total is None else int(total),
+                "avg": _round(row[f"{metric}__avg"]),
+            }
+            for key in PERCENTILES:
+                group[metric][key] = _round(row.get(f"{metric}__{key}"))
+        stats.append(group)
+    return stats
@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, Client, TransactionTestCase, override_settings
+from django.urls import include, path
+
+from app.api import urls as api_urls
+from app.api.async_views import as_async_patterns
+from app.elections.synthetic import ElectionGenerator
+
+# the API as served with API_ASYNC_VIEWS (app.api.urls reads it at import)
+urlpatterns = [path("api/", include(as_async_patterns(api_urls.urlpatterns)))]
+
+
+class ExportTest(TransactionTestCase):
+    """
+    The streamed exports under ASGI, where Django iterates the body on the
+    event loop. The pool threads of the async views need committed data.
+    """
+
+    def setUp(self):
+        generator = ElectionGenerator(
+            election_types=2, positions=2, organizations=5, districts=3
+        )
+        self.election = generator.build_election(60)
+        self.path = f"/api/elections/{self.election.pk}/candidates/export/"
+        list_path = f"/api/elections/{self.election.pk}/candidates/"
+        self.count = Client().get(list_path).json()["count"]
+
+    def get_bodies(self, query=""):
+        wsgi = Client().get(self.path + query)
+        self.assertEqual(wsgi.status_code, 200)
+        bodies = {"wsgi": b"".join(wsgi.streaming_content)}
+
+        async def get():
+            response = await AsyncClient().get(self.path + query)
+            self.assertEqual(response.status_code, 200)
+            return b"".join(response.streaming_content)
+
+        bodies["asgi"] = async_to_sync(get)()
+        with override_settings(ROOT_URLCONF=__name__):
+            bodies["asgi async views"] = async_to_sync(get)()
+        return bodies
+
+    def test_ndjson(self):
+        bodies = self.get_bodies()
+        rows = [json.loads(line) for line in bodies["wsgi"].splitlines()]
+        self.assertEqual(len(rows), self.count)
+        for name, body in bodies.items():
+            with self.subTest(name):
+                self.assertEqual(body, bodies["wsgi"])
+
+    def test_csv(self):
+        bodies = self.get_bodies("?format=csv&sections=1")
+        rows = list(csv.reader(io.StringIO(bodies["wsgi"].decode())))
+        self.assertEqual(len(rows), self.count + 1)
+        for name, body in bodies.items():
+            with self.subTest(name):
+                self.assertEqual(body, bodies["wsgi"])
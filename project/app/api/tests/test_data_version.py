@@ -0,0 +1,103 @@
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from app.api import autocomplete
+from app.elections.models import Candidate
+from app.elections.synthetic import ElectionGenerator
+from app.elections.versions import bump_data_version, get_data_version
+
+
+class DataVersionTest(TestCase):
+    """
+    Responses derived from the data version follow an import, even though it
+    bumps the version from another process: nothing here sees the bump but
+    the database.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generator = ElectionGenerator(
+            election_types=2, positions=2, organizations=5, districts=3
+        )
+        cls.election = generator.build_election(50)
+        cls.candidate = (
+            Candidate.objects.on_list().filter(election=cls.election).first()
+        )
+        cls.path = f"/api/elections/{cls.election.pk}/candidates/{cls.candidate.pk}/"
+
+    def setUp(self):
+        caches["default"].clear()
+        autocomplete._indexes.clear()
+
+    def reimport(self, full_name):
+        Candidate.objects.filter(pk=self.candidate.pk).update(full_name=full_name)
+        bump_data_version(self.election.pk)
+
+    @override_settings(API_CONDITIONAL_REQUESTS=True)
+    def test_conditional_request(self):
+        etag = self.client.get(self.path)["ETag"]
+        response = self.client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.reimport("ZUÑIGA PRUEBA")
+        response = self.client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["full_name"], "ZUÑIGA PRUEBA")
+
+    @override_settings(API_CONDITIONAL_REQUESTS=True)
+    def test_uncached_endpoints(self):
+        for path in (
+            "/api/",
+            f"/api/elections/{self.election.pk}/autocomplete/?q=quispe",
+            f"/api/elections/{self.election.pk}/candidates/export/",
+        ):
+            with self.subTest(path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("Last-Modified", response)
+                etag = response["ETag"]
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+                self.reimport("ZUÑIGA PRUEBA")
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response["ETag"], etag)
+
+    @override_settings(API_CACHE_ENABLED=True)
+    def test_cached_response(self):
+        self.client.get(self.path)
+        self.assertEqual(self.client.get(self.path)["X-Cache"], "HIT")
+
+        self.reimport("ZUÑIGA PRUEBA")
+        response = self.client.get(self.path)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["full_name"], "ZUÑIGA PRUEBA")
+
+    def test_autocomplete_index(self):
+        path = f"/api/elections/{self.election.pk}/autocomplete/?q=zuniga"
+        self.assertEqual(self.client.get(path).json(), [])
+
+        self.reimport("ZUÑIGA PRUEBA")
+        results = self.client.get(path).json()
+        self.assertEqual([result["id"] for result in results], [self.candidate.pk])
+
+
+class AllElectionsVersionTest(TestCase):
+    def test_never_repeats(self):
+        generator = ElectionGenerator(
+            election_types=1, positions=1, organizations=2, districts=1
+        )
+        first = generator.build_election(5)
+        second = generator.build_election(5)
+        versions = [get_data_version()]
+        # a sum of the versions would go 2, 3, 2, 3
+        for change in (
+            lambda: bump_data_version(first.pk),
+            lambda: second.delete(),
+            lambda: bump_data_version(first.pk),
+        ):
+            change()
+            versions.append(get_data_version())
+        self.assertEqual(len({version for version, _ in versions}), len(versions))
@@ -0,0 +1,64 @@
+from django.test import TestCase, override_settings
+
+from app.elections.models import Candidate
+from app.elections.synthetic import ElectionGenerator
+
+SETTINGS = (
+    {"API_FLAT_SERIALIZATION": False, "API_CANDIDATE_LISTING": False},
+    {"API_FLAT_SERIALIZATION": True, "API_CANDIDATE_LISTING": False},
+    {"API_FLAT_SERIALIZATION": False, "API_CANDIDATE_LISTING": True},
+    {"API_FLAT_SERIALIZATION": True, "API_CANDIDATE_LISTING": True},
+)
+
+QUERIES = (
+    "",
+    "?fields=id,full_name,political_organization,dni",
+    "?fields=gender,birth_date,photo_url,total_incomes",
+    "?exclude=dni,first_name,electoral_district",
+    "?fields=id,full_name,position&exclude=position",
+)
+
+
+class FlatSerializationTest(TestCase):
+    """
+    The flat serializers and the listing table give the same bytes as the
+    DRF serializers.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generator = ElectionGenerator(
+            election_types=2, positions=2, organizations=5, districts=3
+        )
+        cls.election = generator.build_election(80)
+        cls.candidate = (
+            Candidate.objects.on_list()
+            .filter(election=cls.election, cv__isnull=False)
+            .first()
+        )
+
+    def assertSameContent(self, path):
+        contents = []
+        for settings in SETTINGS:
+            with override_settings(**settings):
+                response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            contents.append(response.content)
+        for settings, content in zip(SETTINGS[1:], contents[1:]):
+            with self.subTest(**settings):
+                self.assertEqual(content, contents[0])
+
+    def test_list(self):
+        path = f"/api/elections/{self.election.pk}/candidates/"
+        for query in QUERIES + ("?limit=100", "?limit=10&offset=30"):
+            with self.subTest(query):
+                self.assertSameContent(path + query)
+
+    def test_retrieve(self):
+        path = f"/api/elections/{self.election.pk}/candidates/{self.candidate.pk}/"
+        for query in QUERIES + (
+            "?fields=id,professional_experiences,movable_properties",
+            "?exclude=university_educations,penal_sentences",
+        ):
+            with self.subTest(query):
+                self.assertSameContent(path + query)
@@ -0,0 +1,53 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from app.api.views import CandidateViewSet
+from app.elections.models import Candidate
+from app.elections.synthetic import ElectionGenerator
+
+# every way of serving the candidate endpoints must stay within the budget
+SETTINGS = (
+    {},
+    {"API_FLAT_SERIALIZATION": True},
+    {"API_CANDIDATE_LISTING": True},
+    {"API_CACHE_ENABLED": True, "API_CONDITIONAL_REQUESTS": True},
+)
+
+
+class CandidateQueryBudgetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generator = ElectionGenerator(
+            election_types=2, positions=2, organizations=5, districts=3
+        )
+        cls.election = generator.build_election(120)
+        cls.candidate = (
+            Candidate.objects.on_list()
+            .filter(election=cls.election, cv__isnull=False)
+            .first()
+        )
+
+    def count_queries(self, path):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_list(self):
+        budget = CandidateViewSet.query_budgets["list"]
+        path = f"/api/elections/{self.election.pk}/candidates/?limit="
+        for settings in SETTINGS:
+            with self.subTest(**settings), override_settings(**settings):
+                small = self.count_queries(path + "5")
+                large = self.count_queries(path + "100")
+                self.assertLessEqual(small, budget)
+                # no query per candidate
+                self.assertEqual(small, large)
+
+    def test_retrieve(self):
+        budget = CandidateViewSet.query_budgets["retrieve"]
+        path = f"/api/elections/{self.election.pk}/candidates/{self.candidate.pk}/"
+        for settings in SETTINGS:
+            with self.subTest(**settings), override_settings(**settings):
+                self.assertLessEqual(self.count_queries(path), budget)
@@ -0,0 +1,18 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+
+class CheckQueryPlansTest(TestCase):
+    def test_candidate_list_uses_indexes(self):
+        if connection.vendor == "postgresql":
+            # a test dataset is too small for the planner to prefer the
+            # indexes on its own; scans left are the ones without an index
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        # raises CommandError listing the queries that scan a whole table
+        call_command(
+            "check_query_plans", elections=2, candidates=500, stdout=StringIO()
+        )
@@ -1,9 +1,17 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework_nested import routers
 
-from .views import CandidateViewSet, ElectionProcessViewSet, ElectionTypeViewSet
+from .async_views import as_async_patterns
+from .views import (
+    APIRootView,
+    CandidateViewSet,
+    ElectionProcessViewSet,
+    ElectionTypeViewSet,
+)
 
 router = routers.DefaultRouter()
+router.APIRootView = APIRootView
 router.register("elections", ElectionProcessViewSet)
 
 elections_router = routers.NestedDefaultRouter(router, "elections", lookup="election")
@@ -16,3 +24,6 @@ elections_router.register(
 
 
 urlpatterns = [path("", include(router.urls)), path("", include(elections_router.urls))]
+
+if settings.API_ASYNC_VIEWS:
+    urlpatterns = as_async_patterns(urlpatterns)
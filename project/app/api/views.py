@@ -1,47 +1,315 @@
+from itertools import islice
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django_filters import rest_framework as filters
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
-from rest_framework import viewsets
+from rest_framework import routers, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 from rest_framework.response import Response
 
-from app.elections.models import Candidate, ElectionProcess
+from app.elections import snapshots
+from app.elections.managers import LEADERBOARD_METRICS
+from app.elections.models import (
+    Candidate,
+    CandidateListing,
+    ElectionProcess,
+    LeaderboardEntry,
+    RelElectionProcessElectionType,
+)
+from . import autocomplete
+from .async_views import buffer_streaming_response
+from .cache import conditional_response, versioned_response
+from .flat_serializers import (
+    CANDIDATE_ROWS,
+    CV_SECTION_ROWS,
+    FlatCandidateDetailSerializer,
+    FlatCandidateListingSerializer,
+    FlatCandidateSerializer,
+)
+from .mixins import QueryPlanMixin, ReplicaReadMixin
+from .pagination import KeysetPagination
+from .renderers import CSVRenderer, FastJSONRenderer, NDJSONRenderer, ParquetRenderer
 from .serializers import (
     CandidateDetailSerializer,
     CandidateSerializer,
+    ElectionBootstrapSerializer,
     ElectionProcessSerializer,
     ElectionTypeSerializer,
     ElectoralDistrictSerializer,
     PoliticalOrganizationSerializer,
     PositionSerializer,
 )
+from .stats import DIMENSIONS as STATS_DIMENSIONS, get_stats
+
+
+class APIRootView(routers.APIRootView):
+    @conditional_response
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 
+def get_snapshot_version(view, request, **kwargs):
+    """
+    Version of the election's latest snapshot, which lags the data version.
+    """
+    manifest = snapshots.get_manifest(view.get_object())
+    return manifest and snapshots.get_manifest_version(manifest)
 
-class ElectionProcessViewSet(viewsets.ReadOnlyModelViewSet):
+
+class ElectionProcessViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     queryset = ElectionProcess.objects.all()
     serializer_class = ElectionProcessSerializer
+    election_lookup_kwarg = "pk"
+    autocomplete_max_limit = 50
+
+    @versioned_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @versioned_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     @action(detail=True)
+    @versioned_response
     def positions(self, request, pk=None):
         election = self.get_object()
         serializer = PositionSerializer(election.positions.all(), many=True)
         return Response(serializer.data)
 
     @action(detail=True)
+    @versioned_response
     def electoral_districts(self, request, pk=None):
         election = self.get_object()
         serializer = ElectoralDistrictSerializer(election.districts.all(), many=True)
         return Response(serializer.data)
 
+    @extend_schema(responses=ElectionBootstrapSerializer)
+    @action(detail=True)
+    @versioned_response
+    def bootstrap(self, request, pk=None):
+        """
+        The election with its election types (each with its political
+        organizations), positions and electoral districts, in five queries.
+        """
+        election = self.get_object()
+        prefetch_related_objects(
+            [election],
+            Prefetch(
+                "relelectionprocesselectiontype_set",
+                queryset=RelElectionProcessElectionType.objects.select_related(
+                    "election_type"
+                )
+                .prefetch_related("political_organizations")
+                .order_by("election_type_id"),
+            ),
+            "positions",
+            "districts",
+        )
+        return Response(ElectionBootstrapSerializer(election).data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="q",
+                description="Start of any word of a candidate or organization name",
+                required=True,
+                type=OpenApiTypes.STR,
+            ),
+            OpenApiParameter(
+                name="limit",
+                description=f"Number of results (max {autocomplete_max_limit})",
+                required=False,
+                type=OpenApiTypes.INT,
+            ),
+        ],
+        responses=OpenApiTypes.OBJECT,
+    )
+    @action(detail=True, renderer_classes=[FastJSONRenderer, BrowsableAPIRenderer])
+    @conditional_response
+    def autocomplete(self, request, pk=None):
+        """
+        Candidates on list and political organizations of the election whose
+        name has a word starting with `q`, ignoring accents. Served from an
+        in-memory index: the database is only asked for the election's data
+        version, to rebuild the index after an import.
+        """
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            raise ValidationError({"limit": "A valid integer is required."})
+        limit = max(1, min(limit, self.autocomplete_max_limit))
+        try:
+            index = autocomplete.get_index(int(pk))
+        except ValueError:
+            raise Http404
+        if index is None:
+            raise Http404
+
+        results = index.search(request.query_params.get("q", ""), limit)
+        return Response(
+            [{"type": kind, "id": id_, "name": name} for kind, id_, name in results]
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="dimension",
+                location=OpenApiParameter.PATH,
+                enum=tuple(STATS_DIMENSIONS),
+                type=OpenApiTypes.STR,
+            )
+        ],
+        responses=OpenApiTypes.OBJECT,
+    )
+    @action(detail=True, url_path=r"stats/(?P<dimension>[a-z_]+)")
+    @versioned_response
+    def stats(self, request, pk=None, dimension=None):
+        """
+        Candidates on list grouped by political organization, electoral
+        district, position, election type or gender, with the count, sum,
+        average, median (p50) and 90th percentile of their CV totals.
+        """
+        if dimension not in STATS_DIMENSIONS:
+            raise Http404
+        election = self.get_object()
+        return Response(get_stats(election.pk, dimension))
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="metric",
+                location=OpenApiParameter.PATH,
+                enum=LEADERBOARD_METRICS,
+                type=OpenApiTypes.STR,
+            ),
+            OpenApiParameter(
+                name="et",
+                description="Election type",
+                required=False,
+                type=OpenApiTypes.INT,
+            ),
+            OpenApiParameter(
+                name="ed",
+                description="Electoral district (ignored when `et` is given)",
+                required=False,
+                type=OpenApiTypes.INT,
+            ),
+            OpenApiParameter(
+                name="limit",
+                description="Number of candidates (max ELECTION_LEADERBOARD_SIZE)",
+                required=False,
+                type=OpenApiTypes.INT,
+            ),
+        ],
+        responses=OpenApiTypes.OBJECT,
+    )
+    @action(detail=True, url_path=r"leaderboards/(?P<metric>[a-z_]+)")
+    @versioned_response
+    def leaderboards(self, request, pk=None, metric=None):
+        """
+        Top candidates on list of the election by a CV total, overall, per
+        election type (`et`) or per electoral district (`ed`). Precomputed by
+        the import commands.
+        """
+        if metric not in LEADERBOARD_METRICS:
+            raise Http404
+        election = self.get_object()
+        params = {}
+        for name in ("et", "ed", "limit"):
+            try:
+                params[name] = int(request.query_params[name])
+            except KeyError:
+                pass
+            except ValueError:
+                raise ValidationError({name: "A valid integer is required."})
+        size = settings.ELECTION_LEADERBOARD_SIZE
+        limit = max(1, min(params.get("limit", size), size))
+        district_id = None if "et" in params else params.get("ed")
+
+        entries = list(
+            LeaderboardEntry.objects.board(
+                election.pk, metric, params.get("et"), district_id
+            ).values_list("candidate_id", "value")[:limit]
+        )
+        candidates = Candidate.objects.with_related().in_bulk(
+            [candidate_id for candidate_id, value in entries]
+        )
+        return Response(
+            [
+                {
+                    "rank": rank,
+                    "value": value,
+                    "candidate": CandidateSerializer(candidates[candidate_id]).data,
+                }
+                for rank, (candidate_id, value) in enumerate(entries, 1)
+            ]
+        )
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    @action(detail=True)
+    @conditional_response(get_version=get_snapshot_version)
+    def snapshot(self, request, pk=None):
+        """
+        Manifest of the latest columnar snapshot of the election: its data
+        version and the rows, size and URL of each table.
+        """
+        election = self.get_object()
+        manifest = snapshots.get_manifest(election)
+        if manifest is None:
+            raise Http404
+        for table, info in manifest["tables"].items():
+            info["url"] = request.build_absolute_uri(
+                self.reverse_action("snapshot-table", kwargs={"pk": pk, "table": table})
+            )
+        return Response(manifest)
 
-class ElectionTypeViewSet(viewsets.ReadOnlyModelViewSet):
+    @extend_schema(responses={(200, ParquetRenderer.media_type): OpenApiTypes.BINARY})
+    @action(
+        detail=True,
+        url_path=r"snapshot/(?P<table>[a-z_]+)",
+        renderer_classes=[JSONRenderer, ParquetRenderer],
+    )
+    @conditional_response(get_version=get_snapshot_version)
+    def snapshot_table(self, request, pk=None, table=None):
+        """
+        Parquet file of a table of the latest columnar snapshot.
+        """
+        election = self.get_object()
+        manifest = snapshots.get_manifest(election)
+        if manifest is None or table not in manifest["tables"]:
+            raise Http404
+        return FileResponse(
+            default_storage.open(manifest["tables"][table]["path"]),
+            as_attachment=True,
+            filename=f"{election.jne_id}-v{manifest['version']}-{table}.parquet",
+            content_type=ParquetRenderer.media_type,
+        )
+
+
+class ElectionTypeViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ElectionTypeSerializer
 
     def get_queryset(self):
         election_process = ElectionProcess.objects.get(id=self.kwargs["election_pk"])
         return election_process.election_types.all()
 
+    @versioned_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @versioned_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=True)
+    @versioned_response
     def political_organizations(self, request, **kwargs):
         election_process = ElectionProcess.objects.get(id=kwargs["election_pk"])
         obj_rel = election_process.relelectionprocesselectiontype_set.get(
@@ -56,6 +324,7 @@ class ElectionTypeViewSet(viewsets.ReadOnlyModelViewSet):
 class CandidateFilter(filters.FilterSet):
     et = filters.NumberFilter(field_name="election_type")
     po = filters.NumberFilter(field_name="political_organization")
+    q = filters.CharFilter(method="search")
 
     o = filters.OrderingFilter(
         fields=(
@@ -74,6 +343,34 @@ class CandidateFilter(filters.FilterSet):
 
     class Meta:
         model = Candidate
+        fields = ["et", "po", "q"]
+
+    def search(self, queryset, name, value):
+        queryset = queryset.search(value)
+        # an explicit ordering wins over relevance
+        if not self.form.cleaned_data.get("o"):
+            queryset = queryset.order_by("-search_rank", "pk")
+        return queryset
+
+
+class CandidateListingFilter(CandidateFilter):
+    o = filters.OrderingFilter(
+        fields=(
+            ("total_sentences", "ts"),
+            ("total_penal_sentences", "tps"),
+            ("total_obligation_sentences", "tos"),
+            ("total_incomes", "ti"),
+        ),
+        field_labels={
+            "total_sentences": "Total Sentences",
+            "total_penal_sentences": "Total Penal Sentences",
+            "total_obligation_sentences": "Total Obligation Sentences",
+            "total_incomes": "Total Incomes",
+        },
+    )
+
+    class Meta:
+        model = CandidateListing
         fields = ["et", "po"]
 
 
@@ -140,20 +437,260 @@ class CandidateFilter(filters.FilterSet):
                 ),
             ],
         ),
+        OpenApiParameter(
+            name="q",
+            description=(
+                "Search candidates by name, DNI or political organization name, "
+                "ignoring accents. Results are ranked by relevance unless `o` "
+                "is given"
+            ),
+            required=False,
+            type=OpenApiTypes.STR,
+        ),
+        OpenApiParameter(
+            name="fields",
+            description=(
+                "Comma separated names of the fields to return, e.g. "
+                "`id,full_name,political_organization`. Only the columns and "
+                "relations they need are read from the database"
+            ),
+            required=False,
+            type=OpenApiTypes.STR,
+        ),
+        OpenApiParameter(
+            name="exclude",
+            description="Comma separated names of fields to leave out",
+            required=False,
+            type=OpenApiTypes.STR,
+        ),
+        OpenApiParameter(
+            name="cursor",
+            description=(
+                "Switch to cursor pagination: send it empty for the first page "
+                "and follow the `next` links. Pages cost the same at any depth "
+                "and no total count is returned. Candidates without CV come last."
+            ),
+            required=False,
+            type=OpenApiTypes.STR,
+        ),
     ]
 )
-class CandidateViewSet(viewsets.ReadOnlyModelViewSet):
+class CandidateViewSet(ReplicaReadMixin, QueryPlanMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = CandidateSerializer
     filter_backends = [filters.DjangoFilterBackend]
-    filterset_class = CandidateFilter
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    query_plans = {
+        "list": lambda queryset: queryset.with_related(),
+        "retrieve": lambda queryset: queryset.with_related().with_cv_sections(),
+    }
+    # count + page for list, candidate + cv sections for retrieve, plus the
+    # data version lookup of the response cache
+    query_budgets = {"list": 3, "retrieve": 11}
+    # rows fetched from the server-side cursor (and serialized) at a time
+    export_chunk_size = 2000
+
+    @property
+    def paginator(self):
+        if (
+            not hasattr(self, "_paginator")
+            and self.request is not None
+            and KeysetPagination.cursor_query_param in self.request.query_params
+        ):
+            self._paginator = KeysetPagination()
+        return super().paginator
+
+    @property
+    def filterset_class(self):
+        if self.uses_listing():
+            return CandidateListingFilter
+        return CandidateFilter
+
+    def uses_listing(self):
+        # the list action reads from the denormalized CandidateListing table,
+        # except for searches, which need Candidate's search index
+        return (
+            settings.API_CANDIDATE_LISTING
+            and self.action == "list"
+            and not self.request.query_params.get("q")
+        )
 
     def get_queryset(self):
-        return Candidate.objects.on_list().filter(
-            election_id=self.kwargs["election_pk"]
+        if self.uses_listing():
+            # the indexes don't keep candidates in insertion order, so order
+            # them explicitly like the Candidate table returns them
+            return (
+                CandidateListing.objects.on_list()
+                .filter(election_id=self.kwargs["election_pk"])
+                .order_by("candidate_id")
+            )
+        # the search columns are only read by the database
+        queryset = self.apply_query_plan(
+            Candidate.objects.on_list()
+            .filter(election_id=self.kwargs["election_pk"])
+            .defer("search_text", "search_vector")
+        )
+        fieldset = self.get_fieldset()
+        if fieldset is not None and self.action in ("list", "retrieve"):
+            queryset = self.narrow_queryset(queryset, fieldset)
+        return queryset
+
+    def narrow_queryset(self, queryset, fieldset):
+        """
+        Only load the columns, and join the relations, read by `fieldset`.
+        """
+        sections = [name for name in fieldset if name in CV_SECTION_ROWS]
+        lookups = list(CANDIDATE_ROWS.select(fieldset).lookups)
+        if sections:
+            # the sections are prefetched through the CV
+            lookups.append("cv__id")
+        relations = {lookup.split("__")[0] for lookup in lookups if "__" in lookup}
+        queryset = queryset.select_related(None).select_related(*relations)
+        if self.action == "retrieve":
+            queryset = queryset.prefetch_related(None).with_cv_sections(sections)
+        return queryset.only(*relations, *lookups)
+
+    def include_sections(self):
+        # the export only includes the CV sections on demand
+        if self.action == "export":
+            return self.request.query_params.get("sections") in ("1", "true", "True")
+        return self.action == "retrieve"
+
+    def get_fieldset(self):
+        """
+        Names of the fields selected with the `fields` and `exclude`
+        parameters, in output order, or None when none of them is given.
+        """
+        if hasattr(self, "_fieldset"):
+            return self._fieldset
+        if self.include_sections():
+            available = CandidateDetailSerializer.Meta.fields
+        else:
+            available = CandidateSerializer.Meta.fields
+
+        selected = None
+        for param in ("fields", "exclude"):
+            value = self.request.query_params.get(param)
+            if not value:
+                continue
+            names = {name.strip() for name in value.split(",") if name.strip()}
+            unknown = names.difference(available)
+            if unknown:
+                raise ValidationError(
+                    {param: f"Unknown fields: {', '.join(sorted(unknown))}"}
+                )
+            if selected is None:
+                selected = set(available)
+            selected = selected & names if param == "fields" else selected - names
+        if selected is not None and not selected:
+            raise ValidationError({"fields": "No fields selected"})
+
+        self._fieldset = (
+            None if selected is None else [f for f in available if f in selected]
         )
+        return self._fieldset
 
     def get_serializer_class(self):
         if self.action == "retrieve":
             return CandidateDetailSerializer
         else:
             return CandidateSerializer
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault("fields", self.get_fieldset())
+        return super().get_serializer(*args, **kwargs)
+
+    @versioned_response
+    def list(self, request, *args, **kwargs):
+        if self.uses_listing():
+            serializer_class = FlatCandidateListingSerializer
+        elif settings.API_FLAT_SERIALIZATION:
+            serializer_class = FlatCandidateSerializer
+        else:
+            return super().list(request, *args, **kwargs)
+
+        serializer = serializer_class(None, fields=self.get_fieldset())
+        queryset = self.filter_queryset(self.get_queryset()).values_list(
+            *serializer.lookups
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            data = serializer.to_representation(page)
+            return self.get_paginated_response(data)
+        return Response(serializer.to_representation(queryset))
+
+    @versioned_response
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.API_FLAT_SERIALIZATION:
+            return super().retrieve(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        try:
+            data = FlatCandidateDetailSerializer(
+                queryset.filter(pk=kwargs["pk"]), fields=self.get_fieldset()
+            ).data
+        except (TypeError, ValueError):
+            raise Http404
+        if not data:
+            raise Http404
+        return Response(data[0])
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name="sections",
+                description="Include every CV section of the candidates",
+                required=False,
+                type=OpenApiTypes.BOOL,
+            ),
+        ],
+        responses={
+            (200, "application/x-ndjson"): OpenApiTypes.STR,
+            (200, "text/csv"): OpenApiTypes.STR,
+        },
+    )
+    @action(
+        detail=False,
+        renderer_classes=[NDJSONRenderer, CSVRenderer],
+        pagination_class=None,
+    )
+    @conditional_response
+    def export(self, request, *args, **kwargs):
+        """
+        Stream every candidate of the election as NDJSON (default) or CSV
+        (`?format=csv`). Filters and ordering work as in the list. Under ASGI
+        the body is buffered (to disk when large) before it's sent.
+        """
+        if self.include_sections():
+            serializer = FlatCandidateDetailSerializer(None, fields=self.get_fieldset())
+        else:
+            serializer = FlatCandidateSerializer(None, fields=self.get_fieldset())
+
+        # the rows are streamed after the view returns, keep reading them from
+        # the database routed to now
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.using(queryset.db)
+        if not queryset.query.order_by:
+            queryset = queryset.order_by("pk")
+        values = queryset.values_list(*serializer.lookups).iterator(
+            chunk_size=self.export_chunk_size
+        )
+
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(
+                self.iter_export_rows(serializer, values), header=serializer.columns
+            ),
+            content_type=renderer.media_type,
+        )
+        filename = f"election-{kwargs['election_pk']}-candidates.{renderer.format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return buffer_streaming_response(request, response)
+
+    def iter_export_rows(self, serializer, values):
+        # serialize chunk by chunk so CV sections are fetched for a whole
+        # chunk at once and memory stays flat
+        while True:
+            chunk = list(islice(values, self.export_chunk_size))
+            if not chunk:
+                break
+            yield from serializer.to_representation(chunk)
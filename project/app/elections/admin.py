@@ -49,6 +49,7 @@ class CandidateAdmin(admin.ModelAdmin):
         "jne_id",
     )
     list_filter = (
+        "election",
         "election_type",
         "electoral_district",
         "political_organization",
@@ -56,14 +57,16 @@ class CandidateAdmin(admin.ModelAdmin):
         "person__gender",
         "status_on_list",
     )
-    search_fields = (
-        "person__dni",
-        "person__first_name",
-        "person__surname",
-        "person__second_surname",
-    )
+    # only shows the search box, see get_search_results()
+    search_fields = ("full_name", "person__dni", "political_organization__name")
     autocomplete_fields = ("person",)
 
+    def get_search_results(self, request, queryset, search_term):
+        # use the candidates' search index instead of icontains over the joins
+        if not search_term:
+            return queryset, False
+        return queryset.search(search_term), False
+
     def get_person_dni(self, obj):
         return obj.person.dni
 
@@ -0,0 +1,87 @@
+"""
+Batched writes for the import commands.
+
+Django 3.1's bulk_create() can only ignore conflicting rows, so `upsert()`
+builds the INSERT ... ON CONFLICT DO UPDATE statements itself. PostgreSQL and
+SQLite (3.24+) share that syntax. The conflict target must be a unique
+column.
+"""
+from django.db import connections, router
+
+
+def upsert(model, rows, unique_field, update_fields=(), batch_size=1000):
+    """
+    Insert `rows` of `model` (dicts of field attname => value) and update
+    `update_fields` of the ones whose `unique_field` value already exists.
+    Return {unique_field value: primary key} of every row.
+
+    Missing fields get their default, like Model() does. When several rows
+    share the unique value the last one wins.
+    """
+    rows = list({row[unique_field]: row for row in rows}.values())
+    if not rows:
+        return {}
+    using = router.db_for_write(model)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    columns = ", ".join(qn(field.column) for field in fields)
+    placeholder = "({})".format(", ".join(["%s"] * len(fields)))
+    if update_fields:
+        action = "UPDATE SET " + ", ".join(
+            "{0} = EXCLUDED.{0}".format(qn(model._meta.get_field(name).column))
+            for name in update_fields
+        )
+    else:
+        action = "NOTHING"
+    conflict = qn(model._meta.get_field(unique_field).column)
+    # SQLite limits the number of parameters of a statement
+    batch_size = min(batch_size, connection.ops.bulk_batch_size(fields, rows))
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start : start + batch_size]
+            params = [
+                field.get_db_prep_save(
+                    row[field.attname] if field.attname in row else field.get_default(),
+                    connection,
+                )
+                for row in batch
+                for field in fields
+            ]
+            cursor.execute(
+                f"INSERT INTO {qn(model._meta.db_table)} ({columns}) "
+                f"VALUES {', '.join([placeholder] * len(batch))} "
+                f"ON CONFLICT ({conflict}) DO {action}",
+                params,
+            )
+
+    # bulk inserts don't return the primary keys on every backend
+    pks = {}
+    keys = [row[unique_field] for row in rows]
+    queryset = model._default_manager.using(using)
+    for start in range(0, len(keys), batch_size):
+        pks.update(
+            queryset.filter(
+                **{f"{unique_field}__in": keys[start : start + batch_size]}
+            ).values_list(unique_field, "pk")
+        )
+    return pks
+
+
+def link(relation, pairs, batch_size=1000):
+    """
+    Add the (source pk, target pk) `pairs` to the many-to-many `relation`
+    (e.g. ElectionProcess.positions) skipping the existing ones, like add().
+    """
+    field = relation.field
+    through = relation.through
+    source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+    through._default_manager.bulk_create(
+        [
+            through(**{f"{source}_id": source_pk, f"{target}_id": target_pk})
+            for source_pk, target_pk in set(pairs)
+        ],
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
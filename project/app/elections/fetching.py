@@ -0,0 +1,41 @@
+"""
+Concurrent fetching for the import commands.
+
+The JNE API answers one list or CV per request, so imports spend most of
+their time waiting on the network. `fetch_ordered()` runs those requests in
+a bounded thread pool and hands the results back in input order, so the
+caller (the only one touching the database) writes exactly what a serial
+run would.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def fetch_ordered(fetch, items, workers=1):
+    """
+    Yield (item, fetch(item)) for each one of `items`, in order, running up
+    to `workers` fetches at a time. At most twice as many results are kept
+    waiting for the consumer. An exception raised by `fetch` is raised when
+    its item is reached.
+    """
+    if workers <= 1:
+        for item in items:
+            yield item, fetch(item)
+        return
+
+    items = iter(items)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch") as pool:
+        try:
+            for item in items:
+                pending.append((item, pool.submit(fetch, item)))
+                if len(pending) >= workers * 2:
+                    item, future = pending.popleft()
+                    yield item, future.result()
+            while pending:
+                item, future = pending.popleft()
+                yield item, future.result()
+        finally:
+            # don't wait for requests nobody will read
+            for _, future in pending:
+                future.cancel()
@@ -0,0 +1,229 @@
+"""
+HTTP transport of the import commands' JNE client.
+
+pyjne_peru sends every request with a bare requests.get()/post(): a new
+connection each time, no timeout and no retry, so one transient error
+aborts a whole import. `JNEClient` keeps pyjne_peru's endpoints and parsing
+but sends the requests through one pooled keep-alive session shared by the
+fetch threads, with timeouts, retries of connection errors, 429 and 5xx
+responses (exponential backoff with jitter) and a rate limit shared by
+every thread and endpoint. It records the latency and errors of each
+endpoint, see `RequestStats`, and can read and store the responses in a
+`ResponseCache` (app.elections.jne_cache).
+"""
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+
+import requests
+from django.conf import settings
+from pyjne_peru.client import JNE
+from pyjne_peru.error import JNEException
+from requests.adapters import HTTPAdapter
+
+from app.shared.metrics import percentile
+
+from .jne_cache import REPLAY, USE, ResponseCache, get_key
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_BACKOFF = 60
+
+
+class RateLimiter:
+    """
+    Let at most `rate` calls per second through `wait()`, from any thread.
+    A falsy rate means no limit.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def get_endpoint(path):
+    # "/Candidato/GetCandidatos/1-110-2-3" => "/Candidato/GetCandidatos"
+    return "/".join(path.split("?")[0].split("/")[:3])
+
+
+class RequestStats:
+    """
+    Latency and errors of the requests sent to each endpoint, from any
+    thread.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.retries = defaultdict(int)
+        self.cached = defaultdict(int)
+
+    def record(self, endpoint, latency, error=False, retry=False):
+        with self.lock:
+            self.latencies[endpoint].append(latency)
+            self.errors[endpoint] += error
+            self.retries[endpoint] += retry
+
+    def record_cached(self, endpoint):
+        with self.lock:
+            self.cached[endpoint] += 1
+
+    def report(self):
+        """
+        Return one line per endpoint: responses read from the cache,
+        requests, errors, retries and latency percentiles.
+        """
+        lines = []
+        with self.lock:
+            for endpoint in sorted({*self.latencies, *self.cached}):
+                latencies = sorted(self.latencies[endpoint])
+                line = f"{endpoint}: {self.cached[endpoint]} cached, "
+                line += f"{len(latencies)} requests"
+                if latencies:
+                    p50, p95, p99 = (
+                        percentile(latencies, fraction) * 1000
+                        for fraction in (0.5, 0.95, 0.99)
+                    )
+                    line += (
+                        f", {self.errors[endpoint]} errors, "
+                        f"{self.retries[endpoint]} retries, "
+                        f"p50 {p50:.0f}ms, p95 {p95:.0f}ms, p99 {p99:.0f}ms"
+                    )
+                lines.append(line)
+        return "\n".join(lines)
+
+
+class JNEClient(JNE):
+    """
+    pyjne_peru's client on the pooled, retrying and rate limited transport,
+    reading and storing the responses in `cache` when given. Safe to share
+    between threads; `pool_size` should cover them.
+    """
+
+    def __init__(
+        self,
+        pool_size=10,
+        max_requests_per_second=None,
+        timeout=None,
+        retries=None,
+        backoff=None,
+        cache=None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if max_requests_per_second is None:
+            max_requests_per_second = settings.JNE_MAX_REQUESTS_PER_SECOND
+        self.limiter = RateLimiter(max_requests_per_second)
+        self.timeout = timeout or (
+            settings.JNE_CONNECT_TIMEOUT,
+            settings.JNE_READ_TIMEOUT,
+        )
+        self.retries = settings.JNE_RETRIES if retries is None else retries
+        self.backoff = settings.JNE_RETRY_BACKOFF if backoff is None else backoff
+        self.stats = RequestStats()
+        self.cache = cache
+
+    def _make_request(
+        self,
+        method,
+        path,
+        payload_type=None,
+        payload_list=False,
+        post_data=None,
+        params=None,
+        **kwargs,
+    ):
+        endpoint = get_endpoint(path)
+        key = get_key(method, path, params, post_data)
+        content = self.cache.get(endpoint, key) if self.cache else None
+        if content is not None:
+            self.stats.record_cached(endpoint)
+            data = json.loads(content)
+        elif self.cache and self.cache.offline:
+            raise JNEException(
+                f"{method} {path} is not in the JNE cache {self.cache.directory}"
+            )
+        else:
+            response = self.send(method, path, params=params, data=post_data)
+            data = response.json()
+            # only valid JSON gets cached
+            if self.cache:
+                self.cache.set(endpoint, key, response.content)
+        return self.parser.parse(
+            data, payload_list=payload_list, payload_type=payload_type
+        )
+
+    def send(self, method, path, params=None, data=None):
+        """
+        Send a request, retrying transient failures, and return the 200
+        response. Raise JNEException when it can't be obtained.
+        """
+        endpoint = get_endpoint(path)
+        for attempt in range(self.retries + 1):
+            self.limiter.wait()
+            start = time.perf_counter()
+            retry_after = None
+            try:
+                response = self.session.request(
+                    method,
+                    self._build_url(path),
+                    params=params or {},
+                    data=data or {},
+                    timeout=self.timeout,
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if response.status_code == 200:
+                    self.stats.record(
+                        endpoint, time.perf_counter() - start, retry=attempt > 0
+                    )
+                    return response
+                error = f"JNE error response: status code = {response.status_code}"
+                if response.status_code not in RETRY_STATUSES:
+                    self.stats.record(endpoint, time.perf_counter() - start, True)
+                    raise JNEException(error)
+                retry_after = response.headers.get("Retry-After")
+            self.stats.record(
+                endpoint, time.perf_counter() - start, True, retry=attempt > 0
+            )
+            if attempt < self.retries:
+                time.sleep(self.get_delay(attempt, retry_after))
+        raise JNEException(f"{error} ({self.retries} retries)")
+
+    def get_delay(self, attempt, retry_after=None):
+        # exponential backoff with full jitter, unless the server says when
+        if retry_after and retry_after.isdigit():
+            return min(int(retry_after), MAX_BACKOFF)
+        return random.uniform(0, min(self.backoff * 2**attempt, MAX_BACKOFF))
+
+
+def get_cache(directory=None, mode=None):
+    """
+    Return the ResponseCache of the import commands: under `directory`
+    (default: JNE_CACHE_DIR) in `mode` (default: USE), None when there's
+    no directory.
+    """
+    directory = directory or settings.JNE_CACHE_DIR
+    if not directory:
+        if mode == REPLAY:
+            raise ValueError("Replaying needs a JNE cache directory")
+        return None
+    return ResponseCache(directory, mode or USE, settings.JNE_CACHE_MAX_AGE)
@@ -0,0 +1,132 @@
+"""
+On-disk cache of the raw JNE responses of the import commands.
+
+Each 200 response body is stored gzip-compressed under the directory of its
+endpoint, named after a hash of the request (method, path, query and form
+data), so the same request always maps to the same file:
+
+    <directory>/Candidato-GetCandidatos/3f/3fa2...e1.json.gz
+
+Re-running an import after changing our own mapping code then reads the
+responses from disk instead of the JNE, and a replay never touches the
+network at all, which also gives the benchmarks a fixed input. Entries
+older than `max_age` seconds are fetched again, except when replaying.
+Nothing is ever invalidated by the JNE; refresh or prune old entries (see
+the jne_cache command) to pick up its changes.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+USE, REFRESH, REPLAY = "use", "refresh", "replay"
+MODES = (USE, REFRESH, REPLAY)
+
+SUFFIX = ".json.gz"
+
+
+def get_key(method, path, params=None, data=None):
+    request = [method.upper(), path, sorted((params or {}).items())]
+    request.append(sorted((data or {}).items()))
+    return hashlib.sha256(json.dumps(request, default=str).encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Compressed JNE responses under `directory`. In REFRESH mode nothing is
+    read, every response is fetched and stored again; in REPLAY mode
+    nothing is fetched. Safe to share between threads.
+    """
+
+    def __init__(self, directory, mode=USE, max_age=0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown JNE cache mode: {mode}")
+        self.directory = Path(directory)
+        self.mode = mode
+        self.max_age = max_age
+
+    @property
+    def offline(self):
+        return self.mode == REPLAY
+
+    def get_path(self, endpoint, key):
+        # "/Candidato/GetCandidatos" => "Candidato-GetCandidatos"
+        folder = endpoint.strip("/").replace("/", "-") or "root"
+        return self.directory / folder / key[:2] / (key + SUFFIX)
+
+    def get(self, endpoint, key):
+        """
+        Return the cached body of the request, None when it has to be
+        fetched.
+        """
+        if self.mode == REFRESH:
+            return None
+        path = self.get_path(endpoint, key)
+        try:
+            if self.mode == USE and self.max_age:
+                if time.time() - path.stat().st_mtime > self.max_age:
+                    return None
+            with gzip.open(path, "rb") as f:
+                return f.read()
+        except (OSError, EOFError):
+            # missing, or left truncated by a killed run
+            return None
+
+    def set(self, endpoint, key, content):
+        path = self.get_path(endpoint, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # write aside and rename, so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f, gzip.GzipFile(
+                fileobj=f, mode="wb", mtime=0
+            ) as gz:
+                gz.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def entries(self):
+        """
+        Yield (endpoint folder, path, stat) of every cached response.
+        """
+        if not self.directory.is_dir():
+            return
+        for folder in sorted(self.directory.iterdir()):
+            if folder.is_dir():
+                for path in folder.glob("*/*" + SUFFIX):
+                    yield folder.name, path, path.stat()
+
+    def report(self):
+        """
+        Return {endpoint folder: {"entries", "size", "oldest", "newest"}},
+        sizes in bytes on disk and modification times as timestamps.
+        """
+        report = defaultdict(
+            lambda: {"entries": 0, "size": 0, "oldest": None, "newest": None}
+        )
+        for folder, _, stat in self.entries():
+            info = report[folder]
+            info["entries"] += 1
+            info["size"] += stat.st_size
+            info["oldest"] = min(info["oldest"] or stat.st_mtime, stat.st_mtime)
+            info["newest"] = max(info["newest"] or stat.st_mtime, stat.st_mtime)
+        return dict(report)
+
+    def prune(self, max_age):
+        """
+        Delete the responses cached more than `max_age` seconds ago, return
+        how many.
+        """
+        limit = time.time() - max_age
+        deleted = 0
+        for _, path, stat in list(self.entries()):
+            if stat.st_mtime < limit:
+                path.unlink()
+                deleted += 1
+        return deleted
@@ -0,0 +1,89 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from app.api.flat_serializers import FlatCandidateSerializer
+from app.api.renderers import FastJSONRenderer
+from app.api.serializers import CandidateSerializer
+from app.elections.models import Candidate
+from app.elections.synthetic import ElectionGenerator
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/second of CandidateSerializer + JSONRenderer against "
+        "FlatCandidateSerializer + FastJSONRenderer on a synthetic election. "
+        "The election is rolled back afterwards and the timed serialization "
+        "runs on rows already read from the database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--candidates", type=int, default=50000)
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Building {options['candidates']} synthetic candidates")
+        try:
+            with transaction.atomic():
+                candidates, values_list = self.load_candidates(
+                    options["seed"], options["candidates"]
+                )
+                raise Rollback
+        except Rollback:
+            pass
+
+        drf_output = JSONRenderer().render(
+            CandidateSerializer(candidates, many=True).data
+        )
+        flat_output = FastJSONRenderer().render(
+            FlatCandidateSerializer(None).to_representation(values_list)
+        )
+        if drf_output != flat_output:
+            raise CommandError("Flat serializer output differs from DRF output")
+        self.stdout.write(f"Outputs are byte-identical ({len(drf_output)} bytes)")
+
+        drf_time = self.timeit(
+            lambda: JSONRenderer().render(
+                CandidateSerializer(candidates, many=True).data
+            ),
+            options["repeat"],
+        )
+        flat_time = self.timeit(
+            lambda: FastJSONRenderer().render(
+                FlatCandidateSerializer(None).to_representation(values_list)
+            ),
+            options["repeat"],
+        )
+        total = len(candidates)
+        self.stdout.write(f"DRF serializer:  {total / drf_time:,.0f} rows/s")
+        self.stdout.write(f"Flat serializer: {total / flat_time:,.0f} rows/s")
+        self.stdout.write(f"Speedup: {drf_time / flat_time:.1f}x")
+
+    def timeit(self, func, repeat):
+        # best of N, like the timeit module
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def load_candidates(self, seed, total):
+        """
+        Build a synthetic election with `total` candidates and return them as
+        model instances and as `values_list()` rows, in the same order.
+        """
+        election = ElectionGenerator(seed=seed).build_election(total)
+        queryset = (
+            Candidate.objects.filter(election=election).with_related().order_by("pk")
+        )
+        candidates = list(queryset)
+        values_list = list(queryset.values_list(*FlatCandidateSerializer.lookups))
+        return candidates, values_list
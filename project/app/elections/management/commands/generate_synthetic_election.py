@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.elections.synthetic import ElectionGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        "Create synthetic election processes shaped like the JNE data (every "
+        "JNE id is negative), e.g. to run benchmark_api at a given scale"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--elections", type=int, default=1)
+        parser.add_argument(
+            "--candidates", type=int, default=10000, help="Candidates per election"
+        )
+        parser.add_argument("--election-types", type=int, default=4)
+        parser.add_argument("--positions", type=int, default=5)
+        parser.add_argument("--organizations", type=int, default=40)
+        parser.add_argument("--districts", type=int, default=27)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            generator = ElectionGenerator(
+                seed=options["seed"],
+                election_types=options["election_types"],
+                positions=options["positions"],
+                organizations=options["organizations"],
+                districts=options["districts"],
+            )
+        for _ in range(options["elections"]):
+            with transaction.atomic():
+                election = generator.build_election(options["candidates"])
+            self.stdout.write(
+                f"Created {election.name} (id {election.pk}, JNE id "
+                f"{election.jne_id}) with {options['candidates']} candidates"
+            )
+        self.stdout.write(f"Done in {time.perf_counter() - start:.1f}s")
@@ -1,8 +1,336 @@
-from django.core.management.base import BaseCommand
+import time
+from collections import defaultdict
 
-from pyjne_peru.client import JNE
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
 
-from app.elections.models import Candidate, CurriculumVitae, PoliticalOrganization
+from app.elections import jne_cache
+from app.elections.bulk import upsert
+from app.elections.fetching import fetch_ordered
+from app.elections.jne import JNEClient, get_cache
+from app.elections.models import (
+    Candidate,
+    CandidateListing,
+    CurriculumVitae,
+    ElectionProcess,
+    ImmovableProperty,
+    LeaderboardEntry,
+    MovableProperty,
+    ObligationSentence,
+    PartisanPosition,
+    PenalSentence,
+    PoliticalOrganization,
+    PostgraduateEducation,
+    ProfessionalExperience,
+    UniversityEducation,
+)
+from app.elections.snapshots import write_snapshot
+from app.elections.versions import bump_data_version
+from app.shared.metrics import record_import_run
+
+# (model, resume field, item JNE id field, {model field: item field}) of each
+# CV section; a dict maps a foreign key, created if it doesn't exist
+CV_SECTIONS = (
+    (
+        PenalSentence,
+        "lSentenciaPenal",
+        "idHVSentenciaPenal",
+        {
+            "file_number": "strExpedientePenal",
+            "criminal_sentence_date": "fechaSentenciaPenal",
+            "judicial_authority": "strOrganoJudiPenal",
+            "criminal_offense": "strDelitoPenal",
+            "judgment": "strFalloPenal",
+            "modality": "strModalidad",
+            "other_modality": "strOtraModalidad",
+        },
+    ),
+    (
+        ObligationSentence,
+        "lSentenciaObliga",
+        "idHVSentenciaObliga",
+        {
+            "demand_matter": "strMateriaSentencia",
+            "file_number": "strExpedienteObliga",
+            "judicial_authority": "strOrganoJuridicialObliga",
+            "judgment": "strFalloObliga",
+        },
+    ),
+    (
+        ProfessionalExperience,
+        "lExperienciaLaboral",
+        "idHVExpeLaboral",
+        {
+            "workplace": "strCentroTrabajo",
+            "position": "strOcupacionProfesion",
+            "starting_year": "anioTrabajoDesde",
+            "ending_year": "anioTrabajoHasta",
+        },
+    ),
+    (
+        UniversityEducation,
+        "lEduUniversitaria",
+        "idHVEduUniversitaria",
+        {
+            "university": "strUniversidad",
+            "degree": "strCarreraUni",
+            "year": "anioBachiller",
+        },
+    ),
+    (
+        PostgraduateEducation,
+        "oEduPosgrago",
+        "idHVPosgrado",
+        {
+            "study_center": "strCenEstudioPosgrado",
+            "specialty": "strEspecialidadPosgrado",
+            "year": "anioPosgrado",
+        },
+    ),
+    (
+        MovableProperty,
+        "lBienMueble",
+        "idHVBienMueble",
+        {
+            "property_type": "strVehiculo",
+            "features": "strCaracteristica",
+            "value": "decValor",
+            "comment": "strComentario",
+        },
+    ),
+    (
+        ImmovableProperty,
+        "lBienInmueble",
+        "idHVBienInmueble",
+        {
+            "property_type": "strTipoBienInmueble",
+            "value": "decAutovaluo",
+            "comment": "strComentario",
+        },
+    ),
+    (
+        PartisanPosition,
+        "lCargoPartidario",
+        "idHVCargoPartidario",
+        {
+            "political_organization": {
+                "model_class": PoliticalOrganization,
+                "jne_id": "idOrgPolCargoPartidario",
+                "name": "strOrgPolCargoPartidario",
+            },
+            "starting_year": "anioCargoPartiDesde",
+            "ending_year": "anioCargoPartiHasta",
+            "position": "strCargoPartidario",
+        },
+    ),
+)
+
+# CurriculumVitae totals computed from its sections
+SECTION_TOTALS = (
+    ("total_movable_properties_value", MovableProperty, Sum("value")),
+    ("total_immovable_properties_value", ImmovableProperty, Sum("value")),
+    ("total_penal_sentences", PenalSentence, Count("pk")),
+    ("total_obligation_sentences", ObligationSentence, Count("pk")),
+)
+TOTAL_FIELDS = [field for field, _, _ in SECTION_TOTALS] + [
+    "total_incomes",
+    "total_movable_immovable_properties_value",
+    "total_sentences",
+]
+
+
+def get_cv_fields(resume_info):
+    defaults = {
+        # residence info
+        "residence_address": resume_info.oDatosPersonales.strDomicilioDirecc,
+        "residence_department": resume_info.oDatosPersonales.strDomiDepartamento,
+        "residence_province": resume_info.oDatosPersonales.strDomiProvincia,
+        "residence_district": resume_info.oDatosPersonales.strDomiDistrito,
+        "residence_ubigeo": resume_info.oDatosPersonales.strUbigeoDomicilio,
+        # birth place info
+        "birth_country": resume_info.oDatosPersonales.strPaisNacimiento,
+        "birth_department": resume_info.oDatosPersonales.strNaciDepartamento,
+        "birth_province": resume_info.oDatosPersonales.strNaciProvincia,
+        "birth_district": resume_info.oDatosPersonales.strNaciDistrito,
+        "birth_ubigeo": resume_info.oDatosPersonales.strUbigeoNacimiento,
+        # basic education
+        "primary_school": resume_info.oEduBasica.strEduPrimaria == "1",
+        "concluded_primary_school": resume_info.oEduBasica.strConcluidoEduPrimaria
+        == "1",
+        "high_school": resume_info.oEduBasica.strEduSecundaria == "1",
+        "concluded_high_school": resume_info.oEduBasica.strConcluidoEduSecundaria
+        == "1",
+        "has_technical_education": resume_info.oEduTecnico
+        and resume_info.oEduTecnico.tengoEduTecnico,
+        "has_non_university_education": resume_info.oEduNoUniversitaria
+        and resume_info.oEduNoUniversitaria.tengoNoUniversitaria,
+        "additional_information": resume_info.oInfoAdicional.strInfoAdicional,
+    }
+    if not resume_info.oIngresos.is_empty:
+        defaults.update(
+            {
+                "incomes_year": resume_info.oIngresos.strAnioIngresos,
+                "gross_annual_remunerations_public": resume_info.oIngresos.decRemuBrutaPublico,
+                "gross_annual_remunerations_private": resume_info.oIngresos.decRemuBrutaPrivado,
+                "gross_annual_income_per_individual_year_public": resume_info.oIngresos.decRentaIndividualPublico,
+                "gross_annual_income_per_individual_year_private": resume_info.oIngresos.decRentaIndividualPrivado,
+                "other_income_public": resume_info.oIngresos.decOtroIngresoPublico,
+                "other_income_private": resume_info.oIngresos.decOtroIngresoPrivado,
+            }
+        )
+    return defaults
+
+
+def get_section_items(resume_info, resume_field):
+    items = getattr(resume_info, resume_field)
+    if not isinstance(items, list):
+        items = [items]
+    if hasattr(items, "exclude_empty_item"):
+        items = items.exclude_empty_item
+    return items
+
+
+class CVWriter:
+    """
+    Collects fetched resumes and writes about `batch_size` of them per
+    transaction: the CVs, their sections in bulk inserts, the candidates'
+    link to their CV, the CV totals and the candidates' places on the
+    leaderboards.
+
+    Like the serial import did, CVs and section items already imported are
+    left as they are, only the totals are recalculated.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.pending = []
+        self.cvs = 0
+        self.candidates = 0
+
+    def add(self, cv_jne_id, resume_info, candidates):
+        self.pending.append((cv_jne_id, resume_info, candidates))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        pending, self.pending = self.pending, []
+        if pending:
+            with transaction.atomic():
+                self.write(pending)
+            self.cvs += len(pending)
+            self.candidates += sum(len(candidates) for _, _, candidates in pending)
+
+    def write(self, pending):
+        # get or create the CVs
+        CurriculumVitae.objects.bulk_create(
+            [
+                self.build_cv(cv_jne_id, resume_info)
+                for cv_jne_id, resume_info, _ in pending
+            ],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        cv_ids = dict(
+            CurriculumVitae.objects.filter(
+                jne_id__in=[cv_jne_id for cv_jne_id, _, _ in pending]
+            ).values_list("jne_id", "pk")
+        )
+
+        # link them to their candidates
+        candidates = []
+        for cv_jne_id, _, cv_candidates in pending:
+            for candidate in cv_candidates:
+                candidate.cv_id = cv_ids[cv_jne_id]
+                candidates.append(candidate)
+        Candidate.objects.bulk_update(candidates, ["cv"], batch_size=self.batch_size)
+
+        for model, resume_field, pk_field, mapping_fields in CV_SECTIONS:
+            items = [
+                (cv_ids[cv_jne_id], item)
+                for cv_jne_id, resume_info, _ in pending
+                for item in get_section_items(resume_info, resume_field)
+            ]
+            related_ids = self.get_related_ids(items, mapping_fields)
+            # get or create every item
+            model.objects.bulk_create(
+                [
+                    model(
+                        cv_id=cv_id,
+                        jne_id=getattr(item, pk_field),
+                        **self.get_item_fields(item, mapping_fields, related_ids),
+                    )
+                    for cv_id, item in items
+                ],
+                batch_size=self.batch_size,
+                ignore_conflicts=True,
+            )
+
+        self.update_totals(list(cv_ids.values()))
+        # move the candidates to their place on the leaderboards
+        LeaderboardEntry.objects.update_candidates(
+            [candidate.pk for candidate in candidates],
+            settings.ELECTION_LEADERBOARD_SIZE,
+        )
+
+    def build_cv(self, cv_jne_id, resume_info):
+        cv = CurriculumVitae(jne_id=cv_jne_id, **get_cv_fields(resume_info))
+        cv.calculate_totals()
+        return cv
+
+    def get_related_ids(self, items, mapping_fields):
+        """
+        Get or create the foreign keys of the section `items`, return
+        {field: {JNE id: pk}}.
+        """
+        related_ids = {}
+        for key, value in mapping_fields.items():
+            if isinstance(value, dict):
+                related_ids[key] = upsert(
+                    value["model_class"],
+                    [
+                        {
+                            k: getattr(item, v)
+                            for k, v in value.items()
+                            if k != "model_class"
+                        }
+                        for _, item in items
+                    ],
+                    "jne_id",
+                    batch_size=self.batch_size,
+                )
+        return related_ids
+
+    def get_item_fields(self, item, mapping_fields, related_ids):
+        fields = {}
+        for key, value in mapping_fields.items():
+            if isinstance(value, dict):
+                fields[f"{key}_id"] = related_ids[key][getattr(item, value["jne_id"])]
+            else:
+                fields[key] = getattr(item, value)
+        return fields
+
+    def update_totals(self, cv_ids):
+        totals = defaultdict(dict)
+        for field, model, aggregate in SECTION_TOTALS:
+            rows = (
+                model.objects.filter(cv_id__in=cv_ids)
+                .values("cv_id")
+                .annotate(total=aggregate)
+                .values_list("cv_id", "total")
+            )
+            for cv_id, total in rows:
+                totals[cv_id][field] = total
+
+        cvs = list(CurriculumVitae.objects.filter(pk__in=cv_ids))
+        for cv in cvs:
+            for field, _, _ in SECTION_TOTALS:
+                setattr(cv, field, totals[cv.pk].get(field) or 0)
+            cv.calculate_totals()
+        CurriculumVitae.objects.bulk_update(
+            cvs, TOTAL_FIELDS, batch_size=self.batch_size
+        )
 
 
 class Command(BaseCommand):
@@ -16,8 +344,49 @@ class Command(BaseCommand):
         parser.add_argument(
             "--election_type", help="Select candidates that belong to the election type"
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Resumes fetched from the JNE at the same time",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=100, help="CVs written per transaction"
+        )
+        parser.add_argument(
+            "--max-requests-per-second",
+            type=float,
+            help=(
+                "Requests sent to the JNE per second, from all the workers "
+                "(default: JNE_MAX_REQUESTS_PER_SECOND, 0: no limit)"
+            ),
+        )
+
+        parser.add_argument(
+            "--cache-dir",
+            help="Read and store the JNE responses here (default: JNE_CACHE_DIR)",
+        )
+        parser.add_argument(
+            "--cache-mode",
+            choices=jne_cache.MODES,
+            default=jne_cache.USE,
+            help=(
+                "use: fetch only the responses missing from the cache, refresh: "
+                "fetch and store all of them, replay: only read the cache, "
+                "without network"
+            ),
+        )
+
+    def execute(self, *args, **options):
+        with record_import_run("import_candidates_cv"):
+            return super().execute(*args, **options)
 
     def handle(self, *args, **options):
+        try:
+            cache = get_cache(options["cache_dir"], options["cache_mode"])
+        except ValueError as e:
+            raise CommandError(e)
+        start = time.perf_counter()
         # we can only import cv for candidates enrolled in list
         # candidates unregistered don't  have resume at JNE
         lookups = {}
@@ -29,231 +398,55 @@ class Command(BaseCommand):
             lookups["election_type__jne_id"] = election_type_jne_id
 
         candidates = Candidate.objects.on_list().filter(**lookups)
-        self.stdout.write(f"Selected {candidates.count()} registered candidates")
-        for candidate in candidates:
-            self.import_candidate_cv(candidate)
-
-    def _get_defaults_from_mapping(self, item, mapping_fields):
-        _defaults = {}
-        for key, value in mapping_fields.items():
-            if isinstance(value, dict):
-                model_class = value["model_class"]
-                _defaults[key], _ = model_class.objects.get_or_create(
-                    jne_id=getattr(item, value["jne_id"]),
-                    defaults={
-                        k: getattr(item, v)
-                        for k, v in value.items()
-                        if k not in ["model_class"]
-                    },
-                )
-            else:
-                _defaults[key] = getattr(item, value)
-        return _defaults
-
-    def import_cv_section(
-        self,
-        cv_instance,
-        reverse_foreign_key,
-        cv,
-        cv_section_field,
-        cv_section_item_pk_field,
-        mapping_fields,
-    ):
-        items = getattr(cv, cv_section_field)
-        if not isinstance(items, list):
-            items = [items]
-        if hasattr(items, "exclude_empty_item"):
-            items = items.exclude_empty_item
-        for item in items:
-            _defaults = self._get_defaults_from_mapping(
-                item, mapping_fields=mapping_fields
-            )
-            related_manager = getattr(cv_instance, reverse_foreign_key)
-            related_manager.get_or_create(
-                jne_id=getattr(item, cv_section_item_pk_field), defaults=_defaults
-            )
-
-    def import_candidate_cv(self, candidate):
+        # candidates sharing a resume get it fetched once
+        candidates_by_cv = defaultdict(list)
+        for candidate in candidates.filter(cv_jne_id__isnull=False).select_related(
+            "election", "political_organization"
+        ):
+            candidates_by_cv[candidate.cv_jne_id].append(candidate)
         self.stdout.write(
-            f"CANDIDATE FULLNAME={candidate.full_name}; CV_JNE_ID={candidate.cv_jne_id}"
-        )
-        client = JNE()
-        resume_info = client.get_resume(
-            candidate.cv_jne_id,
-            candidate.election.jne_id,
-            candidate.political_organization.jne_id,
-        )
-
-        defaults = {
-            # residence info
-            "residence_address": resume_info.oDatosPersonales.strDomicilioDirecc,
-            "residence_department": resume_info.oDatosPersonales.strDomiDepartamento,
-            "residence_province": resume_info.oDatosPersonales.strDomiProvincia,
-            "residence_district": resume_info.oDatosPersonales.strDomiDistrito,
-            "residence_ubigeo": resume_info.oDatosPersonales.strUbigeoDomicilio,
-            # birth place info
-            "birth_country": resume_info.oDatosPersonales.strPaisNacimiento,
-            "birth_department": resume_info.oDatosPersonales.strNaciDepartamento,
-            "birth_province": resume_info.oDatosPersonales.strNaciProvincia,
-            "birth_district": resume_info.oDatosPersonales.strNaciDistrito,
-            "birth_ubigeo": resume_info.oDatosPersonales.strUbigeoNacimiento,
-            # basic education
-            "primary_school": resume_info.oEduBasica.strEduPrimaria == "1",
-            "concluded_primary_school": resume_info.oEduBasica.strConcluidoEduPrimaria
-            == "1",
-            "high_school": resume_info.oEduBasica.strEduSecundaria == "1",
-            "concluded_high_school": resume_info.oEduBasica.strConcluidoEduSecundaria
-            == "1",
-            "has_technical_education": resume_info.oEduTecnico
-            and resume_info.oEduTecnico.tengoEduTecnico,
-            "has_non_university_education": resume_info.oEduNoUniversitaria
-            and resume_info.oEduNoUniversitaria.tengoNoUniversitaria,
-            "additional_information": resume_info.oInfoAdicional.strInfoAdicional,
-        }
-        if not resume_info.oIngresos.is_empty:
-            defaults.update(
-                {
-                    "incomes_year": resume_info.oIngresos.strAnioIngresos,
-                    "gross_annual_remunerations_public": resume_info.oIngresos.decRemuBrutaPublico,
-                    "gross_annual_remunerations_private": resume_info.oIngresos.decRemuBrutaPrivado,
-                    "gross_annual_income_per_individual_year_public": resume_info.oIngresos.decRentaIndividualPublico,
-                    "gross_annual_income_per_individual_year_private": resume_info.oIngresos.decRentaIndividualPrivado,
-                    "other_income_public": resume_info.oIngresos.decOtroIngresoPublico,
-                    "other_income_private": resume_info.oIngresos.decOtroIngresoPrivado,
-                }
-            )
-        cv, _ = CurriculumVitae.objects.get_or_create(
-            jne_id=candidate.cv_jne_id, defaults=defaults
-        )
-
-        # link cv to candidate
-        candidate.cv = cv
-        candidate.save()
-
-        # import penal sentences
-        self.import_cv_section(
-            cv,
-            "penal_sentences",
-            resume_info,
-            "lSentenciaPenal",
-            "idHVSentenciaPenal",
-            {
-                "file_number": "strExpedientePenal",
-                "criminal_sentence_date": "fechaSentenciaPenal",
-                "judicial_authority": "strOrganoJudiPenal",
-                "criminal_offense": "strDelitoPenal",
-                "judgment": "strFalloPenal",
-                "modality": "strModalidad",
-                "other_modality": "strOtraModalidad",
-            },
-        )
-
-        # import obligation sentences
-        self.import_cv_section(
-            cv,
-            "obligation_sentences",
-            resume_info,
-            "lSentenciaObliga",
-            "idHVSentenciaObliga",
-            {
-                "demand_matter": "strMateriaSentencia",
-                "file_number": "strExpedienteObliga",
-                "judicial_authority": "strOrganoJuridicialObliga",
-                "judgment": "strFalloObliga",
-            },
+            f"Selected {candidates.count()} registered candidates, "
+            f"{len(candidates_by_cv)} CVs"
         )
 
-        # import professional experiences
-        self.import_cv_section(
-            cv,
-            "professional_experiences",
-            resume_info,
-            "lExperienciaLaboral",
-            "idHVExpeLaboral",
-            {
-                "workplace": "strCentroTrabajo",
-                "position": "strOcupacionProfesion",
-                "starting_year": "anioTrabajoDesde",
-                "ending_year": "anioTrabajoHasta",
-            },
+        client = JNEClient(
+            pool_size=options["workers"],
+            max_requests_per_second=options["max_requests_per_second"],
+            cache=cache,
         )
+        writer = CVWriter(options["batch_size"])
 
-        # import university educations
-        self.import_cv_section(
-            cv,
-            "university_educations",
-            resume_info,
-            "lEduUniversitaria",
-            "idHVEduUniversitaria",
-            {
-                "university": "strUniversidad",
-                "degree": "strCarreraUni",
-                "year": "anioBachiller",
-            },
-        )
-
-        # import postgraduate educations
-        self.import_cv_section(
-            cv,
-            "postgraduate_educations",
-            resume_info,
-            "oEduPosgrago",
-            "idHVPosgrado",
-            {
-                "study_center": "strCenEstudioPosgrado",
-                "specialty": "strEspecialidadPosgrado",
-                "year": "anioPosgrado",
-            },
-        )
+        def fetch_resume(cv_jne_id):
+            candidate = candidates_by_cv[cv_jne_id][0]
+            return client.get_resume(
+                cv_jne_id,
+                candidate.election.jne_id,
+                candidate.political_organization.jne_id,
+            )
 
-        # import movable properties
-        self.import_cv_section(
-            cv,
-            "movable_properties",
-            resume_info,
-            "lBienMueble",
-            "idHVBienMueble",
-            {
-                "property_type": "strVehiculo",
-                "features": "strCaracteristica",
-                "value": "decValor",
-                "comment": "strComentario",
-            },
-        )
+        try:
+            for cv_jne_id, resume_info in fetch_ordered(
+                fetch_resume, list(candidates_by_cv), options["workers"]
+            ):
+                for candidate in candidates_by_cv[cv_jne_id]:
+                    self.stdout.write(
+                        f"CANDIDATE FULLNAME={candidate.full_name}; "
+                        f"CV_JNE_ID={cv_jne_id}"
+                    )
+                writer.add(cv_jne_id, resume_info, candidates_by_cv[cv_jne_id])
+            writer.flush()
+        finally:
+            self.stdout.write(client.stats.report())
 
-        # import immovable properties
-        self.import_cv_section(
-            cv,
-            "immovable_properties",
-            resume_info,
-            "lBienInmueble",
-            "idHVBienInmueble",
-            {
-                "property_type": "strTipoBienInmueble",
-                "value": "decAutovaluo",
-                "comment": "strComentario",
-            },
-        )
+        # rebuild the read model used to list candidates
+        election_ids = candidates.values_list("election_id", flat=True).distinct()
+        for election_id in election_ids:
+            CandidateListing.objects.refresh(election_id)
+            bump_data_version(election_id)
+            if settings.ELECTION_SNAPSHOTS_ENABLED:
+                write_snapshot(ElectionProcess.objects.get(pk=election_id))
 
-        # import partisan positions
-        self.import_cv_section(
-            cv,
-            "partisan_positions",
-            resume_info,
-            "lCargoPartidario",
-            "idHVCargoPartidario",
-            {
-                "political_organization": {
-                    "model_class": PoliticalOrganization,
-                    "jne_id": "idOrgPolCargoPartidario",
-                    "name": "strOrgPolCargoPartidario",
-                },
-                "starting_year": "anioCargoPartiDesde",
-                "ending_year": "anioCargoPartiHasta",
-                "position": "strCargoPartidario",
-            },
+        self.stdout.write(
+            f"Imported {writer.cvs} CVs of {writer.candidates} candidates in "
+            f"{time.perf_counter() - start:.1f}s"
         )
-
-        # calculate totals
-        cv.calculate_aggregate_totals()
-        cv.save()
@@ -1,28 +1,308 @@
-from django.core.management.base import BaseCommand
+import functools
+import time
 
-from pyjne_peru.client import JNE
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
+from app.elections import jne_cache
+from app.elections.bulk import link, upsert
+from app.elections.fetching import fetch_ordered
+from app.elections.jne import JNEClient, get_cache
 from app.elections.models import (
     Candidate,
+    CandidateListing,
     ElectionProcess,
     ElectionType,
     ElectoralDistrict,
     Gender,
+    LeaderboardEntry,
     Person,
     PoliticalOrganization,
     Position,
     RelElectionProcessElectionType,
 )
+from app.elections.snapshots import write_snapshot
+from app.elections.versions import bump_data_version
+from app.shared.metrics import record_import_run
+
+# fields refreshed from the JNE data when the row already exists; a
+# candidate's CV and search columns are maintained by other steps
+PERSON_UPDATE_FIELDS = (
+    "first_name",
+    "surname",
+    "second_surname",
+    "birth_date",
+    "gender",
+)
+CANDIDATE_UPDATE_FIELDS = (
+    "election",
+    "election_type",
+    "person",
+    "position",
+    "ballot_position",
+    "full_name",
+    "political_organization",
+    "electoral_district",
+    "status_on_list",
+    "cv_jne_id",
+    "photo_url_path",
+)
+
+
+class CandidateWriter:
+    """
+    Collects the candidates of the files on list of an election and writes
+    them, with their political organizations, electoral districts, persons
+    and positions, in batched upserts of about `batch_size` candidates.
+    """
+
+    def __init__(self, election_process, batch_size):
+        self.election_process = election_process
+        self.batch_size = batch_size
+        self.pending = []
+        self.candidates = 0
+        self.rows = 0
+        self.seconds = 0.0
+
+    def add(self, rel_election_type, file, candidates):
+        self.pending.append((rel_election_type, file, list(candidates)))
+        if sum(len(candidates) for _, _, candidates in self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        pending, self.pending = self.pending, []
+        start = time.perf_counter()
+        with transaction.atomic():
+            self.write(pending)
+        self.seconds += time.perf_counter() - start
+
+    def write(self, pending):
+        files = [file for _, file, _ in pending]
+        candidates = [
+            (rel, file, candidate)
+            for rel, file, file_candidates in pending
+            for candidate in file_candidates
+        ]
+
+        organizations = self.upsert(
+            PoliticalOrganization,
+            [
+                {
+                    "jne_id": file.idOrganizacionPolitica,
+                    "name": file.strOrganizacionPolitica,
+                }
+                for file in files
+            ],
+            "jne_id",
+            ["name"],
+        )
+        districts = self.upsert(
+            ElectoralDistrict,
+            [
+                {"ubigeo": file.strUbigeo, "name": file.strDistritoElec}
+                for file in files
+                if file.strUbigeo
+            ],
+            "ubigeo",
+            ["name"],
+        )
+        positions = self.upsert(
+            Position,
+            [
+                {
+                    "jne_id": candidate.idCargoEleccion,
+                    "name": candidate.strCargoEleccion,
+                }
+                for _, _, candidate in candidates
+            ],
+            "jne_id",
+            ["name"],
+        )
+        person_rows = [
+            {
+                "dni": candidate.strDocumentoIdentidad or None,
+                "first_name": candidate.strNombreCompleto,
+                "surname": candidate.strApellidoPaterno,
+                "second_surname": candidate.strApellidoMaterno,
+                "birth_date": candidate.fechaNacimiento,
+                "gender": Gender.MALE if candidate.strSexo == "1" else Gender.FEMALE,
+            }
+            for _, _, candidate in candidates
+        ]
+        persons = self.upsert(
+            Person,
+            [row for row in person_rows if row["dni"]],
+            "dni",
+            PERSON_UPDATE_FIELDS,
+        )
+        undocumented = self.save_undocumented_persons(
+            {
+                candidate.idCandidato: row
+                for (_, _, candidate), row in zip(candidates, person_rows)
+                if not row["dni"]
+            }
+        )
+        self.upsert(
+            Candidate,
+            [
+                {
+                    "election_id": self.election_process.id,
+                    "election_type_id": rel.election_type_id,
+                    "person_id": (
+                        persons[person["dni"]]
+                        if person["dni"]
+                        else undocumented[candidate.idCandidato]
+                    ),
+                    "position_id": positions[candidate.idCargoEleccion],
+                    "ballot_position": candidate.intPosicion,
+                    "full_name": " ".join(
+                        [
+                            person["first_name"],
+                            person["surname"],
+                            person["second_surname"],
+                        ]
+                    ),
+                    "political_organization_id": organizations[
+                        file.idOrganizacionPolitica
+                    ],
+                    "electoral_district_id": districts.get(file.strUbigeo),
+                    "status_on_list": candidate.strEstadoExp,
+                    "jne_id": candidate.idCandidato,
+                    "cv_jne_id": candidate.idHojaVida,
+                    "photo_url_path": candidate.strRutaArchivo,
+                }
+                for (rel, file, candidate), person in zip(candidates, person_rows)
+            ],
+            "jne_id",
+            CANDIDATE_UPDATE_FIELDS,
+        )
+        self.candidates += len(candidates)
+
+        # political organizations are only added to the relationship between
+        # election process and election type when the file's status is INSCRITO
+        self.link(
+            RelElectionProcessElectionType.political_organizations,
+            [
+                (rel.id, organizations[file.idOrganizacionPolitica])
+                for rel, file, _ in pending
+                if file.strEstadoLista == "INSCRITO"
+            ],
+        )
+        self.link(
+            ElectionProcess.districts,
+            [(self.election_process.id, pk) for pk in districts.values()],
+        )
+        self.link(
+            ElectionProcess.positions,
+            [(self.election_process.id, pk) for pk in positions.values()],
+        )
+
+    def upsert(self, model, rows, unique_field, update_fields):
+        pks = upsert(model, rows, unique_field, update_fields, self.batch_size)
+        self.rows += len(pks)
+        return pks
+
+    def save_undocumented_persons(self, rows):
+        """
+        Save the persons without DNI of {candidate JNE id: person row}, which
+        can't be upserted on it: update the person each candidate already has,
+        or create one. Return {candidate JNE id: person pk}.
+        """
+        if not rows:
+            return {}
+        pks = dict(
+            Candidate.objects.filter(
+                jne_id__in=list(rows), person__dni__isnull=True
+            ).values_list("jne_id", "person_id")
+        )
+        Person.objects.bulk_update(
+            [Person(pk=pks[jne_id], **rows[jne_id]) for jne_id in pks],
+            PERSON_UPDATE_FIELDS,
+            batch_size=self.batch_size,
+        )
+        for jne_id, row in rows.items():
+            if jne_id not in pks:
+                pks[jne_id] = Person.objects.create(**row).pk
+        self.rows += len(rows)
+        return pks
+
+    def link(self, relation, pairs):
+        pairs = set(pairs)
+        link(relation, pairs, self.batch_size)
+        self.rows += len(pairs)
 
 
 class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Candidates written per batch of upserts",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Lists of candidates fetched from the JNE at the same time",
+        )
+        parser.add_argument(
+            "--max-requests-per-second",
+            type=float,
+            help=(
+                "Requests sent to the JNE per second, from all the workers "
+                "(default: JNE_MAX_REQUESTS_PER_SECOND, 0: no limit)"
+            ),
+        )
+        parser.add_argument(
+            "--cache-dir",
+            help="Read and store the JNE responses here (default: JNE_CACHE_DIR)",
+        )
+        parser.add_argument(
+            "--cache-mode",
+            choices=jne_cache.MODES,
+            default=jne_cache.USE,
+            help=(
+                "use: fetch only the responses missing from the cache, refresh: "
+                "fetch and store all of them, replay: only read the cache, "
+                "without network"
+            ),
+        )
+
+    def execute(self, *args, **options):
+        with record_import_run("import_jne_data"):
+            return super().execute(*args, **options)
+
+    def get_candidates(self, client, election_process_id, election_type_id, file):
+        return client.get_candidates_by_list(
+            election_process_id,
+            election_type_id,
+            file.idSolicitudLista,
+            file.idExpediente,
+        )
+
     def handle(self, *args, **options):
-        client = JNE()
+        try:
+            cache = get_cache(options["cache_dir"], options["cache_mode"])
+        except ValueError as e:
+            raise CommandError(e)
+        client = JNEClient(
+            pool_size=options["workers"],
+            max_requests_per_second=options["max_requests_per_second"],
+            cache=cache,
+        )
+        try:
+            self.import_election_processes(client, options)
+        finally:
+            self.stdout.write(client.stats.report())
 
+    def import_election_processes(self, client, options):
         election_processes = client.get_election_processes()
         for election_process in election_processes.exclude_empty_item:
             if election_process.idProcesoElectoral not in [110]:
                 continue
+            start = time.perf_counter()
             # import election process
             self.stdout.write(
                 f"Importing election process {election_process.strProcesoElectoral}"
@@ -43,6 +323,7 @@ class Command(BaseCommand):
                     if hasattr(obj_election_process, key):
                         setattr(obj_election_process, key, val)
                 obj_election_process.save()
+            writer = CandidateWriter(obj_election_process, options["batch_size"])
             # import election types for each election process
             election_types = client.get_election_types_by_process(
                 obj_election_process.jne_id
@@ -68,87 +349,33 @@ class Command(BaseCommand):
                 files_on_list = client.get_files_on_list(
                     election_process.idProcesoElectoral, election_type.idTipoEleccion
                 )
-                for file in files_on_list:
+                # import candidates for each file on list, fetched
+                # concurrently and written in order
+                fetch_candidates = functools.partial(
+                    self.get_candidates,
+                    client,
+                    election_process.idProcesoElectoral,
+                    election_type.idTipoEleccion,
+                )
+                for file, candidates in fetch_ordered(
+                    fetch_candidates, files_on_list, options["workers"]
+                ):
                     self.stdout.write(f"BEGIN: Importing File: {file.idExpediente}")
-                    # get or create political organization
-                    (
-                        obj_political_organization,
-                        _created,
-                    ) = PoliticalOrganization.objects.get_or_create(
-                        jne_id=file.idOrganizacionPolitica,
-                        defaults={"name": file.strOrganizacionPolitica},
-                    )
-                    msg_type = "CREATED" if _created else "ALREADY_EXIST"
-                    self.stdout.write(
-                        f"{msg_type}: Political Organization: {file.strOrganizacionPolitica}"
-                    )
-                    # add political organization to the relationship between election
-                    # process and election type ONLY IF the file's status is INSCRITO
-                    if file.strEstadoLista == "INSCRITO":
-                        rel_election_process_election_type.political_organizations.add(
-                            obj_political_organization
-                        )
-                    # get or create electoral district
-                    if file.strUbigeo:
-                        (
-                            obj_electoral_district,
-                            _created,
-                        ) = ElectoralDistrict.objects.get_or_create(
-                            ubigeo=file.strUbigeo,
-                            defaults={"name": file.strDistritoElec},
-                        )
-                        msg_type = "CREATED" if _created else "ALREADY_EXIST"
-                        self.stdout.write(
-                            f"{msg_type}: Electoral District: {file.strDistritoElec}"
-                        )
-                        obj_election_process.districts.add(obj_electoral_district)
-                    else:
-                        obj_electoral_district = None
-
-                    # import candidates for each file on list
-                    candidates = client.get_candidates_by_list(
-                        election_process.idProcesoElectoral,
-                        election_type.idTipoEleccion,
-                        file.idSolicitudLista,
-                        file.idExpediente,
-                    )
-                    for candidate in candidates:
-                        self.stdout.write(
-                            f"Importing candidate {candidate.strCandidato}"
-                        )
-                        obj_person, _ = Person.objects.get_or_create(
-                            dni=candidate.strDocumentoIdentidad,
-                            defaults={
-                                "first_name": candidate.strNombreCompleto,
-                                "surname": candidate.strApellidoPaterno,
-                                "second_surname": candidate.strApellidoMaterno,
-                                "birth_date": candidate.fechaNacimiento,
-                                "gender": Gender.MALE
-                                if candidate.strSexo == "1"
-                                else Gender.FEMALE,
-                            },
-                        )
-
-                        # get or create position
-                        obj_position, _ = Position.objects.get_or_create(
-                            jne_id=candidate.idCargoEleccion,
-                            defaults={"name": candidate.strCargoEleccion},
-                        )
-                        # add position to election process
-                        obj_election_process.positions.add(obj_position)
-                        # get or create candidate
-                        Candidate.objects.get_or_create(
-                            jne_id=candidate.idCandidato,
-                            defaults={
-                                "election": obj_election_process,
-                                "election_type": obj_election_type,
-                                "person": obj_person,
-                                "position": obj_position,
-                                "ballot_position": candidate.intPosicion,
-                                "political_organization": obj_political_organization,
-                                "electoral_district": obj_electoral_district,
-                                "status_on_list": candidate.strEstadoExp,
-                                "photo_url_path": candidate.strRutaArchivo,
-                                "cv_jne_id": candidate.idHojaVida,
-                            },
-                        )
+                    writer.add(rel_election_process_election_type, file, candidates)
+            writer.flush()
+            # rebuild the search index, the read model used to list
+            # candidates and the leaderboards
+            Candidate.objects.refresh_search(obj_election_process.id)
+            CandidateListing.objects.refresh(obj_election_process.id)
+            LeaderboardEntry.objects.refresh(
+                obj_election_process.id, settings.ELECTION_LEADERBOARD_SIZE
+            )
+            bump_data_version(obj_election_process.id)
+            if settings.ELECTION_SNAPSHOTS_ENABLED:
+                write_snapshot(obj_election_process)
+
+            self.stdout.write(
+                f"Wrote {writer.rows} rows ({writer.candidates} candidates) in "
+                f"{writer.seconds:.1f}s, {writer.rows / (writer.seconds or 1):.0f} "
+                f"rows/s. Import took {time.perf_counter() - start:.1f}s"
+            )
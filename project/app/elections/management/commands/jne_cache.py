@@ -0,0 +1,64 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.elections.jne_cache import ResponseCache
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+def format_age(seconds):
+    for unit, length in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= length:
+            return f"{seconds / length:.1f}{unit}"
+    return f"{seconds:.0f}s"
+
+
+class Command(BaseCommand):
+    help = (
+        "Report the number, size and age of the JNE responses cached by the "
+        "import commands for each endpoint, and prune the old ones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cache-dir", help="Directory of the cache (default: JNE_CACHE_DIR)"
+        )
+        parser.add_argument(
+            "--prune-older-than",
+            type=float,
+            metavar="DAYS",
+            help="Delete the responses cached more than DAYS days ago first",
+        )
+
+    def handle(self, *args, **options):
+        directory = options["cache_dir"] or settings.JNE_CACHE_DIR
+        if not directory:
+            raise CommandError("No JNE cache directory, set JNE_CACHE_DIR")
+        cache = ResponseCache(directory)
+
+        if options["prune_older_than"] is not None:
+            deleted = cache.prune(options["prune_older_than"] * 86400)
+            self.stdout.write(f"Deleted {deleted} cached responses")
+
+        now = time.time()
+        report = cache.report()
+        for folder, info in sorted(report.items()):
+            self.stdout.write(
+                f"{folder}: {info['entries']} responses, "
+                f"{format_size(info['size'])}, "
+                f"oldest {format_age(now - info['oldest'])}, "
+                f"newest {format_age(now - info['newest'])}"
+            )
+        entries = sum(info["entries"] for info in report.values())
+        size = sum(info["size"] for info in report.values())
+        self.stdout.write(
+            f"Total: {entries} responses, {format_size(size)} in {cache.directory}"
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from app.elections.models import CandidateListing, ElectionProcess
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized candidate listing, one election at a time"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--election_process",
+            help="Only refresh the election process with this JNE id",
+        )
+
+    def handle(self, *args, **options):
+        elections = ElectionProcess.objects.all()
+        if options["election_process"]:
+            elections = elections.filter(jne_id=options["election_process"])
+        for election in elections:
+            CandidateListing.objects.refresh(election.id)
+            self.stdout.write(f"Refreshed candidate listing of {election.name}")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from app.elections.models import Candidate, ElectionProcess
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search text (and vector, on PostgreSQL) of the candidates"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--election_process",
+            help="Only refresh the election process with this JNE id",
+        )
+
+    def handle(self, *args, **options):
+        elections = ElectionProcess.objects.all()
+        if options["election_process"]:
+            elections = elections.filter(jne_id=options["election_process"])
+        for election in elections:
+            Candidate.objects.refresh_search(election.id)
+            self.stdout.write(f"Refreshed candidate search of {election.name}")
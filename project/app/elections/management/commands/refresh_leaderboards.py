@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.elections.models import ElectionProcess, LeaderboardEntry
+
+
+class Command(BaseCommand):
+    help = "Rebuild the candidate leaderboards of the election processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--election_process",
+            help="Only refresh the election process with this JNE id",
+        )
+
+    def handle(self, *args, **options):
+        elections = ElectionProcess.objects.all()
+        if options["election_process"]:
+            elections = elections.filter(jne_id=options["election_process"])
+        for election in elections:
+            LeaderboardEntry.objects.refresh(
+                election.id, settings.ELECTION_LEADERBOARD_SIZE
+            )
+            self.stdout.write(f"Refreshed leaderboards of {election.name}")
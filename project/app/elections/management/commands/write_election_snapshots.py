@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.elections import snapshots
+from app.elections.models import ElectionProcess
+
+
+class Command(BaseCommand):
+    help = (
+        "Write a columnar (Parquet) snapshot of the elections whose data changed "
+        "since their last snapshot"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--election_process",
+            help="Only write the snapshot of the election process with this JNE id",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Write the snapshot even if the latest one is up to date",
+        )
+
+    def handle(self, *args, **options):
+        if snapshots.pyarrow is None:
+            raise CommandError("Election snapshots require pyarrow")
+
+        elections = ElectionProcess.objects.all()
+        if options["election_process"]:
+            elections = elections.filter(jne_id=options["election_process"])
+        for election in elections:
+            manifest = snapshots.write_snapshot(election, force=options["force"])
+            if manifest is None:
+                self.stdout.write(f"Snapshot of {election.name} is up to date")
+                continue
+            self.stdout.write(
+                f"Wrote snapshot v{manifest['version']} of {election.name}"
+            )
+            for table, info in manifest["tables"].items():
+                self.stdout.write(
+                    f"  {table}: {info['rows']} rows, {info['size']} bytes"
+                )
@@ -1,6 +1,406 @@
-from django.db import models
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.contrib.postgres.lookups import Unaccent
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db import connections, models, transaction
+from django.db.models.functions import Coalesce, Concat, Lower
+
+# reverse relations from CurriculumVitae to each one of its sections
+CV_SECTIONS = (
+    "penal_sentences",
+    "obligation_sentences",
+    "professional_experiences",
+    "university_educations",
+    "postgraduate_educations",
+    "movable_properties",
+    "immovable_properties",
+    "partisan_positions",
+)
+
+# candidates enrolled in their list, the only ones shown by the API
+ON_LIST_STATUS = "INSCRITO"
+ON_LIST = models.Q(status_on_list=ON_LIST_STATUS)
+
+# Candidate lookups copied into Candidate.search_text
+CANDIDATE_SEARCH_SOURCES = ("full_name", "person__dni", "political_organization__name")
+
+
+def fold(text):
+    """
+    Lowercase `text` and strip its accents, the same normalization the
+    `unaccent` extension applies to the candidates' search text.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in text if not unicodedata.combining(char))
 
 
 class CandidateQuerySet(models.QuerySet):
     def on_list(self):
-        return self.filter(status_on_list="INSCRITO")
+        return self.filter(ON_LIST)
+
+    def with_related(self):
+        # every single-valued relation read by the candidate serializers
+        return self.select_related(
+            "person",
+            "cv",
+            "position",
+            "political_organization",
+            "electoral_district",
+            "election_type",
+        )
+
+    def with_cv_sections(self, sections=CV_SECTIONS):
+        # one query per section (plus one for the partisan positions'
+        # organizations) no matter how many candidates are fetched
+        lookups = [f"cv__{section}" for section in sections]
+        if "partisan_positions" in sections:
+            lookups.append("cv__partisan_positions__political_organization")
+        return self.prefetch_related(*lookups)
+
+    def search(self, text):
+        """
+        Filter the candidates whose name, DNI or organization name match
+        `text` and annotate their relevance as `search_rank`.
+
+        On PostgreSQL every word must match the start of a word of the search
+        text (full-text prefix query) or `text` must appear anywhere in it
+        (served by the trigram index); the rank adds up both scores. Other
+        databases only require every word to appear anywhere in the search
+        text, without ranking. Accents and case are ignored either way.
+        """
+        folded = fold(text).strip()
+        words = re.findall(r"\w+", folded)
+        if not words:
+            return self.none()
+
+        if connections[self.db].vendor != "postgresql":
+            queryset = self
+            for word in words:
+                queryset = queryset.filter(search_text__contains=word)
+            return queryset.annotate(search_rank=models.Value(0.0, models.FloatField()))
+
+        query = SearchQuery(
+            " & ".join(f"{word}:*" for word in words),
+            config="simple",
+            search_type="raw",
+        )
+        return self.filter(
+            models.Q(search_vector=query) | models.Q(search_text__contains=folded)
+        ).annotate(
+            search_rank=SearchRank(models.F("search_vector"), query)
+            + TrigramSimilarity("search_text", folded)
+        )
+
+    def refresh_search(self, election_id):
+        """
+        Rebuild the search text and vector of a single election's candidates
+        from their name, DNI and organization name. Other databases than
+        PostgreSQL only get the search text, folded in Python.
+        """
+        candidates = self.filter(election_id=election_id)
+        if connections[self.db].vendor != "postgresql":
+            rows = candidates.values_list("pk", *CANDIDATE_SEARCH_SOURCES)
+            self.bulk_update(
+                [
+                    self.model(
+                        pk=pk, search_text=fold(" ".join(v or "" for v in values))
+                    )
+                    for pk, *values in rows.iterator()
+                ],
+                ["search_text"],
+                batch_size=1000,
+            )
+            return
+        parts = []
+        for lookup in CANDIDATE_SEARCH_SOURCES:
+            if "__" in lookup:
+                # an UPDATE can't join, read related values with subqueries
+                related = self.model.objects.filter(pk=models.OuterRef("pk"))
+                value = models.Subquery(related.values(lookup)[:1])
+            else:
+                value = models.F(lookup)
+            parts.extend([Coalesce(value, models.Value("")), models.Value(" ")])
+        candidates.update(
+            search_text=Lower(
+                Unaccent(Concat(*parts[:-1], output_field=models.TextField()))
+            )
+        )
+        candidates.update(search_vector=SearchVector("search_text", config="simple"))
+
+
+# CandidateListing column => Candidate lookup it is copied from
+CANDIDATE_LISTING_SOURCES = {
+    "candidate_id": "id",
+    "election_id": "election_id",
+    "dni": "person__dni",
+    "first_name": "person__first_name",
+    "surname": "person__surname",
+    "second_surname": "person__second_surname",
+    "full_name": "full_name",
+    "gender": "person__gender",
+    "birth_date": "person__birth_date",
+    "residence_ubigeo": "cv__residence_ubigeo",
+    "birth_ubigeo": "cv__birth_ubigeo",
+    "primary_school": "cv__primary_school",
+    "concluded_primary_school": "cv__concluded_primary_school",
+    "high_school": "cv__high_school",
+    "concluded_high_school": "cv__concluded_high_school",
+    "has_technical_education": "cv__has_technical_education",
+    "has_non_university_education": "cv__has_non_university_education",
+    "additional_information": "cv__additional_information",
+    "photo_url_path": "photo_url_path",
+    "jne_id": "jne_id",
+    "position_id": "position_id",
+    "position_name": "position__name",
+    "position_jne_id": "position__jne_id",
+    "ballot_position": "ballot_position",
+    "political_organization_id": "political_organization_id",
+    "political_organization_name": "political_organization__name",
+    "political_organization_jne_id": "political_organization__jne_id",
+    "electoral_district_id": "electoral_district_id",
+    "electoral_district_name": "electoral_district__name",
+    "electoral_district_ubigeo": "electoral_district__ubigeo",
+    "election_type_id": "election_type_id",
+    "election_type_name": "election_type__name",
+    "election_type_jne_id": "election_type__jne_id",
+    "status_on_list": "status_on_list",
+    "total_incomes": "cv__total_incomes",
+    "gross_annual_remunerations_public": "cv__gross_annual_remunerations_public",
+    "gross_annual_remunerations_private": "cv__gross_annual_remunerations_private",
+    "gross_annual_income_per_individual_year_public": (
+        "cv__gross_annual_income_per_individual_year_public"
+    ),
+    "gross_annual_income_per_individual_year_private": (
+        "cv__gross_annual_income_per_individual_year_private"
+    ),
+    "other_income_public": "cv__other_income_public",
+    "other_income_private": "cv__other_income_private",
+    "total_sentences": "cv__total_sentences",
+    "total_penal_sentences": "cv__total_penal_sentences",
+    "total_obligation_sentences": "cv__total_obligation_sentences",
+}
+
+
+class CandidateListingQuerySet(models.QuerySet):
+    def on_list(self):
+        return self.filter(ON_LIST)
+
+    def refresh(self, election_id, batch_size=1000):
+        """
+        Rebuild the rows of a single election from Candidate and its
+        relations. Only that election's rows are locked while refreshing.
+        """
+        candidate_model = self.model._meta.get_field("candidate").related_model
+        columns = list(CANDIDATE_LISTING_SOURCES)
+        values_list = (
+            candidate_model.objects.filter(election_id=election_id)
+            .values_list(*CANDIDATE_LISTING_SOURCES.values())
+            .iterator(chunk_size=batch_size)
+        )
+        with transaction.atomic():
+            self.filter(election_id=election_id).delete()
+            batch = []
+            for values in values_list:
+                batch.append(self.model(**dict(zip(columns, values))))
+                if len(batch) == batch_size:
+                    self.bulk_create(batch)
+                    batch = []
+            self.bulk_create(batch)
+
+
+# CurriculumVitae totals with a leaderboard
+LEADERBOARD_METRICS = (
+    "total_incomes",
+    "total_movable_immovable_properties_value",
+    "total_sentences",
+    "total_penal_sentences",
+)
+
+
+class LeaderboardEntryQuerySet(models.QuerySet):
+    """
+    Top candidates of an election by a CV total, overall (no election type or
+    district), per election type and per electoral district. Only candidates
+    on list with a total greater than zero are ranked.
+    """
+
+    def board(self, election_id, metric, election_type_id=None, district_id=None):
+        return self.filter(
+            election_id=election_id,
+            metric=metric,
+            election_type_id=election_type_id,
+            electoral_district_id=district_id,
+        ).order_by("-value", "candidate_id")
+
+    def _build_board(self, election_id, metric, election_type_id, district_id, size):
+        candidate_model = self.model._meta.get_field("candidate").related_model
+        candidates = candidate_model.objects.on_list().filter(election_id=election_id)
+        if election_type_id is not None:
+            candidates = candidates.filter(election_type_id=election_type_id)
+        if district_id is not None:
+            candidates = candidates.filter(electoral_district_id=district_id)
+        top = (
+            candidates.filter(**{f"cv__{metric}__gt": 0})
+            .order_by(f"-cv__{metric}", "pk")
+            .values_list("pk", f"cv__{metric}")[:size]
+        )
+        return [
+            self.model(
+                election_id=election_id,
+                metric=metric,
+                election_type_id=election_type_id,
+                electoral_district_id=district_id,
+                candidate_id=candidate_id,
+                value=value,
+            )
+            for candidate_id, value in top
+        ]
+
+    def refresh(self, election_id, size):
+        """
+        Rebuild every leaderboard of a single election.
+        """
+        candidate_model = self.model._meta.get_field("candidate").related_model
+        candidates = candidate_model.objects.on_list().filter(election_id=election_id)
+        boards = [(None, None)]
+        boards.extend(
+            (election_type_id, None)
+            for election_type_id in candidates.order_by()
+            .values_list("election_type_id", flat=True)
+            .distinct()
+        )
+        boards.extend(
+            (None, district_id)
+            for district_id in candidates.exclude(electoral_district=None)
+            .order_by()
+            .values_list("electoral_district_id", flat=True)
+            .distinct()
+        )
+        entries = []
+        for metric in LEADERBOARD_METRICS:
+            for election_type_id, district_id in boards:
+                entries.extend(
+                    self._build_board(
+                        election_id, metric, election_type_id, district_id, size
+                    )
+                )
+        with transaction.atomic():
+            self.filter(election_id=election_id).delete()
+            self.bulk_create(entries)
+
+    def update_candidates(self, candidate_ids, size):
+        """
+        Move the given candidates to their place on the leaderboards they
+        belong to, after their CV totals changed. Each board is merged with
+        the new values in memory; it is only rebuilt from the candidates when
+        one of them drops out of it while it was full, as someone outside of
+        it may then take the place.
+        """
+        candidate_model = self.model._meta.get_field("candidate").related_model
+        candidates = candidate_model.objects.filter(pk__in=candidate_ids)
+        on_list = set(candidates.on_list().values_list("pk", flat=True))
+        # {election: {(election type, district): {candidate: {metric: value}}}}
+        updates = defaultdict(lambda: defaultdict(dict))
+        for (
+            pk,
+            election_id,
+            election_type_id,
+            district_id,
+            *values,
+        ) in candidates.values_list(
+            "pk",
+            "election_id",
+            "election_type_id",
+            "electoral_district_id",
+            *(f"cv__{metric}" for metric in LEADERBOARD_METRICS),
+        ):
+            values = {
+                metric: (value or 0) if pk in on_list else 0
+                for metric, value in zip(LEADERBOARD_METRICS, values)
+            }
+            boards = [(None, None), (election_type_id, None)]
+            if district_id is not None:
+                boards.append((None, district_id))
+            for board in boards:
+                updates[election_id][board][pk] = values
+
+        with transaction.atomic():
+            for election_id, boards in updates.items():
+                self._update_boards(election_id, boards, size)
+
+    def _update_boards(self, election_id, boards, size):
+        entries = defaultdict(list)
+        for entry in self.filter(election_id=election_id).filter(
+            models.Q(election_type_id=None, electoral_district_id=None)
+            | models.Q(
+                election_type_id__in=[et for et, _ in boards if et is not None],
+                electoral_district_id=None,
+            )
+            | models.Q(
+                election_type_id=None,
+                electoral_district_id__in=[
+                    district for _, district in boards if district is not None
+                ],
+            )
+        ):
+            key = (entry.metric, entry.election_type_id, entry.electoral_district_id)
+            entries[key].append(entry)
+
+        removed, added, rebuilt = [], [], []
+        for (election_type_id, district_id), values in boards.items():
+            for metric in LEADERBOARD_METRICS:
+                key = (metric, election_type_id, district_id)
+                board = entries[key]
+                # same order as the board: value desc, candidate asc
+                ranked = [
+                    (-entry.value, entry.candidate_id)
+                    for entry in board
+                    if entry.candidate_id not in values
+                ]
+                ranked.extend(
+                    (-candidate[metric], candidate_id)
+                    for candidate_id, candidate in values.items()
+                    if candidate[metric] > 0
+                )
+                top = sorted(ranked)[:size]
+                kept = set(top)
+                if len(board) >= size:
+                    last = max((-entry.value, entry.candidate_id) for entry in board)
+                    if len(top) < size or top[-1] > last:
+                        rebuilt.append(key)
+                        continue
+                current = {(-entry.value, entry.candidate_id) for entry in board}
+                removed.extend(
+                    entry.pk
+                    for entry in board
+                    if (-entry.value, entry.candidate_id) not in kept
+                )
+                added.extend(
+                    self.model(
+                        election_id=election_id,
+                        metric=metric,
+                        election_type_id=election_type_id,
+                        electoral_district_id=district_id,
+                        candidate_id=candidate_id,
+                        value=-value,
+                    )
+                    for value, candidate_id in top
+                    if (value, candidate_id) not in current
+                )
+
+        self.filter(pk__in=removed).delete()
+        for metric, election_type_id, district_id in rebuilt:
+            self.board(election_id, metric, election_type_id, district_id).delete()
+            added.extend(
+                self._build_board(
+                    election_id, metric, election_type_id, district_id, size
+                )
+            )
+        self.bulk_create(added)
@@ -0,0 +1,63 @@
+# Generated by Django 3.1.14 on 2026-10-17 17:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_elections', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateListing',
+            fields=[
+                ('candidate', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='app_elections.candidate')),
+                ('dni', models.CharField(max_length=20)),
+                ('first_name', models.CharField(max_length=50)),
+                ('surname', models.CharField(max_length=50)),
+                ('second_surname', models.CharField(max_length=50)),
+                ('full_name', models.CharField(max_length=200)),
+                ('gender', models.CharField(blank=True, choices=[('', ''), ('M', 'Male'), ('F', 'Female')], max_length=1)),
+                ('birth_date', models.DateField(blank=True, null=True)),
+                ('residence_ubigeo', models.CharField(max_length=6, null=True)),
+                ('birth_ubigeo', models.CharField(max_length=6, null=True)),
+                ('primary_school', models.BooleanField(null=True)),
+                ('concluded_primary_school', models.BooleanField(null=True)),
+                ('high_school', models.BooleanField(null=True)),
+                ('concluded_high_school', models.BooleanField(null=True)),
+                ('has_technical_education', models.BooleanField(null=True)),
+                ('has_non_university_education', models.BooleanField(null=True)),
+                ('additional_information', models.TextField(null=True)),
+                ('photo_url_path', models.CharField(max_length=255)),
+                ('jne_id', models.BigIntegerField()),
+                ('position_name', models.CharField(max_length=50)),
+                ('position_jne_id', models.BigIntegerField()),
+                ('ballot_position', models.PositiveSmallIntegerField()),
+                ('political_organization_name', models.CharField(max_length=200)),
+                ('political_organization_jne_id', models.BigIntegerField()),
+                ('electoral_district_name', models.CharField(max_length=50, null=True)),
+                ('electoral_district_ubigeo', models.CharField(max_length=6, null=True)),
+                ('election_type_name', models.CharField(max_length=50)),
+                ('election_type_jne_id', models.BigIntegerField()),
+                ('status_on_list', models.CharField(max_length=20)),
+                ('total_incomes', models.PositiveBigIntegerField(null=True)),
+                ('gross_annual_remunerations_public', models.PositiveBigIntegerField(null=True)),
+                ('gross_annual_remunerations_private', models.PositiveBigIntegerField(null=True)),
+                ('gross_annual_income_per_individual_year_public', models.PositiveBigIntegerField(null=True)),
+                ('gross_annual_income_per_individual_year_private', models.PositiveBigIntegerField(null=True)),
+                ('other_income_public', models.PositiveBigIntegerField(null=True)),
+                ('other_income_private', models.PositiveBigIntegerField(null=True)),
+                ('total_sentences', models.PositiveIntegerField(null=True)),
+                ('total_penal_sentences', models.PositiveIntegerField(null=True)),
+                ('total_obligation_sentences', models.PositiveIntegerField(null=True)),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_elections.electionprocess')),
+                ('election_type', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app_elections.electiontype')),
+                ('electoral_district', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app_elections.electoraldistrict')),
+                ('political_organization', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app_elections.politicalorganization')),
+                ('position', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app_elections.position')),
+            ],
+        ),
+    ]
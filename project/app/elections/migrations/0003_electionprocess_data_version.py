@@ -0,0 +1,23 @@
+# Generated by Django 3.1.14 on 2026-10-17 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_elections', '0002_candidatelisting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='electionprocess',
+            name='data_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='electionprocess',
+            name='data_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
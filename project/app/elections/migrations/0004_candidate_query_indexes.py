@@ -0,0 +1,65 @@
+# Generated by Django 3.1.14 on 2026-10-17 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_elections', '0003_electionprocess_data_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(condition=models.Q(status_on_list='INSCRITO'), fields=['election', 'election_type', 'political_organization'], name='candidate_on_list_et_po_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(condition=models.Q(status_on_list='INSCRITO'), fields=['election', 'political_organization'], name='candidate_on_list_po_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidate',
+            index=models.Index(fields=['election', 'status_on_list'], name='candidate_election_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidatelisting',
+            index=models.Index(condition=models.Q(status_on_list='INSCRITO'), fields=['election', 'election_type', 'political_organization'], name='listing_on_list_et_po_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidatelisting',
+            index=models.Index(condition=models.Q(status_on_list='INSCRITO'), fields=['election', 'political_organization'], name='listing_on_list_po_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidatelisting',
+            index=models.Index(condition=models.Q(status_on_list='INSCRITO'), fields=['election', 'total_incomes'], name='listing_on_list_ti_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidatelisting',
+            index=models.Index(condition=models.Q(status_on_list='INSCRITO'), fields=['election', 'total_sentences'], name='listing_on_list_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidatelisting',
+            index=models.Index(condition=models.Q(status_on_list='INSCRITO'), fields=['election', 'total_penal_sentences'], name='listing_on_list_tps_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidatelisting',
+            index=models.Index(condition=models.Q(status_on_list='INSCRITO'), fields=['election', 'total_obligation_sentences'], name='listing_on_list_tos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='curriculumvitae',
+            index=models.Index(fields=['total_incomes'], name='cv_ti_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='curriculumvitae',
+            index=models.Index(fields=['total_sentences'], name='cv_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='curriculumvitae',
+            index=models.Index(fields=['total_penal_sentences'], name='cv_tps_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='curriculumvitae',
+            index=models.Index(fields=['total_obligation_sentences'], name='cv_tos_idx'),
+        ),
+    ]
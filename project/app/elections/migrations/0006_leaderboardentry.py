@@ -0,0 +1,30 @@
+# Generated by Django 3.1.14 on 2026-10-17 17:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_elections', '0005_candidate_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('total_incomes', 'total_incomes'), ('total_movable_immovable_properties_value', 'total_movable_immovable_properties_value'), ('total_sentences', 'total_sentences'), ('total_penal_sentences', 'total_penal_sentences')], max_length=50)),
+                ('value', models.PositiveBigIntegerField()),
+                ('candidate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_elections.candidate')),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_elections.electionprocess')),
+                ('election_type', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_elections.electiontype')),
+                ('electoral_district', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_elections.electoraldistrict')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['election', 'metric', 'election_type', 'electoral_district', '-value', 'candidate'], name='leaderboard_board_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_persons(apps, schema_editor):
+    # keep the oldest person of each DNI and move the candidates of the
+    # others to it, so the DNI can be made unique. Missing DNIs become null
+    # instead, they don't identify anyone
+    Person = apps.get_model('app_elections', 'Person')
+    Candidate = apps.get_model('app_elections', 'Candidate')
+    Person.objects.filter(dni='').update(dni=None)
+    duplicates = (
+        Person.objects.order_by()
+        .exclude(dni=None)
+        .values('dni')
+        .annotate(count=Count('pk'), keep=Min('pk'))
+        .filter(count__gt=1)
+    )
+    for row in duplicates:
+        others = Person.objects.filter(dni=row['dni']).exclude(pk=row['keep'])
+        Candidate.objects.filter(person__in=others).update(person_id=row['keep'])
+        others.delete()
+
+
+def restore_empty_dnis(apps, schema_editor):
+    Person = apps.get_model('app_elections', 'Person')
+    CandidateListing = apps.get_model('app_elections', 'CandidateListing')
+    Person.objects.filter(dni=None).update(dni='')
+    CandidateListing.objects.filter(dni=None).update(dni='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_elections', '0006_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='person',
+            name='dni',
+            field=models.CharField(max_length=20, null=True),
+        ),
+        migrations.AlterField(
+            model_name='candidatelisting',
+            name='dni',
+            field=models.CharField(max_length=20, null=True),
+        ),
+        migrations.RunPython(merge_duplicate_persons, restore_empty_dnis),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-17 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_elections', '0007_merge_duplicate_persons'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='person',
+            name='dni',
+            field=models.CharField(max_length=20, null=True, unique=True),
+        ),
+    ]
@@ -1,9 +1,19 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.db.models import Sum
 from django.utils.html import format_html
 from django.utils.translation import ugettext_lazy as _
 
-from .managers import CandidateQuerySet
+from .managers import (
+    LEADERBOARD_METRICS,
+    ON_LIST,
+    CandidateListingQuerySet,
+    CandidateQuerySet,
+    LeaderboardEntryQuerySet,
+)
+
+PHOTO_BASE_URL = "https://declara.jne.gob.pe"
 
 
 class ElectoralDistrict(models.Model):
@@ -68,6 +78,10 @@ class ElectionProcess(models.Model):
 
     jne_id = models.BigIntegerField(unique=True)
 
+    # bumped by the import commands every time the election's data changes
+    data_version = models.PositiveIntegerField(default=0)
+    data_updated_at = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         verbose_name = _("Election Process")
         verbose_name_plural = _("Election Processes")
@@ -108,7 +122,9 @@ class Person(models.Model):
     birth_district = models.CharField(max_length=50)
     birth_ubigeo = models.CharField(max_length=6)
 
-    dni = models.CharField(max_length=20, db_index=True)
+    # the import commands upsert persons on their DNI, which is null when the
+    # JNE doesn't give it: persons without DNI aren't the same person
+    dni = models.CharField(max_length=20, unique=True, null=True)
     gender = models.CharField(max_length=1, choices=Gender.CHOICES, blank=True)
 
     def __str__(self) -> str:
@@ -142,9 +158,39 @@ class Candidate(models.Model):
         "CurriculumVitae", on_delete=models.SET_NULL, null=True, blank=True
     )
     photo_url_path = models.CharField(max_length=255)
+    # accent-folded name, DNI and organization name, maintained by
+    # CandidateQuerySet.refresh_search()
+    search_text = models.TextField(blank=True, default="", editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     objects = CandidateQuerySet.as_manager()
 
+    class Meta:
+        # the API always filters one election's candidates on list
+        # (CandidateQuerySet.on_list), optionally by type and organization
+        indexes = [
+            models.Index(
+                fields=["election", "election_type", "political_organization"],
+                name="candidate_on_list_et_po_idx",
+                condition=ON_LIST,
+            ),
+            models.Index(
+                fields=["election", "political_organization"],
+                name="candidate_on_list_po_idx",
+                condition=ON_LIST,
+            ),
+            models.Index(
+                fields=["election", "status_on_list"],
+                name="candidate_election_status_idx",
+            ),
+            GinIndex(fields=["search_vector"], name="candidate_search_vector_idx"),
+            GinIndex(
+                fields=["search_text"],
+                name="candidate_search_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
+
     def __str__(self) -> str:
         return self.full_name
 
@@ -154,14 +200,168 @@ class Candidate(models.Model):
 
     @property
     def photo_url(self) -> str:
-        _base_url = "https://declara.jne.gob.pe"
-        return f"{_base_url}{self.photo_url_path}"
+        return f"{PHOTO_BASE_URL}{self.photo_url_path}"
 
     @property
     def rendered_photo(self) -> str:
         return format_html(f"<img width='100px;' src='{self.photo_url}' />")
 
 
+class CandidateListing(models.Model):
+    """
+    Denormalized, read-only copy of a candidate with the columns the candidate
+    list endpoint emits, so listing doesn't need to join seven tables.
+    Rebuilt one election at a time by the import commands.
+    """
+
+    candidate = models.OneToOneField(
+        Candidate, on_delete=models.CASCADE, primary_key=True, related_name="+"
+    )
+    election = models.ForeignKey(
+        ElectionProcess, on_delete=models.CASCADE, related_name="+"
+    )
+    # person
+    dni = models.CharField(max_length=20, null=True)
+    first_name = models.CharField(max_length=50)
+    surname = models.CharField(max_length=50)
+    second_surname = models.CharField(max_length=50)
+    full_name = models.CharField(max_length=200)
+    gender = models.CharField(max_length=1, choices=Gender.CHOICES, blank=True)
+    birth_date = models.DateField(null=True, blank=True)
+    # cv
+    residence_ubigeo = models.CharField(max_length=6, null=True)
+    birth_ubigeo = models.CharField(max_length=6, null=True)
+    primary_school = models.BooleanField(null=True)
+    concluded_primary_school = models.BooleanField(null=True)
+    high_school = models.BooleanField(null=True)
+    concluded_high_school = models.BooleanField(null=True)
+    has_technical_education = models.BooleanField(null=True)
+    has_non_university_education = models.BooleanField(null=True)
+    additional_information = models.TextField(null=True)
+    # candidate
+    photo_url_path = models.CharField(max_length=255)
+    jne_id = models.BigIntegerField()
+    position = models.ForeignKey(
+        Position, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    position_name = models.CharField(max_length=50)
+    position_jne_id = models.BigIntegerField()
+    ballot_position = models.PositiveSmallIntegerField()
+    political_organization = models.ForeignKey(
+        PoliticalOrganization,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    political_organization_name = models.CharField(max_length=200)
+    political_organization_jne_id = models.BigIntegerField()
+    electoral_district = models.ForeignKey(
+        ElectoralDistrict,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name="+",
+    )
+    electoral_district_name = models.CharField(max_length=50, null=True)
+    electoral_district_ubigeo = models.CharField(max_length=6, null=True)
+    election_type = models.ForeignKey(
+        ElectionType, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    election_type_name = models.CharField(max_length=50)
+    election_type_jne_id = models.BigIntegerField()
+    status_on_list = models.CharField(max_length=20)
+    # cv totals
+    total_incomes = models.PositiveBigIntegerField(null=True)
+    gross_annual_remunerations_public = models.PositiveBigIntegerField(null=True)
+    gross_annual_remunerations_private = models.PositiveBigIntegerField(null=True)
+    gross_annual_income_per_individual_year_public = models.PositiveBigIntegerField(
+        null=True
+    )
+    gross_annual_income_per_individual_year_private = models.PositiveBigIntegerField(
+        null=True
+    )
+    other_income_public = models.PositiveBigIntegerField(null=True)
+    other_income_private = models.PositiveBigIntegerField(null=True)
+    total_sentences = models.PositiveIntegerField(null=True)
+    total_penal_sentences = models.PositiveIntegerField(null=True)
+    total_obligation_sentences = models.PositiveIntegerField(null=True)
+
+    objects = CandidateListingQuerySet.as_manager()
+
+    class Meta:
+        # same filters as Candidate, plus the orderings of CandidateFilter
+        indexes = [
+            models.Index(
+                fields=["election", "election_type", "political_organization"],
+                name="listing_on_list_et_po_idx",
+                condition=ON_LIST,
+            ),
+            models.Index(
+                fields=["election", "political_organization"],
+                name="listing_on_list_po_idx",
+                condition=ON_LIST,
+            ),
+        ] + [
+            models.Index(
+                fields=["election", field],
+                name=f"listing_on_list_{alias}_idx",
+                condition=ON_LIST,
+            )
+            for field, alias in (
+                ("total_incomes", "ti"),
+                ("total_sentences", "ts"),
+                ("total_penal_sentences", "tps"),
+                ("total_obligation_sentences", "tos"),
+            )
+        ]
+
+    def __str__(self) -> str:
+        return self.full_name
+
+
+class LeaderboardEntry(models.Model):
+    """
+    A candidate in the top of an election by a CV total, overall (no election
+    type nor district), per election type or per electoral district. Kept up
+    to date by the import commands so a leaderboard page is a range read.
+    """
+
+    election = models.ForeignKey(
+        ElectionProcess, on_delete=models.CASCADE, related_name="+"
+    )
+    metric = models.CharField(
+        max_length=50, choices=[(metric, metric) for metric in LEADERBOARD_METRICS]
+    )
+    election_type = models.ForeignKey(
+        ElectionType, on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    electoral_district = models.ForeignKey(
+        ElectoralDistrict, on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE, related_name="+")
+    value = models.PositiveBigIntegerField()
+
+    objects = LeaderboardEntryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=[
+                    "election",
+                    "metric",
+                    "election_type",
+                    "electoral_district",
+                    "-value",
+                    "candidate",
+                ],
+                name="leaderboard_board_idx",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.metric}: {self.candidate_id} ({self.value})"
+
+
 class CurriculumVitae(models.Model):
     # residence info
     residence_address = models.CharField(max_length=255)
@@ -214,6 +414,18 @@ class CurriculumVitae(models.Model):
     total_obligation_sentences = models.PositiveIntegerField(default=0)
     total_sentences = models.PositiveIntegerField()
 
+    class Meta:
+        # candidates are ordered by these totals
+        indexes = [
+            models.Index(fields=[field], name=f"cv_{alias}_idx")
+            for field, alias in (
+                ("total_incomes", "ti"),
+                ("total_sentences", "ts"),
+                ("total_penal_sentences", "tps"),
+                ("total_obligation_sentences", "tos"),
+            )
+        ]
+
     def __str__(self) -> str:
         return f"{self.jne_id}"
 
@@ -227,7 +439,8 @@ class CurriculumVitae(models.Model):
         self.total_penal_sentences = self.penal_sentences.count()
         self.total_obligation_sentences = self.obligation_sentences.count()
 
-    def save(self, **kwargs):
+    def calculate_totals(self):
+        # the totals derived from the incomes and the sections' totals
         self.total_incomes = (
             (self.gross_annual_remunerations_public or 0)
             + (self.gross_annual_remunerations_private or 0)
@@ -242,6 +455,9 @@ class CurriculumVitae(models.Model):
         self.total_sentences = (
             self.total_penal_sentences + self.total_obligation_sentences
         )
+
+    def save(self, **kwargs):
+        self.calculate_totals()
         super().save(**kwargs)
 
 
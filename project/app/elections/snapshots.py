@@ -0,0 +1,247 @@
+"""
+Columnar snapshots of the election data for analytics.
+
+A snapshot is a set of Parquet files, one per table (candidates, CVs and each
+CV section), written for a given data version of an election (see
+app.elections.versions) under ELECTION_SNAPSHOTS_DIR in the default storage:
+
+    <dir>/<election jne_id>/v<version>/<table>.parquet
+    <dir>/<election jne_id>/manifest.json
+
+String columns are dictionary encoded, so names repeated across thousands of
+rows (organizations, districts, positions...) are stored once per row group
+and load as categoricals. The manifest points to the latest snapshot; a
+snapshot is only written when the election has a newer data version, so
+running it after every import only pays for the elections that changed.
+
+Requires pyarrow (`poetry install -E analytics`).
+"""
+import io
+import json
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .managers import CV_SECTIONS
+from .models import Candidate, CurriculumVitae, ElectionProcess
+from .versions import DataVersion
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+BATCH_SIZE = 10000
+
+
+def _get_columns(model, related=None, exclude=()):
+    """
+    Return {column: lookup} for the concrete fields of `model`, but those in
+    `exclude`, plus the given {prefix: fields} of its foreign keys.
+    """
+    columns = {
+        field.attname: field.attname
+        for field in model._meta.concrete_fields
+        if field.name not in exclude
+    }
+    for prefix, names in (related or {}).items():
+        columns.update({f"{prefix}_{name}": f"{prefix}__{name}" for name in names})
+    return columns
+
+
+def _get_tables():
+    # table name => (model, {column: lookup}, lookup to the election id)
+    tables = {
+        "candidates": (
+            Candidate,
+            _get_columns(
+                Candidate,
+                related={
+                    "person": [
+                        field.name
+                        for field in Candidate._meta.get_field(
+                            "person"
+                        ).related_model._meta.concrete_fields
+                        if not field.primary_key
+                    ],
+                    "election_type": ["name"],
+                    "position": ["name"],
+                    "political_organization": ["name"],
+                    "electoral_district": ["name", "ubigeo"],
+                },
+                # derived from the other columns for the candidate search
+                exclude=("search_text", "search_vector"),
+            ),
+            "election_id",
+        ),
+        "cvs": (
+            CurriculumVitae,
+            _get_columns(CurriculumVitae),
+            "candidate__election_id",
+        ),
+    }
+    for section in CV_SECTIONS:
+        model = CurriculumVitae._meta.get_field(section).related_model
+        tables[section] = (model, _get_columns(model), "cv__candidate__election_id")
+    return tables
+
+
+TABLES = _get_tables()
+
+
+def _get_field(model, lookup):
+    *relations, name = lookup.split("__")
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    for field in model._meta.concrete_fields:
+        if name in (field.name, field.attname):
+            return field
+
+
+def _get_arrow_type(field):
+    if field.is_relation:
+        field = field.target_field
+    if isinstance(field, (models.CharField, models.TextField)):
+        return pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+    if isinstance(field, models.BooleanField):
+        return pyarrow.bool_()
+    if isinstance(field, models.DateTimeField):
+        return pyarrow.timestamp("us", tz="UTC")
+    if isinstance(field, models.DateField):
+        return pyarrow.date32()
+    if isinstance(field, (models.IntegerField, models.AutoField)):
+        return pyarrow.int64()
+    raise TypeError(f"No Arrow type for {field!r}")
+
+
+def get_schema(table):
+    model, columns, election_lookup = TABLES[table]
+    return pyarrow.schema(
+        [
+            pyarrow.field(column, _get_arrow_type(_get_field(model, lookup)))
+            for column, lookup in columns.items()
+        ]
+    )
+
+
+def _write_table(table, election_id, stream):
+    model, columns, election_lookup = TABLES[table]
+    schema = get_schema(table)
+    values_list = (
+        model.objects.filter(**{election_lookup: election_id})
+        .distinct()
+        .order_by("pk")
+        .values_list(*columns.values())
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    rows = 0
+    with pyarrow.parquet.ParquetWriter(stream, schema) as writer:
+        batch = []
+        for values in values_list:
+            batch.append(values)
+            if len(batch) == BATCH_SIZE:
+                writer.write_batch(_to_record_batch(schema, batch))
+                rows += len(batch)
+                batch = []
+        if batch or not rows:
+            writer.write_batch(_to_record_batch(schema, batch))
+            rows += len(batch)
+    return rows
+
+
+def _to_record_batch(schema, batch):
+    arrays = []
+    for index, field in enumerate(schema):
+        values = [row[index] for row in batch]
+        if pyarrow.types.is_dictionary(field.type):
+            array = pyarrow.array(values, type=pyarrow.string()).dictionary_encode()
+            arrays.append(array.cast(field.type))
+        else:
+            arrays.append(pyarrow.array(values, type=field.type))
+    return pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def get_snapshot_dir(election):
+    return f"{settings.ELECTION_SNAPSHOTS_DIR}/{election.jne_id}"
+
+
+def get_table_path(election, version, table):
+    return f"{get_snapshot_dir(election)}/v{version}/{table}.parquet"
+
+
+def get_manifest(election):
+    """
+    Return the manifest of the latest snapshot of `election`, or None.
+    """
+    path = f"{get_snapshot_dir(election)}/manifest.json"
+    if not default_storage.exists(path):
+        return None
+    with default_storage.open(path) as manifest:
+        return json.loads(manifest.read())
+
+
+def get_manifest_version(manifest):
+    """
+    Return the DataVersion the snapshot of `manifest` was written at, with
+    the time it was written.
+    """
+    return DataVersion(manifest["version"], parse_datetime(manifest["created_at"]))
+
+
+def _save(path, content):
+    # overwrite instead of getting a suffixed name from the storage
+    if default_storage.exists(path):
+        default_storage.delete(path)
+    default_storage.save(path, ContentFile(content))
+
+
+def write_snapshot(election, force=False):
+    """
+    Write a snapshot of `election` at its current data version and return its
+    manifest, or None when the latest snapshot is already at that version
+    (unless `force`). The previous snapshot is removed once the new manifest
+    is in place.
+    """
+    if pyarrow is None:
+        raise ImportError("Election snapshots require pyarrow")
+
+    # read the version from the database, the cached one may be stale while
+    # an import is still running
+    version = ElectionProcess.objects.values_list("data_version", flat=True).get(
+        pk=election.pk
+    )
+    previous = get_manifest(election)
+    if previous is not None and previous["version"] == version and not force:
+        return None
+
+    manifest = {
+        "election": election.jne_id,
+        "version": version,
+        "created_at": timezone.now().isoformat(),
+        "tables": {},
+    }
+    for table in TABLES:
+        stream = io.BytesIO()
+        rows = _write_table(table, election.pk, stream)
+        path = get_table_path(election, version, table)
+        _save(path, stream.getvalue())
+        manifest["tables"][table] = {
+            "path": path,
+            "rows": rows,
+            "size": len(stream.getvalue()),
+        }
+    _save(
+        f"{get_snapshot_dir(election)}/manifest.json",
+        json.dumps(manifest, indent=2).encode("utf-8"),
+    )
+
+    if previous is not None and previous["version"] != version:
+        for table in previous["tables"].values():
+            if default_storage.exists(table["path"]):
+                default_storage.delete(table["path"])
+    return manifest
@@ -0,0 +1,388 @@
+"""
+Synthetic elections for benchmarks and query plan checks.
+
+The generated data is shaped like the JNE data: a few political
+organizations field most candidates, districts have very different sizes,
+most candidates are on list and have a CV, every CV section is populated,
+and incomes, property values and sentences are heavily skewed (most
+candidates declare little and have no sentences, a few account for most).
+
+Every JNE id is negative, so synthetic rows never collide with imported ones.
+Rows are written with bulk_create() in chunks, so large elections don't have
+to fit in memory.
+"""
+import random
+from datetime import date
+
+from django.conf import settings
+from django.db.models import Min
+
+from .managers import ON_LIST_STATUS
+from .models import (
+    Candidate,
+    CandidateListing,
+    CurriculumVitae,
+    ElectionProcess,
+    ElectionType,
+    ElectoralDistrict,
+    Gender,
+    ImmovableProperty,
+    LeaderboardEntry,
+    MovableProperty,
+    ObligationSentence,
+    PartisanPosition,
+    PenalSentence,
+    Person,
+    PoliticalOrganization,
+    Position,
+    PostgraduateEducation,
+    ProfessionalExperience,
+    RelElectionProcessElectionType,
+    UniversityEducation,
+)
+from .versions import bump_data_version
+
+CHUNK_SIZE = 2000
+
+FIRST_NAMES = (
+    "JOSÉ MARÍA JUAN ROSA LUIS CARMEN CARLOS ANA JORGE JULIA VÍCTOR ELENA MIGUEL "
+    "LUCÍA CÉSAR PATRICIA RAÚL GLADYS ÁNGEL NELLY"
+).split()
+SURNAMES = (
+    "QUISPE FLORES SÁNCHEZ RODRÍGUEZ GARCÍA ROJAS GONZALES HUAMÁN MAMANI VÁSQUEZ "
+    "CHÁVEZ RAMÍREZ TORRES MENDOZA CASTILLO DÍAZ ESPINOZA PÉREZ LÓPEZ CONDORI"
+).split()
+EXCLUDED_STATUSES = ("EXCLUIDO", "IMPROCEDENTE", "RETIRO")
+
+
+def _zipf_weights(count, exponent=1.0):
+    return [1 / (rank**exponent) for rank in range(1, count + 1)]
+
+
+class ElectionGenerator:
+    """
+    Writes synthetic elections sharing one set of election types, positions,
+    political organizations and electoral districts.
+    """
+
+    def __init__(
+        self,
+        seed=0,
+        election_types=4,
+        positions=5,
+        organizations=40,
+        districts=27,
+        on_list_ratio=0.8,
+        cv_ratio=0.95,
+    ):
+        self.rnd = random.Random(seed)
+        self.on_list_ratio = on_list_ratio
+        self.cv_ratio = cv_ratio
+        self._next_ids = {}
+
+        self.election_types = self._create(
+            ElectionType, [{"name": f"TIPO {i}"} for i in range(1, election_types + 1)]
+        )
+        self.positions = self._create(
+            Position, [{"name": f"CARGO {i}"} for i in range(1, positions + 1)]
+        )
+        self.organizations = self._create(
+            PoliticalOrganization,
+            [{"name": f"PARTIDO {i}"} for i in range(1, organizations + 1)],
+        )
+        self.organization_weights = _zipf_weights(organizations)
+        # ubigeos are unique too, continue after the synthetic ones ("S....")
+        existing = ElectoralDistrict.objects.filter(ubigeo__startswith="S").count()
+        self.districts = [
+            ElectoralDistrict.objects.create(
+                name=f"DISTRITO {i}", ubigeo=f"S{existing + i:05d}"
+            )
+            for i in range(1, districts + 1)
+        ]
+        self.district_weights = _zipf_weights(districts, 0.8)
+
+    def allocate_ids(self, model, count):
+        """
+        Return `count` unused negative JNE ids for `model`.
+        """
+        if model not in self._next_ids:
+            lowest = model.objects.aggregate(lowest=Min("jne_id"))["lowest"] or 0
+            self._next_ids[model] = min(lowest, 0) - 1
+        start = self._next_ids[model]
+        self._next_ids[model] = start - count
+        return range(start, start - count, -1)
+
+    def _create(self, model, rows):
+        ids = self.allocate_ids(model, len(rows))
+        return [
+            model.objects.create(jne_id=jne_id, **row) for jne_id, row in zip(ids, rows)
+        ]
+
+    def build_election(self, candidates, name=None):
+        """
+        Create an election with `candidates` candidates, rebuild its derived
+        tables and return it.
+        """
+        (jne_id,) = self.allocate_ids(ElectionProcess, 1)
+        election = ElectionProcess.objects.create(
+            name=name or f"ELECCIONES SINTÉTICAS {-jne_id}",
+            jne_id=jne_id,
+            call_date=date(2020, 10, 1),
+            opening_date=date(2021, 4, 11),
+        )
+        election.positions.set(self.positions)
+        election.districts.set(self.districts)
+
+        organizations_by_type = {
+            election_type.pk: set() for election_type in self.election_types
+        }
+        for offset in range(0, candidates, CHUNK_SIZE):
+            chunk = self._build_chunk(election, min(CHUNK_SIZE, candidates - offset))
+            for election_type_id, organization_id in chunk:
+                organizations_by_type[election_type_id].add(organization_id)
+
+        for election_type in self.election_types:
+            rel = RelElectionProcessElectionType.objects.create(
+                election_process=election, election_type=election_type
+            )
+            rel.political_organizations.set(organizations_by_type[election_type.pk])
+
+        Candidate.objects.refresh_search(election.pk)
+        CandidateListing.objects.refresh(election.pk)
+        LeaderboardEntry.objects.refresh(
+            election.pk, settings.ELECTION_LEADERBOARD_SIZE
+        )
+        bump_data_version(election.pk)
+        return election
+
+    def _build_chunk(self, election, size):
+        rnd = self.rnd
+        candidate_ids = self.allocate_ids(Candidate, size)
+        # derive unique DNIs from the JNE ids to find the rows again
+        persons = [self._build_person(f"S{-jne_id:09d}") for jne_id in candidate_ids]
+        Person.objects.bulk_create(persons, batch_size=1000)
+        # bulk_create() doesn't set the primary keys on every backend
+        person_pks = dict(
+            Person.objects.filter(
+                dni__in=[person.dni for person in persons]
+            ).values_list("dni", "pk")
+        )
+
+        has_cv = [rnd.random() < self.cv_ratio for _ in range(size)]
+        cvs = [
+            self._build_cv(jne_id)
+            for jne_id in self.allocate_ids(CurriculumVitae, sum(has_cv))
+        ]
+        cv_pks = self._create_cvs(cvs)
+        cv_iterator = iter(cvs)
+
+        candidates = []
+        for index, (jne_id, person) in enumerate(zip(candidate_ids, persons)):
+            election_type = rnd.choice(self.election_types)
+            # the first election type (e.g. presidential) has no district
+            district = None
+            if election_type != self.election_types[0]:
+                district = rnd.choices(self.districts, self.district_weights)[0]
+            on_list = rnd.random() < self.on_list_ratio
+            cv = next(cv_iterator) if has_cv[index] else None
+            candidates.append(
+                Candidate(
+                    election=election,
+                    election_type=election_type,
+                    person_id=person_pks[person.dni],
+                    position=rnd.choice(self.positions),
+                    ballot_position=1 + index % 130,
+                    full_name=person.full_name,
+                    political_organization=rnd.choices(
+                        self.organizations, self.organization_weights
+                    )[0],
+                    electoral_district=district,
+                    status_on_list=(
+                        ON_LIST_STATUS if on_list else rnd.choice(EXCLUDED_STATUSES)
+                    ),
+                    jne_id=jne_id,
+                    cv_jne_id=cv and cv.jne_id,
+                    cv_id=cv and cv_pks[cv.jne_id],
+                    photo_url_path=f"/Fotos/{person.dni}.jpg",
+                )
+            )
+        Candidate.objects.bulk_create(candidates, batch_size=1000)
+        return [
+            (candidate.election_type_id, candidate.political_organization_id)
+            for candidate in candidates
+        ]
+
+    def _build_person(self, dni):
+        rnd = self.rnd
+        return Person(
+            first_name=rnd.choice(FIRST_NAMES),
+            surname=rnd.choice(SURNAMES),
+            second_surname=rnd.choice(SURNAMES),
+            birth_date=date(
+                rnd.randint(1940, 2000), rnd.randint(1, 12), rnd.randint(1, 28)
+            ),
+            birth_address="",
+            birth_country="PERÚ",
+            birth_department="LIMA",
+            birth_province="LIMA",
+            birth_district="LIMA",
+            birth_ubigeo="150101",
+            dni=dni,
+            gender=rnd.choice([Gender.MALE, Gender.FEMALE]),
+        )
+
+    def _build_cv(self, jne_id):
+        rnd = self.rnd
+        # skewed incomes: a few candidates declare most of the money
+        public = int(rnd.paretovariate(1.2) * 10000) if rnd.random() < 0.6 else 0
+        private = int(rnd.paretovariate(1.1) * 20000) if rnd.random() < 0.5 else 0
+        other = int(rnd.expovariate(1 / 2000)) if rnd.random() < 0.2 else 0
+        return CurriculumVitae(
+            residence_address="AV. SINTÉTICA 123",
+            residence_department="LIMA",
+            residence_province="LIMA",
+            residence_district="LIMA",
+            residence_ubigeo="150101",
+            birth_country="PERÚ",
+            birth_department="LIMA",
+            birth_province="LIMA",
+            birth_district="LIMA",
+            birth_ubigeo="150101",
+            primary_school=True,
+            concluded_primary_school=True,
+            high_school=rnd.random() < 0.95,
+            concluded_high_school=rnd.random() < 0.9,
+            has_technical_education=rnd.random() < 0.3,
+            has_non_university_education=rnd.random() < 0.2,
+            additional_information="" if rnd.random() < 0.7 else "INFORMACIÓN " * 20,
+            incomes_year=2020,
+            gross_annual_remunerations_public=public,
+            gross_annual_remunerations_private=private,
+            gross_annual_income_per_individual_year_public=0,
+            gross_annual_income_per_individual_year_private=0,
+            other_income_public=0,
+            other_income_private=other,
+            total_incomes=public + private + other,
+            jne_id=jne_id,
+            total_movable_immovable_properties_value=0,
+            total_sentences=0,
+        )
+
+    def _create_cvs(self, cvs):
+        """
+        Save `cvs` with their sections and totals, return {jne id: pk}.
+        bulk_create() skips CurriculumVitae.save(), the totals are set here.
+        """
+        rnd = self.rnd
+        cv_sections = []
+        for cv in cvs:
+            sections = {
+                model: [self._build_section(model) for _ in range(count(rnd))]
+                for model, count in CV_SECTION_COUNTS.items()
+            }
+            cv.total_penal_sentences = len(sections[PenalSentence])
+            cv.total_obligation_sentences = len(sections[ObligationSentence])
+            cv.total_sentences = (
+                cv.total_penal_sentences + cv.total_obligation_sentences
+            )
+            cv.total_movable_properties_value = sum(
+                item.value for item in sections[MovableProperty]
+            )
+            cv.total_immovable_properties_value = sum(
+                item.value for item in sections[ImmovableProperty]
+            )
+            cv.total_movable_immovable_properties_value = (
+                cv.total_movable_properties_value + cv.total_immovable_properties_value
+            )
+            cv_sections.append(sections)
+
+        CurriculumVitae.objects.bulk_create(cvs, batch_size=1000)
+        cv_pks = dict(
+            CurriculumVitae.objects.filter(
+                jne_id__in=[cv.jne_id for cv in cvs]
+            ).values_list("jne_id", "pk")
+        )
+        for model in CV_SECTION_COUNTS:
+            items = []
+            for cv, sections in zip(cvs, cv_sections):
+                for item in sections[model]:
+                    item.cv_id = cv_pks[cv.jne_id]
+                    items.append(item)
+            for item, jne_id in zip(items, self.allocate_ids(model, len(items))):
+                item.jne_id = jne_id
+            model.objects.bulk_create(items, batch_size=1000)
+        return cv_pks
+
+    def _build_section(self, model):
+        rnd = self.rnd
+        year = rnd.randint(1980, 2020)
+        if model is PenalSentence:
+            return PenalSentence(
+                file_number=f"{rnd.randint(1, 9999):05d}-{year}",
+                criminal_sentence_date=date(year, rnd.randint(1, 12), 1),
+                judicial_authority="JUZGADO PENAL",
+                criminal_offense=rnd.choice(["PECULADO", "COLUSIÓN", "DIFAMACIÓN"]),
+                judgment="CONDENA",
+                modality="",
+                other_modality="",
+            )
+        if model is ObligationSentence:
+            return ObligationSentence(
+                demand_matter=rnd.choice(["ALIMENTOS", "LABORAL", "CIVIL"]),
+                file_number=f"{rnd.randint(1, 9999):05d}-{year}",
+                judicial_authority="JUZGADO CIVIL",
+                judgment="FUNDADA",
+            )
+        if model is ProfessionalExperience:
+            return ProfessionalExperience(
+                workplace=f"EMPRESA {rnd.randint(1, 500)}",
+                position="GERENTE",
+                starting_year=year,
+                ending_year=None if rnd.random() < 0.3 else year + rnd.randint(1, 5),
+            )
+        if model is UniversityEducation:
+            return UniversityEducation(
+                university=f"UNIVERSIDAD {rnd.randint(1, 50)}",
+                degree=rnd.choice(["BACHILLER", "TÍTULO PROFESIONAL"]),
+                year=year,
+            )
+        if model is PostgraduateEducation:
+            return PostgraduateEducation(
+                study_center=f"ESCUELA {rnd.randint(1, 30)}",
+                specialty="GESTIÓN PÚBLICA",
+                year=year,
+            )
+        if model is MovableProperty:
+            return MovableProperty(
+                property_type="VEHÍCULO",
+                features="",
+                value=int(rnd.paretovariate(1.5) * 5000),
+                comment="",
+            )
+        if model is ImmovableProperty:
+            return ImmovableProperty(
+                property_type="CASA",
+                value=int(rnd.paretovariate(1.3) * 50000),
+                comment="",
+            )
+        return PartisanPosition(
+            political_organization=rnd.choices(
+                self.organizations, self.organization_weights
+            )[0],
+            starting_year=year,
+            ending_year=None if rnd.random() < 0.5 else year + rnd.randint(1, 8),
+            position=rnd.choice(["AFILIADO", "SECRETARIO", "DELEGADO"]),
+        )
+
+
+# model => number of rows of a CV, most CVs have no sentences
+CV_SECTION_COUNTS = {
+    PenalSentence: lambda rnd: int(rnd.expovariate(4)),
+    ObligationSentence: lambda rnd: int(rnd.expovariate(2.5)),
+    ProfessionalExperience: lambda rnd: rnd.randint(0, 4),
+    UniversityEducation: lambda rnd: rnd.choice([0, 1, 1, 2]),
+    PostgraduateEducation: lambda rnd: int(rnd.random() < 0.3),
+    MovableProperty: lambda rnd: int(rnd.expovariate(0.7)),
+    ImmovableProperty: lambda rnd: int(rnd.expovariate(1)),
+    PartisanPosition: lambda rnd: rnd.randint(0, 2),
+}
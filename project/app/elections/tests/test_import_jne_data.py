@@ -0,0 +1,173 @@
+import json
+import random
+import re
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from app.elections.jne import JNEClient
+from app.elections.models import (
+    Candidate,
+    ElectionProcess,
+    ElectoralDistrict,
+    Person,
+    PoliticalOrganization,
+    Position,
+)
+
+ELECTION_TYPES = [(1, "PRESIDENCIAL"), (2, "CONGRESAL"), (3, "PARLAMENTO ANDINO")]
+FILES_PER_TYPE = 40
+CANDIDATES_PER_FILE = 3
+MAX_DELAY = 0.01
+
+
+def get_files(election_type_id):
+    files = []
+    for index in range(FILES_PER_TYPE):
+        file_id = election_type_id * 1000 + index
+        organization_id = 100 + file_id % 7
+        ubigeo = f"{file_id % 5 + 1:02d}0000" if election_type_id != 1 else ""
+        files.append(
+            {
+                "idExpediente": file_id,
+                "idSolicitudLista": file_id,
+                "idOrganizacionPolitica": organization_id,
+                "strOrganizacionPolitica": f"PARTIDO {organization_id}",
+                "strEstadoLista": "INSCRITO" if index % 4 else "IMPROCEDENTE",
+                "strUbigeo": ubigeo,
+                "strDistritoElec": f"DISTRITO {ubigeo}" if ubigeo else "",
+            }
+        )
+    return files
+
+
+def get_candidates(election_type_id, file_id):
+    candidates = []
+    for index in range(CANDIDATES_PER_FILE):
+        candidate_id = file_id * 100 + index
+        candidates.append(
+            {
+                "idCandidato": candidate_id,
+                "strCandidato": f"CANDIDATO {candidate_id}",
+                # some persons run on several lists, the last one imported
+                # wins, and some have no DNI
+                "strDocumentoIdentidad": (
+                    f"{candidate_id % 97:08d}" if candidate_id % 11 else ""
+                ),
+                "strNombreCompleto": f"NOMBRE {file_id}",
+                "strApellidoPaterno": "QUISPE",
+                "strApellidoMaterno": "FLORES",
+                "strSexo": str(1 + index % 2),
+                "idCargoEleccion": election_type_id * 10 + index % 3,
+                "strCargoEleccion": f"CARGO {election_type_id}-{index % 3}",
+                "intPosicion": index + 1,
+                "strEstadoExp": "INSCRITO" if candidate_id % 5 else "EXCLUIDO",
+                "strRutaArchivo": f"/{candidate_id}.jpg",
+                "idHojaVida": candidate_id,
+            }
+        )
+    return candidates
+
+
+def get_data(path):
+    if path == "/Resoluciones/GetListProcesosCR":
+        return [
+            {"idProcesoElectoral": 0},
+            {"idProcesoElectoral": 110, "strProcesoElectoral": "ELECCIONES 2021"},
+        ]
+    if path.startswith("/Candidato/GetTipoEleccionbyProceso/"):
+        return [
+            {"idTipoEleccion": jne_id, "strTipoEleccion": name}
+            for jne_id, name in ELECTION_TYPES
+        ]
+    match = re.match(r"/Candidato/GetExpedientesLista/\d+-(\d+)-", path)
+    if match:
+        return get_files(int(match.group(1)))
+    match = re.match(r"/Candidato/GetCandidatos/(\d+)-\d+-\d+-(\d+)", path)
+    return get_candidates(int(match.group(1)), int(match.group(2)))
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.content = json.dumps({"data": data}).encode()
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeJNEClient(JNEClient):
+    """
+    Answers from the functions above after a random delay, so concurrent
+    requests complete in any order.
+    """
+
+    def send(self, method, path, params=None, data=None):
+        time.sleep(random.uniform(0, MAX_DELAY))
+        return FakeResponse(get_data(path))
+
+
+class ImportJNEDataTest(TestCase):
+    def run_import(self, workers):
+        with mock.patch(
+            "app.elections.management.commands.import_jne_data.JNEClient",
+            FakeJNEClient,
+        ):
+            call_command(
+                "import_jne_data", workers=workers, batch_size=7, stdout=StringIO()
+            )
+
+    def import_rows(self, workers):
+        """
+        Import with `workers` and return the rows written, in the order they
+        were created, then delete them.
+        """
+        self.run_import(workers)
+        rows = {
+            model.__name__: list(model.objects.order_by("pk").values_list(*fields))
+            for model, fields in (
+                (PoliticalOrganization, ("jne_id", "name")),
+                (ElectoralDistrict, ("ubigeo", "name")),
+                (Position, ("jne_id", "name")),
+                (Person, ("dni", "first_name", "gender")),
+                (
+                    Candidate,
+                    (
+                        "jne_id",
+                        "election_type__jne_id",
+                        "person__dni",
+                        "position__jne_id",
+                        "political_organization__jne_id",
+                        "electoral_district__ubigeo",
+                        "status_on_list",
+                    ),
+                ),
+            )
+        }
+        ElectionProcess.objects.all().delete()
+        for model in (Person, PoliticalOrganization, ElectoralDistrict, Position):
+            model.objects.all().delete()
+        return rows
+
+    def test_concurrent_import(self):
+        expected = self.import_rows(workers=1)
+        self.assertEqual(
+            len(expected["Candidate"]),
+            len(ELECTION_TYPES) * FILES_PER_TYPE * CANDIDATES_PER_FILE,
+        )
+        self.assertEqual(self.import_rows(workers=8), expected)
+
+    def test_persons_without_dni(self):
+        self.run_import(workers=1)
+        undocumented = Candidate.objects.filter(person__dni=None)
+        persons = list(undocumented.order_by("jne_id").values_list("person_id"))
+        self.assertGreater(len(persons), 1)
+        # one person each, kept by later imports
+        self.assertEqual(len(set(persons)), len(persons))
+        self.run_import(workers=1)
+        self.assertEqual(
+            list(undocumented.order_by("jne_id").values_list("person_id")), persons
+        )
+        self.assertEqual(Person.objects.filter(dni=None).count(), len(persons))
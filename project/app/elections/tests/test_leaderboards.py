@@ -0,0 +1,62 @@
+import random
+
+from django.test import TestCase
+
+from app.elections.managers import LEADERBOARD_METRICS
+from app.elections.models import Candidate, CurriculumVitae, LeaderboardEntry
+from app.elections.synthetic import ElectionGenerator
+
+SIZE = 5
+
+
+class LeaderboardUpdateTest(TestCase):
+    """
+    Updating the boards for a few candidates gives the same boards as
+    rebuilding them.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generator = ElectionGenerator(
+            election_types=2, positions=2, organizations=5, districts=3
+        )
+        cls.election = generator.build_election(80)
+
+    def get_entries(self):
+        return sorted(
+            LeaderboardEntry.objects.filter(election=self.election).values_list(
+                "metric",
+                "election_type_id",
+                "electoral_district_id",
+                "candidate_id",
+                "value",
+            ),
+            key=str,
+        )
+
+    def test_update_candidates(self):
+        rnd = random.Random(0)
+        LeaderboardEntry.objects.refresh(self.election.pk, SIZE)
+        candidates = list(
+            Candidate.objects.filter(election=self.election, cv__isnull=False)
+        )
+        for _ in range(20):
+            batch = rnd.sample(candidates, 6)
+            for candidate in batch:
+                # up, down, to zero or off the list
+                CurriculumVitae.objects.filter(pk=candidate.cv_id).update(
+                    **{
+                        metric: rnd.choice([0, 1, rnd.randint(1, 10**7)])
+                        for metric in LEADERBOARD_METRICS
+                    }
+                )
+                if rnd.random() < 0.2:
+                    candidate.status_on_list = rnd.choice(["INSCRITO", "EXCLUIDO"])
+                    candidate.save(update_fields=["status_on_list"])
+
+            LeaderboardEntry.objects.update_candidates(
+                [candidate.pk for candidate in batch], SIZE
+            )
+            entries = self.get_entries()
+            LeaderboardEntry.objects.refresh(self.election.pk, SIZE)
+            self.assertEqual(entries, self.get_entries())
@@ -0,0 +1,88 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class MergeDuplicatePersonsTest(TransactionTestCase):
+    """
+    Persons sharing a DNI are merged before the DNI becomes unique.
+    """
+
+    before = [("app_elections", "0006_leaderboardentry")]
+    after = [("app_elections", "0008_person_dni_unique")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        # back to the latest migrations for the other tests
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def create_candidates(self, apps, dnis):
+        """
+        Create a person with each of `dnis`, named A, B..., and a candidate
+        for each person.
+        """
+        Person = apps.get_model("app_elections", "Person")
+        Candidate = apps.get_model("app_elections", "Candidate")
+        ElectionProcess = apps.get_model("app_elections", "ElectionProcess")
+        ElectionType = apps.get_model("app_elections", "ElectionType")
+        Position = apps.get_model("app_elections", "Position")
+        PoliticalOrganization = apps.get_model("app_elections", "PoliticalOrganization")
+
+        election = ElectionProcess.objects.create(name="ELECCIONES", jne_id=1)
+        election_type = ElectionType.objects.create(name="TIPO", jne_id=1)
+        position = Position.objects.create(name="CARGO", jne_id=1)
+        organization = PoliticalOrganization.objects.create(name="PARTIDO", jne_id=1)
+        persons = [
+            Person.objects.create(first_name=chr(ord("A") + index), dni=dni)
+            for index, dni in enumerate(dnis)
+        ]
+        for jne_id, person in enumerate(persons, 1):
+            Candidate.objects.create(
+                election=election,
+                election_type=election_type,
+                person=person,
+                position=position,
+                ballot_position=jne_id,
+                political_organization=organization,
+                jne_id=jne_id,
+            )
+
+    def test_merge(self):
+        self.create_candidates(self.migrate(self.before), ["111", "111", "222", "111"])
+
+        apps = self.migrate(self.after)
+        Person = apps.get_model("app_elections", "Person")
+        Candidate = apps.get_model("app_elections", "Candidate")
+        self.assertEqual(
+            sorted(Person.objects.values_list("first_name", "dni")),
+            [("A", "111"), ("C", "222")],
+        )
+        self.assertEqual(
+            list(
+                Candidate.objects.order_by("jne_id").values_list("person__first_name")
+            ),
+            [("A",), ("A",), ("C",), ("A",)],
+        )
+
+    def test_empty_dnis(self):
+        self.create_candidates(self.migrate(self.before), ["", "111", "", "111"])
+
+        apps = self.migrate(self.after)
+        Person = apps.get_model("app_elections", "Person")
+        Candidate = apps.get_model("app_elections", "Candidate")
+        # the persons without DNI are not merged
+        self.assertEqual(
+            sorted(Person.objects.values_list("first_name", "dni")),
+            [("A", None), ("B", "111"), ("C", None)],
+        )
+        self.assertEqual(
+            list(
+                Candidate.objects.order_by("jne_id").values_list("person__first_name")
+            ),
+            [("A",), ("B",), ("C",), ("B",)],
+        )
@@ -0,0 +1,39 @@
+from django.test import TestCase
+
+from app.elections.models import Candidate
+from app.elections.synthetic import ElectionGenerator
+
+
+class CandidateSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generator = ElectionGenerator(
+            election_types=2, positions=2, organizations=5, districts=3
+        )
+        cls.election = generator.build_election(200)
+        cls.candidates = Candidate.objects.filter(election=cls.election)
+
+    def search(self, text):
+        return set(self.candidates.search(text).values_list("pk", flat=True))
+
+    def test_accents_and_case_are_ignored(self):
+        garcia = set(
+            self.candidates.filter(full_name__contains="GARCÍA").values_list(
+                "pk", flat=True
+            )
+        )
+        self.assertTrue(garcia)
+        self.assertEqual(self.search("garcia"), garcia)
+        self.assertEqual(self.search("García"), garcia)
+
+    def test_every_word_must_match(self):
+        candidate = self.candidates.exclude(person__dni="").first()
+        words = [candidate.person.dni, candidate.political_organization.name]
+        self.assertIn(candidate.pk, self.search(" ".join(words)))
+        self.assertEqual(self.search(f"{candidate.person.dni} zzzz"), set())
+
+    def test_api(self):
+        response = self.client.get(
+            f"/api/elections/{self.election.pk}/candidates/?q=garcia&limit=1"
+        )
+        self.assertGreater(response.json()["count"], 0)
@@ -0,0 +1,128 @@
+import io
+import tempfile
+from unittest import skipIf
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from app.elections import snapshots
+from app.elections.models import CurriculumVitae
+from app.elections.synthetic import ElectionGenerator
+from app.elections.versions import bump_data_version
+
+
+@skipIf(snapshots.pyarrow is None, "Election snapshots require pyarrow")
+class SnapshotTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generator = ElectionGenerator(
+            election_types=2, positions=2, organizations=5, districts=3
+        )
+        cls.election = generator.build_election(60)
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = override_settings(MEDIA_ROOT=media_root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def get_counts(self):
+        counts = {"candidates": self.election.candidates.count()}
+        cvs = CurriculumVitae.objects.filter(candidate__election=self.election)
+        counts["cvs"] = cvs.distinct().count()
+        for section in snapshots.CV_SECTIONS:
+            model = CurriculumVitae._meta.get_field(section).related_model
+            counts[section] = model.objects.filter(cv__in=cvs).distinct().count()
+        return counts
+
+    def read_table(self, path):
+        with default_storage.open(path) as f:
+            return snapshots.pyarrow.parquet.read_table(io.BytesIO(f.read()))
+
+    def test_write_snapshot(self):
+        manifest = snapshots.write_snapshot(self.election)
+        self.assertEqual(manifest, snapshots.get_manifest(self.election))
+        self.assertEqual(manifest["version"], 1)
+        counts = self.get_counts()
+        self.assertEqual(
+            {table: info["rows"] for table, info in manifest["tables"].items()},
+            counts,
+        )
+        self.assertGreater(counts["candidates"], 0)
+        for table, info in manifest["tables"].items():
+            with self.subTest(table):
+                data = self.read_table(info["path"])
+                self.assertEqual(data.num_rows, counts[table])
+                self.assertEqual(data.schema, snapshots.get_schema(table))
+
+        schema = snapshots.get_schema("candidates")
+        for column in ("full_name", "political_organization_name"):
+            self.assertTrue(
+                snapshots.pyarrow.types.is_dictionary(schema.field(column).type)
+            )
+        self.assertNotIn("search_vector", schema.names)
+
+    def test_new_version(self):
+        first = snapshots.write_snapshot(self.election)
+        # nothing changed
+        self.assertIsNone(snapshots.write_snapshot(self.election))
+
+        bump_data_version(self.election.pk)
+        second = snapshots.write_snapshot(self.election)
+        self.assertEqual(second["version"], first["version"] + 1)
+        self.assertEqual(snapshots.get_manifest(self.election), second)
+        for table in snapshots.TABLES:
+            self.assertFalse(default_storage.exists(first["tables"][table]["path"]))
+            self.assertTrue(default_storage.exists(second["tables"][table]["path"]))
+
+    def test_command(self):
+        stdout = io.StringIO()
+        call_command(
+            "write_election_snapshots",
+            election_process=self.election.jne_id,
+            stdout=stdout,
+        )
+        self.assertIn("Wrote snapshot v1", stdout.getvalue())
+        call_command(
+            "write_election_snapshots",
+            election_process=self.election.jne_id,
+            stdout=stdout,
+        )
+        self.assertIn("is up to date", stdout.getvalue())
+
+    def test_endpoints(self):
+        path = f"/api/elections/{self.election.pk}/snapshot/"
+        self.assertEqual(self.client.get(path).status_code, 404)
+
+        manifest = snapshots.write_snapshot(self.election)
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        tables = response.json()["tables"]
+        self.assertEqual(set(tables), set(snapshots.TABLES))
+        self.assertEqual(tables["cvs"]["rows"], manifest["tables"]["cvs"]["rows"])
+
+        response = self.client.get(tables["candidates"]["url"])
+        self.assertEqual(response.status_code, 200)
+        with default_storage.open(manifest["tables"]["candidates"]["path"]) as f:
+            self.assertEqual(b"".join(response.streaming_content), f.read())
+        self.assertEqual(self.client.get(path + "unknown/").status_code, 404)
+
+    @override_settings(API_CONDITIONAL_REQUESTS=True)
+    def test_conditional_endpoints(self):
+        snapshots.write_snapshot(self.election)
+        manifest_path = f"/api/elections/{self.election.pk}/snapshot/"
+        for path in (manifest_path, manifest_path + "candidates/"):
+            with self.subTest(path):
+                etag = self.client.get(path)["ETag"]
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+                # the snapshot, not the data, is what they serve
+                bump_data_version(self.election.pk)
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+        snapshots.write_snapshot(self.election)
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,58 @@
+"""
+Data versions of the election processes.
+
+Election data only changes when the import commands run, so each
+ElectionProcess carries a `data_version` counter and a `data_updated_at`
+timestamp that the commands bump when they are done. Anything derived from an
+election (cached responses, ETags, indexes...) can be keyed on its version and
+never goes stale. Versions are read from the database on every call, one
+cheap query: a copy kept in a per-process cache (the default locmem one)
+wouldn't see the bumps made by the import commands in their own process.
+"""
+from collections import namedtuple
+
+from django.db.models import Count, F, Max
+from django.utils import timezone
+
+from .models import ElectionProcess
+
+DataVersion = namedtuple("DataVersion", ["version", "updated_at"])
+
+# version covering every election process (e.g. for the elections list)
+ALL_ELECTIONS = "all"
+
+
+def get_data_version(election_id=ALL_ELECTIONS):
+    if election_id == ALL_ELECTIONS:
+        # not a sum of the versions: it goes down when an election is deleted
+        # and later bumps would issue an old version again
+        totals = ElectionProcess.objects.aggregate(
+            count=Count("pk"),
+            version=Max("data_version"),
+            updated_at=Max("data_updated_at"),
+        )
+        updated_at = totals["updated_at"]
+        version = "-".join(
+            [
+                str(totals["count"]),
+                str(totals["version"] or 0),
+                str(int(updated_at.timestamp() * 1000000) if updated_at else 0),
+            ]
+        )
+        return DataVersion(version, updated_at)
+    values = (
+        ElectionProcess.objects.filter(pk=election_id)
+        .values_list("data_version", "data_updated_at")
+        .first()
+    )
+    return DataVersion(*values) if values else None
+
+
+def bump_data_version(election_id):
+    """
+    Mark the data of an election as changed. Call it once the import of the
+    election has been written to the database.
+    """
+    ElectionProcess.objects.filter(pk=election_id).update(
+        data_version=F("data_version") + 1, data_updated_at=timezone.now()
+    )
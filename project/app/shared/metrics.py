@@ -0,0 +1,309 @@
+"""
+Minimal Prometheus metrics.
+
+Request metrics (latency, response size, SQL queries and SQL time per URL
+name) are recorded by MetricsMiddleware in the memory of each process, so
+every worker exposes its own series, like prometheus_client does outside of
+its multiprocess mode. Counters of events that also happen outside a single
+web worker live in the cache instead: API cache hits and misses (counted by
+app.api.cache) and import runs, kept in the METRICS_CACHE_ALIAS cache. Use a
+shared cache (REDIS_URL) for the import commands' counters to reach the web
+workers.
+
+Everything is rendered in the Prometheus text format by `render()`, served
+on an internal endpoint (app.shared.views.metrics) when METRICS_ENABLED.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = tuple(10**exponent for exponent in range(2, 9))
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+COUNTER_KEY = "metrics:{}:{}"
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of sorted `values`.
+    """
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[index]
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items):
+        for label_values, value in items:
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}{labels} {_format_value(value)}"
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            sample = self._values.get(label_values)
+            if sample is None:
+                # [count per bucket..., sum]
+                sample = self._values[label_values] = [0] * len(self.buckets) + [0]
+            sample[index] += 1
+            sample[-1] += value
+
+    def _render_samples(self, items):
+        for label_values, sample in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, sample):
+                cumulative += count
+                labels = _format_labels(
+                    self.labels + ("le",), label_values + (_format_value(bound),)
+                )
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {_format_value(sample[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent serving requests",
+    labels=("view", "method", "status"),
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "Size of the response bodies (streamed responses excluded)",
+    labels=("view",),
+    buckets=SIZE_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL queries run per request",
+    labels=("view",),
+    buckets=QUERY_BUCKETS,
+)
+QUERY_TIME = Counter(
+    "http_request_db_query_seconds_total",
+    "Time spent in SQL queries while serving requests",
+    labels=("view",),
+)
+REGISTRY = [REQUEST_LATENCY, RESPONSE_SIZE, REQUEST_QUERIES, QUERY_TIME]
+
+
+class QueryStats:
+    """
+    Database execute wrapper counting the queries run and their time.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - start
+
+
+@contextmanager
+def record_queries(stats):
+    """
+    Add the queries of the current thread, on every database, to `stats`.
+    """
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        yield stats
+
+
+class MetricsMiddleware:
+    """
+    Record the latency, response size and SQL queries of every request,
+    labeled with the name of the URL pattern that served it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        # views running in another thread add their queries through it too
+        # (see app.api.async_views)
+        request.query_stats = stats = QueryStats()
+        with record_queries(stats):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else "<unresolved>"
+        REQUEST_LATENCY.observe(elapsed, view, request.method, response.status_code)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(len(response.content), view)
+        REQUEST_QUERIES.observe(stats.count, view)
+        QUERY_TIME.inc(view, amount=stats.time)
+        return response
+
+
+def get_cache():
+    return caches[settings.METRICS_CACHE_ALIAS]
+
+
+def increment(name, *label_values):
+    """
+    Increment a counter shared by every process (stored in the cache).
+    """
+    cache = get_cache()
+    key = COUNTER_KEY.format(name, ",".join(map(str, label_values)))
+    try:
+        cache.incr(key)
+    except ValueError:
+        # first event since the counter was created or evicted
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_shared_counter(name, *label_values):
+    key = COUNTER_KEY.format(name, ",".join(map(str, label_values)))
+    return get_cache().get(key) or 0
+
+
+IMPORT_COMMANDS = ("import_jne_data", "import_candidates_cv")
+IMPORT_STATUSES = ("started", "succeeded", "failed")
+
+
+@contextmanager
+def record_import_run(command):
+    """
+    Count a run of an import command and whether it succeeded.
+    """
+    if not settings.METRICS_ENABLED:
+        yield
+        return
+    increment("import_runs", command, "started")
+    try:
+        yield
+    except BaseException:
+        increment("import_runs", command, "failed")
+        raise
+    increment("import_runs", command, "succeeded")
+    get_cache().set(COUNTER_KEY.format("import_last_success", command), time.time())
+
+
+def _render_shared():
+    # imported here, app.api depends on this module
+    from app.api import cache as api_cache
+    from app.api import replicas
+
+    cache_requests = Counter(
+        "api_cache_requests_total",
+        "Lookups of the API response cache",
+        labels=("result",),
+    )
+    for result, count in api_cache.get_stats().items():
+        cache_requests.inc(result, amount=count)
+
+    import_runs = Counter(
+        "import_runs_total", "Runs of the import commands", labels=("command", "status")
+    )
+    last_success = Gauge(
+        "import_last_success_timestamp_seconds",
+        "Time of the last successful run of the import commands",
+        labels=("command",),
+    )
+    for command in IMPORT_COMMANDS:
+        for status in IMPORT_STATUSES:
+            import_runs.inc(
+                command,
+                status,
+                amount=get_shared_counter("import_runs", command, status),
+            )
+        timestamp = get_cache().get(COUNTER_KEY.format("import_last_success", command))
+        if timestamp is not None:
+            last_success.set(timestamp, command)
+
+    replica_lag = Gauge(
+        "db_replica_lag_seconds",
+        "Time since the last transaction replayed by each read replica",
+        labels=("alias",),
+    )
+    for alias, lag in replicas.get_replication_lag().items():
+        if lag is not None:
+            replica_lag.set(lag, alias)
+    return [cache_requests, import_runs, last_success, replica_lag]
+
+
+def render():
+    lines = []
+    for metric in REGISTRY + _render_shared():
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
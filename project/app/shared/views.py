@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from . import metrics as metrics_registry
+
+
+def metrics(request):
+    """
+    Prometheus metrics of this process, when METRICS_ENABLED. With
+    METRICS_TOKEN set, scrapers must send it as a bearer token.
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    if settings.METRICS_TOKEN and not constant_time_compare(
+        request.META.get("HTTP_AUTHORIZATION", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(
+        metrics_registry.render(), content_type="text/plain; version=0.0.4"
+    )
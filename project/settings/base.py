@@ -65,6 +65,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.humanize",
+    "django.contrib.postgres",
     # third-party apps
     "rest_framework",
     "drf_spectacular",
@@ -72,6 +73,7 @@ INSTALLED_APPS = [
     # project apps
     "app.shared",
     "app.elections",
+    "app.api",
 ]
 
 MIDDLEWARE = [
@@ -129,6 +131,37 @@ DATABASES = {
     )
 }
 
+# Keep database connections open for this many seconds and reuse them across
+# requests, instead of opening one per request (0).
+DATABASE_CONN_MAX_AGE = env.int("DATABASE_CONN_MAX_AGE", default=0)
+
+# Enable when the database URLs point to a transaction pooler (e.g. PgBouncer
+# in transaction mode): server-side cursors, used to stream exports and
+# snapshots, don't work across the transactions of a pooled connection.
+DATABASE_TRANSACTION_POOLING = env.bool("DATABASE_TRANSACTION_POOLING", default=False)
+
+# Read replicas for the API (app.api.replicas), as comma separated database
+# URLs. Import commands, the admin and writes always use the primary.
+DATABASE_REPLICA_URLS = env.list("DATABASE_REPLICA_URLS", default=[])
+
+# After a client sends a write, keep routing its requests to the primary for
+# this many seconds (read-your-writes). 0 disables it.
+DATABASE_REPLICA_PIN_SECONDS = env.int("DATABASE_REPLICA_PIN_SECONDS", default=0)
+
+for index, url in enumerate(DATABASE_REPLICA_URLS, 1):
+    DATABASES[f"replica{index}"] = dict(
+        environ.Env.db_url_config(url), TEST={"MIRROR": "default"}
+    )
+
+for database in DATABASES.values():
+    database["CONN_MAX_AGE"] = DATABASE_CONN_MAX_AGE
+    database["DISABLE_SERVER_SIDE_CURSORS"] = DATABASE_TRANSACTION_POOLING
+
+if DATABASE_REPLICA_URLS:
+    DATABASE_ROUTERS = ["app.api.replicas.ReplicaRouter"]
+    if DATABASE_REPLICA_PIN_SECONDS:
+        MIDDLEWARE.append("app.api.replicas.PrimaryPinningMiddleware")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -278,3 +311,76 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 50,
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
+
+# Serialize candidates from values_list() tuples (app.api.flat_serializers)
+# instead of the DRF serializers. Both produce the same output.
+API_FLAT_SERIALIZATION = env.bool("API_FLAT_SERIALIZATION", default=False)
+
+# List candidates from the denormalized CandidateListing table. The import
+# commands keep it up to date; run `manage.py refresh_candidate_listing` once
+# before enabling it on an existing database.
+API_CANDIDATE_LISTING = env.bool("API_CANDIDATE_LISTING", default=False)
+
+# Cache rendered API responses per election data version (app.api.cache). The
+# version is bumped by the import commands, so entries never go stale; the
+# timeout only bounds how long entries of old versions take up space. Edits
+# made through the admin don't bump the version.
+API_CACHE_ENABLED = env.bool("API_CACHE_ENABLED", default=False)
+API_CACHE_ALIAS = env("API_CACHE_ALIAS", default="default")
+API_CACHE_TIMEOUT = env.int("API_CACHE_TIMEOUT", default=24 * 60 * 60)
+
+# Send ETag/Last-Modified headers derived from the election data version and
+# answer conditional requests with a 304 before running the view.
+API_CONDITIONAL_REQUESTS = env.bool("API_CONDITIONAL_REQUESTS", default=False)
+
+# Serve the views as coroutines that run in a pool of API_ASYNC_THREADS threads
+# (app.api.async_views). Only useful under an ASGI server, e.g.
+# `gunicorn project.asgi -k uvicorn.workers.UvicornWorker` (`poetry install
+# -E asgi`); under WSGI it only adds overhead. It doesn't raise throughput
+# when the views are CPU bound, it keeps slow queries from holding back the
+# other requests; compare both deployments with loadtest_api. Each thread
+# holds its own database connection.
+API_ASYNC_VIEWS = env.bool("API_ASYNC_VIEWS", default=False)
+API_ASYNC_THREADS = env.int("API_ASYNC_THREADS", default=10)
+
+# Columnar (Parquet) snapshots of each election (app.elections.snapshots),
+# written to the default storage under ELECTION_SNAPSHOTS_DIR. When enabled,
+# the import commands refresh the snapshots of the elections they change.
+# Requires pyarrow.
+ELECTION_SNAPSHOTS_ENABLED = env.bool("ELECTION_SNAPSHOTS_ENABLED", default=False)
+ELECTION_SNAPSHOTS_DIR = env("ELECTION_SNAPSHOTS_DIR", default="snapshots")
+
+# Number of candidates kept on each candidate leaderboard. The import commands
+# keep them up to date; run `manage.py refresh_leaderboards` after changing it.
+ELECTION_LEADERBOARD_SIZE = env.int("ELECTION_LEADERBOARD_SIZE", default=100)
+
+# HTTP transport of the import commands' JNE client (app.elections.jne):
+# timeouts in seconds, retries of connection errors, 429 and 5xx responses
+# with exponential backoff (JNE_RETRY_BACKOFF seconds, doubled each time, with
+# jitter) and a limit of requests per second shared by all the threads of a
+# command, 0 for no limit (overridden by --max-requests-per-second).
+JNE_CONNECT_TIMEOUT = env.float("JNE_CONNECT_TIMEOUT", default=10)
+JNE_READ_TIMEOUT = env.float("JNE_READ_TIMEOUT", default=60)
+JNE_RETRIES = env.int("JNE_RETRIES", default=4)
+JNE_RETRY_BACKOFF = env.float("JNE_RETRY_BACKOFF", default=0.5)
+JNE_MAX_REQUESTS_PER_SECOND = env.float("JNE_MAX_REQUESTS_PER_SECOND", default=20)
+
+# Compressed on-disk cache of the JNE responses (app.elections.jne_cache),
+# read and written by the import commands when set (or given --cache-dir).
+# Cached responses are fetched again after JNE_CACHE_MAX_AGE seconds, 0 to keep
+# them until pruned with `manage.py jne_cache --prune-older-than`.
+# `--cache-mode replay` runs an import from the cache only, without network.
+JNE_CACHE_DIR = env("JNE_CACHE_DIR", default="")
+JNE_CACHE_MAX_AGE = env.int("JNE_CACHE_MAX_AGE", default=0)
+
+# Prometheus metrics (app.shared.metrics) on /internal/metrics: latency,
+# response size and SQL queries per URL name, API cache hits and misses and
+# import runs. Counters shared with the import commands are kept in the
+# METRICS_CACHE_ALIAS cache. Restrict access at the proxy or with
+# METRICS_TOKEN (sent as a bearer token).
+METRICS_ENABLED = env.bool("METRICS_ENABLED", default=False)
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+METRICS_CACHE_ALIAS = env("METRICS_CACHE_ALIAS", default="default")
+
+if METRICS_ENABLED:
+    MIDDLEWARE.insert(0, "app.shared.metrics.MetricsMiddleware")